@@ -0,0 +1,106 @@
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher(object):
+    """
+    Coalesces concurrent scoring requests into batches.
+
+    Each request submits a list of items (for FinBERT, the sentences of one text). A single worker drains the queue,
+    collecting requests until either max_batch_size items are pending or max_wait seconds have passed since the first
+    one arrived, runs the scoring function once on the combined items in a worker thread, and hands every request its
+    own slice of the results.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait=0.01):
+        """
+        Parameters
+        ----------
+        score_fn: callable
+            Takes a list of items and returns results of the same length that support slicing (a list or a DataFrame
+            with a default index). Runs in a worker thread, outside the event loop.
+        max_batch_size: int
+            Maximum number of items scored in one call. A single request larger than this is scored on its own.
+        max_wait: float
+            Maximum time in seconds the first request of a batch waits for others to join it.
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = None
+        self._worker = None
+        self._carry = None
+
+    def start(self):
+        """Starts the worker. Must be called from within the running event loop."""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, items):
+        """Scores items as part of the next batch and returns their results in order."""
+        items = list(items)
+        if not items:
+            return []
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((items, future))
+        return await future
+
+    async def _next_batch(self):
+        if self._carry is not None:
+            pending, self._carry = [self._carry], None
+        else:
+            pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if size + len(request[0]) > self.max_batch_size:
+                # Start the next batch with it rather than overshooting this one
+                self._carry = request
+                break
+            pending.append(request)
+            size += len(request[0])
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            pending = await self._next_batch()
+            items = [item for request_items, _ in pending for item in request_items]
+            logger.info("Scoring batch of %d items from %d requests", len(items), len(pending))
+            try:
+                results = await loop.run_in_executor(None, self.score_fn, items)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for request_items, future in pending:
+                end = start + len(request_items)
+                if not future.done():
+                    future.set_result(results[start:end])
+                start = end
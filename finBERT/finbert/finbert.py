@@ -20,6 +20,10 @@ logger = logging.getLogger(__name__)
 
 tokenizer = AutoTokenizer.from_pretrained('bert-base-uncased')
 
+# Sequence length used for inference, and the batch size used when predict() buckets sentences by length
+MAX_SEQ_LENGTH = 64
+BUCKET_BATCH_SIZE = 64
+
 class Config(object):
     """The configuration class for training."""
 
@@ -43,7 +47,8 @@ class Config(object):
                  discriminate=True,
                  gradual_unfreeze=True,
                  encoder_no=12,
-                 base_model='bert-base-uncased'):
+                 base_model='bert-base-uncased',
+                 feature_cache_dir=None):
         """
         Parameters
         ----------
@@ -88,6 +93,9 @@ class Config(object):
         encoder_no: int
             Starting from which layer the model is going to be finetuned. If set 12, whole model is going to be
             fine-tuned. If set, for example, 6, only the last 6 layers will be fine-tuned.
+        feature_cache_dir: str, optional
+            Directory for the on-disk tokenization cache. If set, featurized datasets are stored there and reused
+            across epochs and runs. Default is None (no caching).
         """
         self.data_dir = data_dir
         self.bert_model = bert_model
@@ -109,6 +117,7 @@ class Config(object):
         self.gradual_unfreeze = gradual_unfreeze
         self.encoder_no = encoder_no
         self.base_model = base_model
+        self.feature_cache_dir = feature_cache_dir
 
 
 class FinBert(object):
@@ -174,6 +183,10 @@ class FinBert(object):
 
         self.tokenizer = AutoTokenizer.from_pretrained(self.base_model, do_lower_case=self.config.do_lower_case)
 
+        self.feature_cache = None
+        if self.config.feature_cache_dir:
+            self.feature_cache = FeatureCache(self.config.feature_cache_dir)
+
     def get_data(self, phase):
         """
         Gets the data for training or evaluation. It returns the data in the format that pytorch will process. In the
@@ -307,10 +320,21 @@ class FinBert(object):
             The data loader object.
         """
 
-        features = convert_examples_to_features(examples, self.label_list,
-                                                self.config.max_seq_length,
-                                                self.tokenizer,
-                                                self.config.output_mode)
+        features = None
+        if self.feature_cache is not None:
+            cache_key = self.feature_cache.key(examples, self.label_list, self.config.max_seq_length,
+                                               self.tokenizer, self.config.output_mode)
+            features = self.feature_cache.load(cache_key)
+            if features is not None:
+                logger.info("  Loaded features from cache %s", cache_key)
+
+        if features is None:
+            features = featurize_examples(examples, self.label_list,
+                                          self.config.max_seq_length,
+                                          self.tokenizer,
+                                          self.config.output_mode)
+            if self.feature_cache is not None:
+                self.feature_cache.save(cache_key, features)
 
         # Log the necessasry information
         logger.info("***** Loading data *****")
@@ -319,19 +343,11 @@ class FinBert(object):
         logger.info("  Num steps = %d", self.num_train_optimization_steps)
 
         # Load the data, make it into TensorDataset
-        all_input_ids = torch.tensor([f.input_ids for f in features], dtype=torch.long)
-        all_attention_mask = torch.tensor([f.attention_mask for f in features], dtype=torch.long)
-        all_token_type_ids = torch.tensor([f.token_type_ids for f in features], dtype=torch.long)
-
-        if self.config.output_mode == "classification":
-            all_label_ids = torch.tensor([f.label_id for f in features], dtype=torch.long)
-        elif self.config.output_mode == "regression":
-            all_label_ids = torch.tensor([f.label_id for f in features], dtype=torch.float)
-
-        try:
-            all_agree_ids = torch.tensor([f.agree for f in features], dtype=torch.long)
-        except:
-            all_agree_ids = torch.tensor([0.0 for f in features], dtype=torch.long)
+        all_input_ids = features['input_ids']
+        all_attention_mask = features['attention_mask']
+        all_token_type_ids = features['token_type_ids']
+        all_label_ids = features['label_ids']
+        all_agree_ids = features['agree_ids']
 
         data = TensorDataset(all_input_ids, all_attention_mask, all_token_type_ids, all_label_ids, all_agree_ids)
 
@@ -370,6 +386,9 @@ class FinBert(object):
         # Training
         train_dataloader = self.get_loader(train_examples, 'train')
 
+        # The validation set is fixed, so its loader is built once for all epochs
+        validation_loader = self.get_loader(validation_examples, phase='eval')
+
         model.train()
 
         step_number = len(train_dataloader)
@@ -441,7 +460,6 @@ class FinBert(object):
 
             # Validation
 
-            validation_loader = self.get_loader(validation_examples, phase='eval')
             model.eval()
 
             valid_loss, valid_accuracy = 0, 0
@@ -578,7 +596,8 @@ class FinBert(object):
         return evaluation_df
 
 
-def predict(text, model, write_to_csv=False, path=None, use_gpu=False, gpu_name='cuda:0', batch_size=5):
+def predict(text, model, write_to_csv=False, path=None, use_gpu=False, gpu_name='cuda:0', batch_size=None,
+            bucketing=False):
     """
     Predict sentiments of sentences in a given text. The function first tokenizes sentences, make predictions and write
     results.
@@ -596,45 +615,86 @@ def predict(text, model, write_to_csv=False, path=None, use_gpu=False, gpu_name=
     gpu_name: (optional): string
         multi-gpu support: allows specifying which gpu to use
     batch_size: (optional): int
-        size of batching chunks
+        size of batching chunks. Defaults to 5, or to BUCKET_BATCH_SIZE when bucketing.
+    bucketing: (optional): bool
+        sorts sentences by token length and pads each batch only to its own longest member instead of to a fixed
+        64 tokens. Results are returned in the original sentence order.
     """
-    model.eval()
-
     sentences = sent_tokenize(text)
 
+    result = predict_sentences(sentences, model, use_gpu=use_gpu, gpu_name=gpu_name, batch_size=batch_size,
+                               bucketing=bucketing)
+
+    if write_to_csv:
+        result.to_csv(path, sep=',', index=False)
+
+    return result
+
+
+def predict_sentences(sentences, model, use_gpu=False, gpu_name='cuda:0', batch_size=None, bucketing=False):
+    """
+    Predict sentiments of already split sentences. Used by predict() and by callers that coalesce sentences from many
+    texts into one run, such as the inference server.
+    Parameters
+    ----------
+    sentences: list
+        sentences to be analyzed
+    model: BertForSequenceClassification
+        path to the classifier model
+    use_gpu: (optional): bool
+        enables inference on GPU
+    gpu_name: (optional): string
+        multi-gpu support: allows specifying which gpu to use
+    batch_size: (optional): int
+        size of batching chunks. Defaults to 5, or to BUCKET_BATCH_SIZE when bucketing.
+    bucketing: (optional): bool
+        sorts sentences by token length and pads each batch only to its own longest member.
+    Returns
+    -------
+    result: pd.DataFrame
+        One row per sentence with 'sentence', 'logit', 'prediction' and 'sentiment_score' columns.
+    """
+    model.eval()
+
     device = gpu_name if use_gpu and torch.cuda.is_available() else "cpu"
     logging.info("Using device: %s " % device)
     label_list = ['positive', 'negative', 'neutral']
     label_dict = {0: 'positive', 1: 'negative', 2: 'neutral'}
-    result = pd.DataFrame(columns=['sentence', 'logit', 'prediction', 'sentiment_score'])
-    for batch in chunks(sentences, batch_size):
-        examples = [InputExample(str(i), sentence) for i, sentence in enumerate(batch)]
 
-        features = convert_examples_to_features(examples, label_list, 64, tokenizer)
+    if batch_size is None:
+        batch_size = BUCKET_BATCH_SIZE if bucketing else 5
 
-        all_input_ids = torch.tensor([f.input_ids for f in features], dtype=torch.long).to(device)
-        all_attention_mask = torch.tensor([f.attention_mask for f in features], dtype=torch.long).to(device)
-        all_token_type_ids = torch.tensor([f.token_type_ids for f in features], dtype=torch.long).to(device)
+    # Featurize every sentence in one tokenizer call; batches are sliced out of these tensors
+    features = featurize_examples([InputExample(str(i), sentence) for i, sentence in enumerate(sentences)],
+                                  label_list, MAX_SEQ_LENGTH, tokenizer)
+    lengths = features['attention_mask'].sum(dim=1).numpy()
 
-        with torch.no_grad():
-            model     = model.to(device)
+    if bucketing:
+        order = np.argsort(lengths, kind='stable')
+    else:
+        order = np.arange(len(sentences))
 
-            logits = model(all_input_ids, all_attention_mask, all_token_type_ids)[0]
-            logging.info(logits)
-            logits = softmax(np.array(logits.cpu()))
-            sentiment_score = pd.Series(logits[:, 0] - logits[:, 1])
-            predictions = np.squeeze(np.argmax(logits, axis=1))
+    # Filled batch by batch and turned into a DataFrame once at the end
+    probabilities = np.zeros((len(sentences), len(label_list)), dtype=np.float32)
 
-            batch_result = {'sentence': batch,
-                            'logit': list(logits),
-                            'prediction': predictions,
-                            'sentiment_score': sentiment_score}
+    model = model.to(device)
+    for batch_ids in chunks(order, batch_size):
+        index = torch.as_tensor(batch_ids)
+        width = int(lengths[batch_ids].max()) if bucketing else MAX_SEQ_LENGTH
 
-            batch_result = pd.DataFrame(batch_result)
-            result = pd.concat([result, batch_result], ignore_index=True)
+        all_input_ids = features['input_ids'][index, :width].to(device)
+        all_attention_mask = features['attention_mask'][index, :width].to(device)
+        all_token_type_ids = features['token_type_ids'][index, :width].to(device)
 
-    result['prediction'] = result.prediction.apply(lambda x: label_dict[x])
-    if write_to_csv:
-        result.to_csv(path, sep=',', index=False)
+        with torch.no_grad():
+            logits = model(all_input_ids, all_attention_mask, all_token_type_ids)[0]
+            logging.info(logits)
+            probabilities[batch_ids] = softmax(np.array(logits.cpu()))
+
+    predictions = np.argmax(probabilities, axis=1)
+    result = pd.DataFrame({'sentence': sentences,
+                           'logit': list(probabilities),
+                           'prediction': [label_dict[p] for p in predictions],
+                           'sentiment_score': probabilities[:, 0] - probabilities[:, 1]})
 
     return result
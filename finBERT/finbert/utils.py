@@ -6,8 +6,12 @@
 from __future__ import absolute_import, division, print_function
 
 import csv
+import hashlib
+import itertools
+import shutil
 import sys
 import os
+import tempfile
 import torch
 
 import numpy as np
@@ -204,6 +208,130 @@ def convert_examples_to_features(examples, label_list, max_seq_length, tokenizer
     return features
 
 
+def featurize_examples(examples, label_list, max_seq_length, tokenizer, mode='classification', pad_to_longest=False):
+    """
+    Vectorized counterpart of convert_examples_to_features. The whole example list is tokenized with a single
+    tokenizer call (Rust-backed for fast tokenizers) and the ids are written straight into padded arrays, without
+    building an InputFeatures object per example. Long texts are truncated with the same head+tail rule.
+
+    Parameters
+    ----------
+    examples: list
+        A list of InputExample's.
+    label_list: list
+        The list of labels.
+    max_seq_length: int
+        The maximum sequence length.
+    tokenizer: PreTrainedTokenizer
+        The tokenizer to be used. A fast tokenizer is recommended.
+    mode: str, optional
+        The task type: 'classification' or 'regression'. Default is 'classification'
+    pad_to_longest: bool, optional
+        Pads to the longest sequence in examples instead of max_seq_length. Default is False.
+
+    Returns
+    -------
+    features: dict
+        'input_ids', 'attention_mask', 'token_type_ids', 'label_ids' and 'agree_ids' tensors, one row per example.
+    """
+
+    if mode == 'classification':
+        label_map = {label: i for i, label in enumerate(label_list)}
+        label_map[None] = 9090
+        label_ids = torch.tensor([label_map[example.label] for example in examples], dtype=torch.long)
+    elif mode == 'regression':
+        label_ids = torch.tensor([float(example.label) for example in examples], dtype=torch.float)
+    else:
+        raise ValueError("The mode should either be classification or regression. You entered: " + mode)
+
+    mapagree = {'0.5': 1, '0.66': 2, '0.75': 3, '1.0': 4}
+    agree_ids = torch.tensor([mapagree.get(example.agree, 0) for example in examples], dtype=torch.long)
+
+    if examples:
+        encoded = tokenizer([example.text for example in examples], add_special_tokens=False,
+                            return_attention_mask=False, return_token_type_ids=False)['input_ids']
+    else:
+        encoded = []
+
+    # Same head+tail truncation as convert_examples_to_features
+    head = (max_seq_length // 4) - 1
+    tail = (3 * max_seq_length // 4) - 1
+    encoded = [ids if len(ids) <= max_seq_length - 2 else ids[:head] + ids[len(ids) - tail:] for ids in encoded]
+
+    lengths = np.array([len(ids) + 2 for ids in encoded], dtype=np.int64)
+    width = int(lengths.max()) if pad_to_longest and len(lengths) else max_seq_length
+
+    # Fill every [CLS] ids [SEP] row in one masked assignment; the rest stays zero padding
+    attention_mask = np.arange(width)[None, :] < lengths[:, None]
+    input_ids = np.zeros((len(encoded), width), dtype=np.int64)
+    input_ids[attention_mask] = np.fromiter(
+        itertools.chain.from_iterable([tokenizer.cls_token_id] + ids + [tokenizer.sep_token_id] for ids in encoded),
+        dtype=np.int64, count=int(lengths.sum()))
+
+    return {'input_ids': torch.from_numpy(input_ids),
+            'attention_mask': torch.from_numpy(attention_mask.astype(np.int64)),
+            'token_type_ids': torch.zeros((len(encoded), width), dtype=torch.long),
+            'label_ids': label_ids,
+            'agree_ids': agree_ids}
+
+
+class FeatureCache(object):
+    """
+    On-disk cache of featurized datasets. Each entry is a directory of .npy arrays named after a hash of the examples,
+    the tokenizer, max_seq_length, the label list and the output mode. Entries are memory-mapped on load, so repeated
+    epochs, reruns and evaluation passes map the tensors instead of tokenizing again.
+    """
+
+    FIELDS = ('input_ids', 'attention_mask', 'token_type_ids', 'label_ids', 'agree_ids')
+
+    def __init__(self, cache_dir):
+        """
+        Parameters
+        ----------
+        cache_dir: str
+            Directory where cache entries are stored. Created if missing.
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, examples, label_list, max_seq_length, tokenizer, mode='classification'):
+        """Hashes everything that determines the featurized tensors."""
+        h = hashlib.sha256()
+        header = [type(tokenizer).__name__, getattr(tokenizer, 'name_or_path', ''), len(tokenizer),
+                  getattr(tokenizer, 'do_lower_case', None), max_seq_length, list(label_list), mode]
+        h.update(repr(header).encode('utf-8'))
+        for example in examples:
+            h.update(repr((example.text, example.label, example.agree)).encode('utf-8'))
+        return h.hexdigest()[:32]
+
+    def load(self, key):
+        """Returns the cached tensors for key, or None on a miss."""
+        entry = os.path.join(self.cache_dir, key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            # Copy-on-write mapping: pages come from disk and the arrays stay writable for torch
+            return {field: torch.from_numpy(np.load(os.path.join(entry, field + '.npy'), mmap_mode='c'))
+                    for field in self.FIELDS}
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable feature cache entry %s", entry)
+            return None
+
+    def save(self, key, features):
+        """Writes features under key. The entry only becomes visible once fully written."""
+        entry = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry):
+            return
+        tmp = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        for field in self.FIELDS:
+            np.save(os.path.join(tmp, field + '.npy'), features[field].numpy())
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another process wrote the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
 def accuracy(out, labels):
     outputs = np.argmax(out, axis=1)
     return np.sum(outputs == labels)
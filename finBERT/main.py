@@ -1,25 +1,118 @@
-from flask import Flask
-from flask_cors import CORS
-import sys
-import optparse
-import time
-from flask import request
-import sys
-from finbert.finbert import predict
-from pytorch_pretrained_bert.modeling import BertForSequenceClassification
-import nltk
+import asyncio
+import json
+import logging
 import os
 
+import nltk
+from aiohttp import web
+from nltk.tokenize import sent_tokenize
+from transformers import AutoModelForSequenceClassification
+
+from finbert.batching import MicroBatcher
+from finbert.finbert import predict_sentences
+
 nltk.download('punkt')
-app = Flask(__name__)
-CORS(app)
-start = int(round(time.time()))
-model = BertForSequenceClassification.from_pretrained('/src/models/classifier_model/finbert-sentiment', num_labels=3, cache_dir=None)
 
-@app.route("/",methods=['POST'])
-def score():
-    text=request.get_json()['text']
-    return(predict(text, model).to_json(orient='records'))
+MODEL_PATH = os.environ.get('FINBERT_MODEL_PATH', '/src/models/classifier_model/finbert-sentiment')
+PORT = int(os.environ.get('PORT', 8080))
+
+# Sentences coalesced across requests into one model call, and how long a request may wait for others to join it
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 64))
+MAX_WAIT_MS = float(os.environ.get('MAX_WAIT_MS', 10))
+
+logger = logging.getLogger(__name__)
+
+state = {'model': None, 'ready': False, 'error': None}
+
+
+def score(sentences):
+    return predict_sentences(sentences, state['model'], batch_size=MAX_BATCH_SIZE, bucketing=True)
+
+
+batcher = MicroBatcher(score, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000.0)
+
+
+def load_and_warm_up():
+    state['model'] = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH, num_labels=3, cache_dir=None)
+    # One throwaway pass so the first real request doesn't pay for lazy initialisation
+    score(['Warmup sentence.'])
+
+
+async def score_text(text):
+    result = await batcher.submit(sent_tokenize(text))
+    if isinstance(result, list):
+        return '[]'
+    return result.to_json(orient='records')
+
+
+def check_ready():
+    if state['error']:
+        raise web.HTTPServiceUnavailable(text='Model failed to load: ' + state['error'])
+    if not state['ready']:
+        raise web.HTTPServiceUnavailable(text='Model is warming up')
+
+
+async def handle_score(request):
+    check_ready()
+    text = (await request.json())['text']
+    return web.Response(text=await score_text(text), content_type='application/json')
+
+
+async def handle_bulk(request):
+    check_ready()
+    texts = (await request.json())['texts']
+    results = await asyncio.gather(*[score_text(text) for text in texts])
+    return web.Response(text='[' + ','.join(results) + ']', content_type='application/json')
+
+
+async def handle_ready(request):
+    # 500 once loading has failed, so it is not mistaken for a slow warm-up
+    status = 200 if state['ready'] else 500 if state['error'] else 503
+    return web.Response(text=json.dumps({'ready': state['ready'], 'error': state['error']}), status=status,
+                        content_type='application/json')
+
+
+@web.middleware
+async def cors(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+
+async def on_startup(app):
+    batcher.start()
+
+    async def warm_up():
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, load_and_warm_up)
+        except Exception as e:
+            logger.exception('Loading the model from %s failed', MODEL_PATH)
+            state['error'] = '%s: %s' % (type(e).__name__, e)
+            return
+        state['ready'] = True
+        logger.info('Model loaded from %s, ready to score', MODEL_PATH)
+
+    app['warmup'] = asyncio.ensure_future(warm_up())
+
+
+async def on_cleanup(app):
+    app['warmup'].cancel()
+    await batcher.stop()
+
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.router.add_post('/', handle_score)
+    app.router.add_post('/bulk', handle_bulk)
+    app.router.add_get('/ready', handle_ready)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=False, threaded=True)
+    web.run_app(create_app(), host='0.0.0.0', port=PORT)
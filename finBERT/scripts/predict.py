@@ -11,6 +11,8 @@ parser.add_argument('-a', action="store_true", default=False)
 parser.add_argument('--text_path', type=str, help='Path to the text file.')
 parser.add_argument('--output_dir', type=str, help='Where to write the results')
 parser.add_argument('--model_path', type=str, help='Path to classifier model')
+parser.add_argument('--bucketing', action="store_true", default=False,
+                    help='Sort sentences by length and pad each batch dynamically (faster on long documents)')
 
 args = parser.parse_args()
 
@@ -24,4 +26,4 @@ with open(args.text_path,'r') as f:
 model = AutoModelForSequenceClassification.from_pretrained(args.model_path,num_labels=3,cache_dir=None)
 
 output = "predictions.csv"
-predict(text,model,write_to_csv=True,path=os.path.join(args.output_dir,output))
\ No newline at end of file
+predict(text,model,write_to_csv=True,path=os.path.join(args.output_dir,output),bucketing=args.bucketing)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# alias_matcher.py
+#
+# Multi-ticker entity matching with a single compiled regex.
+#
+# All aliases of all tickers are compiled into one alternation with a named
+# group per alias, so tagging a document with every ticker it mentions is one
+# finditer pass instead of one regex pass per ticker (the engine still tries
+# the alternatives at each position; it is not a linear-time automaton); the group
+# that matched maps back to the alias and its tickers. Matching follows the
+# per-ticker regexes it replaces: case insensitive, any whitespace run
+# matches a space inside an alias, and aliases must sit on word boundaries
+# (\b). The regex engine scans left to right and, at each position, tries
+# longer aliases first, so among aliases starting at the same position the
+# longest wins; once a match is taken the scan resumes after it, so matches
+# never overlap.
+
+import re
+from collections import Counter, namedtuple
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+Hit = namedtuple("Hit", ["ticker", "alias", "start", "end"])
+
+
+def _normalize_alias(alias: str) -> str:
+    return " ".join(alias.lower().split())
+
+
+def _alias_pattern(key: str) -> str:
+    return r"\s+".join(map(re.escape, key.split(" ")))
+
+
+def merge_aliases(*maps: Dict[str, Iterable[str]]) -> Dict[str, List[str]]:
+    """Union of several {ticker: [aliases]} maps, keeping first-seen order."""
+    out = {}
+    for m in maps:
+        for ticker, aliases in m.items():
+            out.setdefault(ticker, [])
+            for a in aliases:
+                if a not in out[ticker]: out[ticker].append(a)
+    return out
+
+
+class AliasMatcher:
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        by_alias = {}  # normalized alias -> (original alias, tickers)
+        for ticker, names in aliases.items():
+            for name in names:
+                key = _normalize_alias(name)
+                if not key: continue
+                if key not in by_alias:
+                    by_alias[key] = (name, [])
+                if ticker not in by_alias[key][1]:
+                    by_alias[key][1].append(ticker)
+
+        # group name -> (original alias, tickers)
+        self._groups = {f"a{i}": value for i, value in enumerate(by_alias.values())}
+        parts = sorted(((f"a{i}", key) for i, key in enumerate(by_alias)), key=lambda p: -len(p[1]))
+        alternation = "|".join(f"(?P<{g}>{_alias_pattern(key)})" for g, key in parts)
+        self._regex = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE) if parts else None
+
+    def find(self, text: str) -> List[Hit]:
+        """
+        Alias occurrences on word boundaries, as re.finditer reports them: scanning left
+        to right, the longest alias starting at each position, with no overlaps.
+        """
+        if not text or self._regex is None: return []
+        hits = []
+        for m in self._regex.finditer(text):
+            name, tickers = self._groups[m.lastgroup]
+            hits.extend(Hit(t, name, m.start(), m.end()) for t in sorted(tickers))
+        return hits
+
+    def tag(self, text: str) -> Dict[str, List[Hit]]:
+        """{ticker: hits} for every ticker mentioned in text."""
+        out = {}
+        for h in self.find(text):
+            out.setdefault(h.ticker, []).append(h)
+        return out
+
+    def counts(self, text: str) -> Dict[str, int]:
+        if not text or self._regex is None: return {}
+        total = {}
+        for group, k in Counter(m.lastgroup for m in self._regex.finditer(text)).items():
+            for t in self._groups[group][1]:
+                total[t] = total.get(t, 0) + k
+        return total
+
+    def count_frame(self, df: pd.DataFrame, columns: Iterable[str] = ("title", "content")) -> pd.Series:
+        """Per-row {ticker: hit count} summed over the given text columns (scanned separately)."""
+        columns = [c for c in columns if c in df.columns]
+        result = []
+        for values in zip(*(df[c].fillna("").astype(str) for c in columns)):
+            total = {}
+            for v in values:
+                for t, k in self.counts(v).items():
+                    total[t] = total.get(t, 0) + k
+            result.append(total)
+        return pd.Series(result, index=df.index, dtype=object)
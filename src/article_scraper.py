@@ -1,76 +1,120 @@
 # Article scraper - scrapes forbes articles for article title, author, publication date, and content
+#
+# URLs from forbes_search.csv go into a durable work queue (data/forbes_queue.sqlite);
+# pages are fetched by a few threads behind a shared rate limiter, parsed in a
+# process pool and appended to forbes_articles.csv as they finish. Failed
+# URLs are retried with exponential backoff. Killing the run and starting it
+# again resumes where it stopped; re-runs skip URLs that are already done.
+#
+# Bodies go to the document store (doc_store.py); the CSV only carries their
+# doc_id. --inline-body also writes the body into the CSV, for tools that
+# still expect the old Body column.
+#
+#   python article_scraper.py [--links forbes_search.csv] [--out forbes_articles.csv] [--retry-failed]
+#                             [--inline-body]
 
 # Imports
-import requests
+import argparse
+import os
+
 from bs4 import BeautifulSoup
 import pandas as pd
-import re
-import time
-import random
-
-# Get critical elements from article webpage
-def scrape(url, wait_times=[1,5,30], printErrors = True):
-  # Run until scrape is successful
-  completed = False
-  errors = 0
-  while(not completed):
-    # Get html and scrape elements
-    try:
-      response = requests.get(url)
-      soup = BeautifulSoup(response.content, 'html.parser')
-      title = soup.find_all('h1')[0].text.strip()
-      date = soup.find_all('time')[0].text.strip()
-      p = [elem.text.strip() for elem in soup.find_all('p')]
-      author = p[0][2:-1]
-      body = "\n".join(p[2:])
-      completed = True
-
-    # Print html and wait a bit if there's an error
-    except:
-      errors += 1
-      print(f"({errors}) Scraping error")
-      if(printErrors): print(soup.prettify())
-      completed = False
-      if(len(wait_times) > 1): time.sleep(wait_times[errors])
-      else: time.sleep(wait_times[0])
-
-      # Skip article if the article cannot be scraped
-      if errors >= len(wait_times)-1:
-        print("(!) Skipping article...")
-        return "0", "0", "0", "0"
-
-  time.sleep(wait_times[0])
+
+from doc_store import default_store
+from http_cache import cached_get, default_cache
+from rate_limit import TokenBucket, retry_after_seconds
+from scrape_queue import CsvSink, ScrapeQueue, compact_csv, run_queue
+
+QUEUE_DB = os.path.join("..", "data", "forbes_queue.sqlite")
+COLUMNS = ['Link', 'Title', 'Time', 'Author', 'doc_id']
+
+FETCH_WORKERS = 3
+PARSE_WORKERS = 2
+FORBES_MAX_RPS = 0.5  # about one page every 2s across all fetch threads, like the old 1-3s sleeps
+
+_FORBES_LIMITER = TokenBucket(rate=FORBES_MAX_RPS, capacity=1)
+
+
+class FetchError(Exception):
+  def __init__(self, message, retry_after=None):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+
+# Download an article page (from the shared HTTP cache when possible)
+def fetch(url):
+  response = cached_get(url, limiter=_FORBES_LIMITER)
+  if response.status_code == 429:
+    wait = retry_after_seconds(response.headers, default=60.0)
+    _FORBES_LIMITER.pause(wait)
+    raise FetchError("rate limited (429)", retry_after=wait)
+  if not response.ok:
+    raise FetchError(f"HTTP {response.status_code}")
+  return response.content
+
+# Get critical elements from article webpage (runs in a worker process)
+def parse_article(html):
+  soup = BeautifulSoup(html, 'html.parser')
+  headings, times = soup.find_all('h1'), soup.find_all('time')
+  p = [elem.text.strip() for elem in soup.find_all('p')]
+  if not headings or not times or len(p) < 3:
+    raise ValueError("article elements not found (blocked or partial page)")
+  title = headings[0].text.strip()
+  date = times[0].text.strip()
+  author = p[0][2:-1]
+  body = "\n".join(p[2:])
   return title, date, author, body
 
-# Open CSV containing links
-df = pd.DataFrame(pd.read_csv("forbes_search.csv"))
-links = df['Link'].tolist()
-numLinks = len(links)
-
-data = [["0"] for i in range(numLinks)]
-
-# Loop through articles until all articles have been scraped
-passNum = 1
-while(True):
-  for i in range(numLinks):
-    if data[i][0] == "0":
-      print(f"Scraping article {i+1} of {numLinks}")
-      dataAquired = False
-      data[i] = scrape(links[i], [random.uniform(1,3)], False)
-
-  # Post-pass
-  passNum += 1
-  aquired = 0
-  for i in range(numLinks):
-    if data[i][0] != "0": aquired += 1
-  print(f"Scraped {aquired} out of {numLinks} articles")
-  if aquired == numLinks: break
-  print(f"Waiting before starting pass {passNum}...")
-  time.sleep(5)
-print("Scraping Complete")
-
-# Export data as CSV
-df_final = pd.DataFrame(data, columns=['Title', 'Time', 'Author', 'Body'])
-df_final.insert(0, 'Link', df['Link'])
-df_final.to_csv('forbes_articles.csv', index=True)
-df_final.head(10)
\ No newline at end of file
+# Don't replay a bad (blocked/partial) page from the cache on the retry
+def drop_cached_page(url, error):
+  default_cache().invalidate("GET", url)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Scrape Forbes articles listed in a links CSV")
+  parser.add_argument("--links", default="forbes_search.csv")
+  parser.add_argument("--out", default="forbes_articles.csv")
+  parser.add_argument("--queue", default=QUEUE_DB)
+  parser.add_argument("--retry-failed", action="store_true", help="give failed URLs a fresh set of attempts")
+  parser.add_argument("--inline-body", action="store_true", help="also write each body into the CSV (Body column)")
+  args = parser.parse_args()
+
+  columns = COLUMNS + ['Body'] if args.inline_body else COLUMNS
+  # Rows are appended, so an existing output has to have the same layout
+  if os.path.exists(args.out) and os.path.getsize(args.out):
+    existing = list(pd.read_csv(args.out, index_col=0, nrows=0).columns)
+    if existing != columns:
+      parser.error(f"{args.out} has columns {existing}, this run writes {columns}; "
+                   f"pick another --out" + ("" if args.inline_body else " or pass --inline-body"))
+
+  # Open CSV containing links
+  links = pd.read_csv(args.links)['Link'].tolist()
+  queue = ScrapeQueue(args.queue)
+  print(f"Queued {queue.add(links)} new of {len(links)} links")
+  if args.retry_failed:
+    print(f"Retrying {queue.reset_failed()} failed links")
+
+  store = default_store()
+  sink = CsvSink(args.out, columns)
+
+  # Bodies live in the document store; identical syndicated bodies share one id
+  def emit(position, url, row):
+    title, date, author, body = row
+    values = [url, title, date, author, store.put(body, [url])]
+    sink.write(position, values + [body] if args.inline_body else values)
+
+  try:
+    counts = run_queue(queue, fetch, parse_article, emit, fetch_workers=FETCH_WORKERS,
+                       parse_workers=PARSE_WORKERS, on_error=drop_cached_page)
+  finally:
+    sink.close()
+
+  print(f"Scraped {counts.get('done', 0)} out of {sum(counts.values())} articles"
+        + (f" ({counts['failed']} failed, rerun with --retry-failed)" if counts.get('failed') else ""))
+  # Rows were appended in completion order; put them back in input order
+  df_final = compact_csv(args.out)
+  print(df_final.head(10))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,268 @@
+# backtest.py
+#
+# Vectorized walk-forward backtest for sentiment signals.
+#
+# Input is a scored stream: one row per article/filing with ticker, date and
+# either a numeric "signal" (e.g. P(UP) - P(DOWN)) or a "label"
+# (UP/DOWN/NEUTRAL -> +1/-1/0). Everything after that is NumPy on a
+# (trading days x tickers) grid taken from PriceStore.arrays():
+#   1. each row lands on the first trading day on or after its date, and rows
+#      are averaged per ticker-day into one signal;
+#   2. a non-zero signal on day t opens a 1/horizon tranche at the close of
+#      day t + entry_lag, closed `horizon` trading days later, so overlapping
+#      signals stack (positions come from one cumulative sum, no loop);
+#   3. daily PnL is position x close-to-close return, minus cost_bps on every
+#      unit of turnover, with equal capital per ticker that has prices;
+#   4. Sharpe (annualized, 252 days), max drawdown, total/annual return and
+#      the per-trade hit rate come out of array reductions over all tickers.
+# Horizons and lags here count trading days (labeling.py's count calendar days).
+#
+# walk_forward_scores() produces the stream for the TF-IDF + LR model without
+# look-ahead: the model is refit on a rolling (or expanding) window before
+# each test period, and training stops embargo_days before the period starts
+# so no training label peeks into it.
+#
+#   python backtest.py [--dataset data/all_sources | --scored scored.csv] [--horizons 3 5]
+#                      [--entry-lag 1] [--cost-bps 5] [--train-days 1095] [--step-days 182]
+
+import argparse
+import os
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import PRICE_DIR, PriceStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, "../data/all_sources")
+
+TRADING_DAYS = 252
+LABEL_SIGNAL = {"UP": 1.0, "DOWN": -1.0, "NEUTRAL": 0.0}
+
+
+"""
+Signals
+"""
+def to_signal(scored: pd.DataFrame) -> np.ndarray:
+    """The row's "signal" if present, else its label mapped to +1/-1/0 (scaled by "confidence" if present)."""
+    if "signal" in scored.columns:
+        return pd.to_numeric(scored["signal"], errors="coerce").to_numpy(dtype=float)
+    sig = scored["label"].astype(str).str.upper().map(LABEL_SIGNAL).to_numpy(dtype=float)
+    if "confidence" in scored.columns:
+        sig = sig * pd.to_numeric(scored["confidence"], errors="coerce").to_numpy(dtype=float)
+    return sig
+
+
+def signal_matrix(scored: pd.DataFrame, dates: np.ndarray, tickers: list) -> np.ndarray:
+    """(days, tickers) mean signal per ticker-day; 0 where nothing was published."""
+    sig = to_signal(scored)
+    col = pd.Index(tickers).get_indexer(scored["ticker"].astype(str).str.upper())
+    d = pd.to_datetime(scored["date"]).to_numpy(dtype="datetime64[ns]")
+    day = np.searchsorted(dates, d, side="left")
+    ok = (col >= 0) & (day < len(dates)) & ~np.isnat(d) & np.isfinite(sig)
+
+    total = np.zeros((len(dates), len(tickers)))
+    count = np.zeros_like(total)
+    np.add.at(total, (day[ok], col[ok]), sig[ok])
+    np.add.at(count, (day[ok], col[ok]), 1.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, 0.0)
+
+
+def positions(direction: np.ndarray, horizon: int, entry_lag: int = 1) -> np.ndarray:
+    """
+    Position held at each close: the sum of the tranches (1/horizon each) opened
+    at close t+entry_lag by direction[t] and not yet closed.
+    """
+    n_days = direction.shape[0]
+    csum = np.vstack([np.zeros((1, direction.shape[1])), np.cumsum(direction, axis=0)])  # csum[i] = sum of rows < i
+    hi = np.clip(np.arange(n_days) - entry_lag + 1, 0, n_days)
+    lo = np.clip(hi - horizon, 0, n_days)
+    return (csum[hi] - csum[lo]) / horizon
+
+
+"""
+Metrics
+"""
+def summarize(daily: np.ndarray) -> dict:
+    """Performance stats of a daily return series."""
+    daily = np.nan_to_num(np.asarray(daily, dtype=float))
+    equity = np.cumprod(1.0 + daily)
+    std = daily.std()
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0 if len(equity) else np.zeros(1)
+    years = len(daily) / TRADING_DAYS
+    return {
+        "total_return": float(equity[-1] - 1.0) if len(equity) else 0.0,
+        "annual_return": float(equity[-1] ** (1.0 / years) - 1.0) if len(equity) and equity[-1] > 0 else np.nan,
+        "sharpe": float(daily.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else np.nan,
+        "max_drawdown": float(drawdown.min()),
+    }
+
+
+def trade_returns(direction: np.ndarray, closes: np.ndarray, horizon: int, entry_lag: int,
+                  cost: float) -> np.ndarray:
+    """Net return of every completed trade (signed, after a round trip of costs)."""
+    day, col = np.nonzero(direction)
+    entry, exit_ = day + entry_lag, day + entry_lag + horizon
+    ok = exit_ < closes.shape[0]
+    day, col, entry, exit_ = day[ok], col[ok], entry[ok], exit_[ok]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret = closes[exit_, col] / closes[entry, col] - 1.0
+    ret = direction[day, col] * ret - 2 * cost
+    return ret[np.isfinite(ret)]
+
+
+"""
+Backtest
+"""
+def run_backtest(scored: pd.DataFrame, prices: PriceStore, horizons: Iterable[int] = (3, 5),
+                 entry_lag: int = 1, cost_bps: float = 5.0, threshold: float = 0.0,
+                 start=None, end=None, refresh: bool = False) -> dict:
+    """
+    Backtests the scored stream for every holding horizon at once.
+
+    Returns {"metrics": one row per horizon, "daily": portfolio net returns per
+    horizon (indexed by date), "per_ticker": one row per (horizon, ticker)}.
+    A ticker-day trades when |mean signal| > threshold.
+    """
+    tickers = sorted(scored["ticker"].astype(str).str.upper().unique())
+    dates, closes, tickers = prices.arrays(tickers, start, end, refresh=refresh)
+    closes = pd.DataFrame(closes).ffill().to_numpy()  # a missing bar carries the last close
+    listed = np.isfinite(closes)
+    n_listed = np.maximum(listed.sum(axis=1), 1)  # capital is split over the tickers that have prices that day
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.vstack([np.zeros((1, len(tickers))), closes[1:] / closes[:-1] - 1.0])
+    returns = np.nan_to_num(returns)
+
+    daily_signal = signal_matrix(scored, dates, tickers)
+    direction = np.sign(daily_signal) * (np.abs(daily_signal) > threshold) * listed
+    cost = cost_bps / 1e4
+
+    metrics, per_ticker, daily = [], [], {}
+    for h in horizons:
+        pos = positions(direction, int(h), entry_lag) * listed
+        turnover = np.abs(np.diff(pos, axis=0, prepend=0.0))
+        # Position held at yesterday's close earns today's return
+        pnl = np.vstack([np.zeros((1, len(tickers))), pos[:-1] * returns[1:]]) - cost * turnover
+        portfolio = pnl.sum(axis=1) / n_listed
+        trades = trade_returns(direction, closes, int(h), entry_lag, cost)
+
+        stats = summarize(portfolio)
+        stats.update(horizon=int(h), exposure=float((np.abs(pos).sum(axis=1) / n_listed).mean()),
+                     turnover=float((turnover.sum(axis=1) / n_listed).mean()), trades=len(trades),
+                     hit_rate=float((trades > 0).mean()) if len(trades) else np.nan,
+                     avg_trade=float(trades.mean()) if len(trades) else np.nan)
+        metrics.append(stats)
+        daily[f"{h}d"] = portfolio
+
+        # Per-ticker stats over all tickers at once
+        std = pnl.std(axis=0)
+        equity = np.cumprod(1.0 + pnl, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sharpe = np.where(std > 0, pnl.mean(axis=0) / std * np.sqrt(TRADING_DAYS), np.nan)
+        per_ticker.append(pd.DataFrame({
+            "horizon": int(h), "ticker": tickers,
+            "total_return": equity[-1] - 1.0,
+            "sharpe": sharpe,
+            "max_drawdown": (equity / np.maximum.accumulate(equity, axis=0) - 1.0).min(axis=0),
+            "signal_days": (direction != 0).sum(axis=0),
+        }))
+
+    columns = ["horizon", "total_return", "annual_return", "sharpe", "max_drawdown", "hit_rate",
+               "avg_trade", "trades", "exposure", "turnover"]
+    return {
+        "metrics": pd.DataFrame(metrics)[columns],
+        "daily": pd.DataFrame(daily, index=pd.DatetimeIndex(dates, name="date")),
+        "per_ticker": pd.concat(per_ticker, ignore_index=True),
+    }
+
+
+"""
+Walk-forward scoring
+"""
+def walk_forward_scores(docs: pd.DataFrame, fit: Optional[Callable] = None, text_col: str = "text",
+                        label_col: str = "label_3d", train_days: Optional[int] = 3 * 365,
+                        step_days: int = 182, embargo_days: int = 5, min_train: int = 50) -> pd.DataFrame:
+    """
+    Out-of-sample scores for docs: for each step_days period, fit(texts, labels)
+    -> (vectorizer, model) is trained on the train_days before it (all history if
+    None), stopping embargo_days short of the period, then scores the period.
+    Returns the scored rows with "signal" (P(UP) - P(DOWN)), "label" and "window".
+    """
+    if fit is None:
+        from tfidf_lr_model import fit
+    docs = docs.assign(date=pd.to_datetime(docs["date"])).sort_values("date", kind="stable")
+    labeled = docs[docs[label_col].isin(LABEL_SIGNAL)]
+    if labeled.empty: return docs.iloc[0:0].assign(signal=[], label=[], window=[])
+
+    first, last = docs["date"].min(), docs["date"].max()
+    period = pd.Timedelta(days=step_days)
+    start = first + pd.Timedelta(days=train_days if train_days else step_days)
+    out = []
+    while start <= last:
+        cutoff = start - pd.Timedelta(days=embargo_days)
+        train = labeled[(labeled["date"] < cutoff) &
+                        ((labeled["date"] >= start - pd.Timedelta(days=train_days)) if train_days else True)]
+        test = docs[(docs["date"] >= start) & (docs["date"] < start + period)]
+        if len(test) and len(train) >= min_train and train[label_col].nunique() > 1:
+            vectorizer, model = fit(train[text_col].astype(str), train[label_col].astype(str))
+            proba = model.predict_proba(vectorizer.transform(test[text_col].astype(str)))
+            classes = list(model.classes_)
+            col = lambda c: proba[:, classes.index(c)] if c in classes else np.zeros(len(test))
+            out.append(test.assign(signal=col("UP") - col("DOWN"),
+                                   label=np.asarray(classes, dtype=object)[proba.argmax(axis=1)],
+                                   window=start))
+        start += period
+    if not out: return docs.iloc[0:0].assign(signal=[], label=[], window=[])
+    return pd.concat(out)
+
+
+def load_dataset_docs(dataset_dir: str = DATASET_DIR, label_col: str = "label_3d") -> pd.DataFrame:
+    """Merged-dataset rows (see merged_dataset.py) with a "text" column of title + snippet."""
+    from merged_dataset import MergedDataset
+    df = MergedDataset(dataset_dir).read(columns=["ticker", "date", "title", "snippet", label_col])
+    df["ticker"] = df["ticker"].astype(str)
+    df["text"] = df["title"].fillna("").astype(str) + " " + df["snippet"].fillna("").astype(str)
+    return df.drop(columns=["title", "snippet"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of sentiment signals")
+    parser.add_argument("--dataset", default=DATASET_DIR, help="merged dataset to score walk-forward")
+    parser.add_argument("--scored", help="CSV of already scored rows (ticker, date, signal or label)")
+    parser.add_argument("--label-col", default="label_3d")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[3, 5], help="holding periods in trading days")
+    parser.add_argument("--entry-lag", type=int, default=1, help="trading days from signal to entry close")
+    parser.add_argument("--cost-bps", type=float, default=5.0, help="cost per unit of turnover, in bps")
+    parser.add_argument("--threshold", type=float, default=0.0, help="minimum |signal| to trade")
+    parser.add_argument("--train-days", type=int, default=3 * 365, help="rolling train window (0: expanding)")
+    parser.add_argument("--step-days", type=int, default=182, help="retrain every this many days")
+    parser.add_argument("--embargo-days", type=int, default=5)
+    parser.add_argument("--prices", default=PRICE_DIR)
+    parser.add_argument("--refresh", action="store_true", help="download missing price history first")
+    args = parser.parse_args()
+
+    if args.scored:
+        scored = pd.read_csv(args.scored)
+    else:
+        docs = load_dataset_docs(args.dataset, args.label_col)
+        scored = walk_forward_scores(docs, label_col=args.label_col, train_days=args.train_days or None,
+                                     step_days=args.step_days, embargo_days=args.embargo_days)
+        print(f"Scored {len(scored)} of {len(docs)} rows out of sample "
+              f"in {scored['window'].nunique() if len(scored) else 0} windows")
+    if scored.empty:
+        print("Nothing to backtest")
+        return
+
+    start = pd.to_datetime(scored["date"]).min()
+    result = run_backtest(scored, PriceStore(args.prices), horizons=args.horizons, entry_lag=args.entry_lag,
+                          cost_bps=args.cost_bps, threshold=args.threshold, start=start, refresh=args.refresh)
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print("\nPortfolio:\n", result["metrics"].round(4).to_string(index=False))
+        print("\nPer ticker:\n", result["per_ticker"].round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
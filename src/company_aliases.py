@@ -0,0 +1,13 @@
+# company_aliases.py
+#
+# Company names per ticker, shared by the EDGAR and GDELT pipelines.
+#
+# Kept in its own module so that importing the names does not run either
+# pipeline's module-level setup (directories, HTTP sessions, checkpoints).
+
+# Company names used as EDGAR search-index keys (also fed to the shared alias matcher)
+ALIAS_MAP = {
+    "NVDA": ["NVIDIA", "NVIDIA Corporation"],
+    "AMD":  ["AMD", "Advanced Micro Devices"],
+    "TSM":  ["TSMC", "Taiwan Semiconductor"],
+}
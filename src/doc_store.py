@@ -0,0 +1,138 @@
+# doc_store.py
+#
+# Content-addressed full-text store for filings and articles.
+#
+# A document's id is the SHA-256 of its normalized text (whitespace runs
+# collapsed, ends stripped), so identical bodies -- re-filed amendments,
+# syndicated articles -- are stored once. Bodies are compressed with zstd
+# (zlib when the zstandard package isn't installed) under <repo>/data/docs/blobs, and
+# a SQLite index maps references (URLs, accession numbers) to ids. Labeled
+# datasets carry a doc_id column instead of the text itself.
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Anchored to the repo, so every pipeline shares one store whatever its working directory
+DOC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "docs")
+ZSTD_LEVEL = 10
+
+_WS = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WS.sub(" ", text or "").strip()
+
+
+def doc_id(text: str) -> str:
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+class DocStore:
+    def __init__(self, root: str = DOC_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY, codec TEXT, size INTEGER, stored_size INTEGER, stored_at REAL)""")
+        self._db.execute("CREATE TABLE IF NOT EXISTS refs (ref TEXT PRIMARY KEY, doc_id TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS refs_doc ON refs(doc_id)")
+        self._db.commit()
+
+    # ---- blobs ----
+    def _blob_path(self, did: str, codec: str) -> str:
+        return os.path.join(self.root, "blobs", did[:2], f"{did}.{codec}")
+
+    @staticmethod
+    def _compress(data: bytes):
+        if zstandard is not None:
+            return "zst", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return "z", zlib.compress(data, 6)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zst":
+            if zstandard is None:
+                raise RuntimeError("document was stored with zstd; install the zstandard package to read it")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    # ---- writes ----
+    def put(self, text: str, refs: Iterable[str] = ()) -> Optional[str]:
+        """Stores text (once per distinct normalized body) and points refs at it. Blank text -> None."""
+        body = normalize(text)
+        if not body: return None
+        did = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM docs WHERE doc_id=?", (did,)).fetchone()
+        if known is None:
+            raw = body.encode("utf-8")
+            codec, data = self._compress(raw)
+            path = self._blob_path(did, codec)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            if known is None:
+                self._db.execute("INSERT OR IGNORE INTO docs VALUES (?,?,?,?,?)",
+                                 (did, codec, len(raw), len(data), time.time()))
+            self._db.executemany("INSERT OR REPLACE INTO refs VALUES (?,?)",
+                                 [(r, did) for r in refs if r])
+            self._db.commit()
+        return did
+
+    def put_many(self, texts: Iterable[str], refs: Iterable[Iterable[str]] = None) -> List[Optional[str]]:
+        """put() for each text; refs[i] are the references of texts[i]."""
+        texts = list(texts)
+        refs = list(refs) if refs is not None else [()] * len(texts)
+        return [self.put(t, r) for t, r in zip(texts, refs)]
+
+    # ---- reads ----
+    def lookup(self, ref: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT doc_id FROM refs WHERE ref=?", (ref,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, did: Optional[str]) -> Optional[str]:
+        """Normalized text of a document, or None for a missing/blank id."""
+        if not did: return None
+        with self._lock:
+            row = self._db.execute("SELECT codec FROM docs WHERE doc_id=?", (did,)).fetchone()
+        if row is None: return None
+        with open(self._blob_path(did, row[0]), "rb") as f:
+            return self._decompress(row[0], f.read()).decode("utf-8")
+
+    def get_many(self, dids: Iterable[Optional[str]]) -> List[Optional[str]]:
+        return [self.get(d) for d in dids]
+
+    def stats(self) -> dict:
+        with self._lock:
+            docs, size, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM docs").fetchone()
+            refs = self._db.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        return {"docs": docs, "refs": refs, "bytes": size, "stored_bytes": stored}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_store() -> DocStore:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = DocStore()
+        return _default
@@ -0,0 +1,132 @@
+# edgar_checkpoint.py
+#
+# Resume state for the streaming EDGAR filings loader.
+#
+# Every page the loader fetches (a submissions file, one search-index page, one
+# classic-EDGAR listing page) belongs to a (cik, source, chunk) stream. The
+# page's normalized filings are written to their own Parquet part under
+# data/edgar_filings/<cik>/ and only then is the stream's cursor advanced in
+# cursors.sqlite. A restart skips finished streams and resumes the rest at
+# their cursor; a page replayed after a crash overwrites the same part, so
+# replays never duplicate rows. A stream whose content can change under a
+# stable name (the submissions "recent" list) carries a version; when the
+# version changes its pages and cursor are dropped and it is read again.
+
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FILINGS_DIR = os.path.join("data", "edgar_filings")
+
+FILING_SCHEMA = pa.schema([
+    ("filingDate", pa.timestamp("ns")),
+    ("window_date", pa.timestamp("ns")),
+    ("form", pa.string()),
+    ("form_base", pa.string()),
+    ("doc_url", pa.string()),
+    ("accessionNumber", pa.string()),
+    ("primaryDocument", pa.string()),
+    ("primaryDocDescription", pa.string()),
+])
+FILING_COLUMNS = FILING_SCHEMA.names
+
+
+def _cik10(cik: str) -> str:
+    return f"{int(cik):010d}"
+
+
+class FilingCheckpoint:
+    def __init__(self, root: str = FILINGS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "cursors.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                cik TEXT, source TEXT, chunk TEXT, position INTEGER, raw_rows INTEGER, done INTEGER,
+                PRIMARY KEY (cik, source, chunk))""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS versions (
+                cik TEXT, source TEXT, chunk TEXT, version TEXT,
+                PRIMARY KEY (cik, source, chunk))""")
+        self._db.commit()
+
+    def cursor(self, cik: str, source: str, chunk: str) -> Tuple[int, int, bool]:
+        """(next page position, raw rows fetched so far, finished) for one stream."""
+        with self._lock:
+            row = self._db.execute("SELECT position, raw_rows, done FROM cursors WHERE cik=? AND source=? AND chunk=?",
+                                   (_cik10(cik), source, chunk)).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else (0, 0, False)
+
+    def advance(self, cik: str, source: str, chunk: str, position: int, raw_rows: int, done: bool = False) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cursors VALUES (?,?,?,?,?,?)",
+                             (_cik10(cik), source, chunk, position, raw_rows, int(done)))
+            self._db.commit()
+
+    def chunks(self, cik: str, source: str) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT chunk FROM cursors WHERE cik=? AND source=?",
+                                                   (_cik10(cik), source))]
+
+    def renew(self, cik: str, source: str, chunk: str, version: str) -> bool:
+        """Drops the stream's pages and cursor if its content version changed; True if it did."""
+        with self._lock:
+            row = self._db.execute("SELECT version FROM versions WHERE cik=? AND source=? AND chunk=?",
+                                   (_cik10(cik), source, chunk)).fetchone()
+        if row is not None and row[0] == version: return False
+        self.drop_stream(cik, source, chunk)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO versions VALUES (?,?,?,?)", (_cik10(cik), source, chunk, version))
+            self._db.commit()
+        return True
+
+    def drop_stream(self, cik: str, source: str, chunk: str) -> None:
+        """Forgets one stream's cursor, version and stored pages."""
+        with self._lock:
+            for table in ("cursors", "versions"):
+                self._db.execute(f"DELETE FROM {table} WHERE cik=? AND source=? AND chunk=?", (_cik10(cik), source, chunk))
+            self._db.commit()
+        for p in glob.glob(self._part_path(cik, source, chunk, None)):
+            os.remove(p)
+
+    def _part_path(self, cik: str, source: str, chunk: str, position: Optional[int]) -> str:
+        """Path of one page's part; position None gives a glob over all of the stream's parts."""
+        tag = hashlib.sha1(chunk.encode("utf-8")).hexdigest()[:12]
+        page = "*" if position is None else f"{position:05d}"
+        return os.path.join(self.root, _cik10(cik), f"{source}-{tag}-{page}.parquet")
+
+    def write_page(self, cik: str, source: str, chunk: str, position: int, df: pd.DataFrame) -> None:
+        if df.empty: return
+        path = self._part_path(cik, source, chunk, position)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df[FILING_COLUMNS], schema=FILING_SCHEMA, preserve_index=False)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+    def read(self, cik: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Every stored filing for cik (optionally within [start, end] by window_date), in page order."""
+        paths = sorted(glob.glob(os.path.join(self.root, _cik10(cik), "*.parquet")))
+        if not paths: return FILING_SCHEMA.empty_table().to_pandas()
+        filters = []
+        if start is not None: filters.append(("window_date", ">=", pd.Timestamp(start)))
+        if end is not None: filters.append(("window_date", "<=", pd.Timestamp(end)))
+        tables = [pq.read_table(p, filters=filters or None) for p in paths]
+        return pa.concat_tables(tables).to_pandas()
+
+    def reset(self, cik: str) -> None:
+        """Forgets every cursor and stored page for cik."""
+        with self._lock:
+            self._db.execute("DELETE FROM cursors WHERE cik=?", (_cik10(cik),))
+            self._db.execute("DELETE FROM versions WHERE cik=?", (_cik10(cik),))
+            self._db.commit()
+        for p in glob.glob(os.path.join(self.root, _cik10(cik), "*.parquet")):
+            os.remove(p)
@@ -0,0 +1,211 @@
+# edgar_index.py
+#
+# Local filing index built from EDGAR's bulk index files.
+#
+# Instead of discovering filings company by company, the quarterly
+# full-index/<year>/QTR<q>/master.idx files (one per quarter, every filer) are
+# downloaded once and parsed in a single vectorized read into one Parquet file
+# per quarter under data/edgar_index/. Past quarters never change, so they are
+# fetched exactly once. The running quarter is assembled from the
+# daily-index/<year>/QTR<q>/master.<YYYYMMDD>.idx files instead, one small file
+# per finished day, so keeping it current does not re-download a growing
+# quarterly file. Filings for any set of CIKs and forms are then answered
+# locally: the HTTP cost depends on the date range, not the number of
+# companies.
+#
+# master.idx rows are CIK|Company Name|Form Type|Date Filed|Filename, where
+# Filename is the full submission text (edgar/data/<cik>/<accession>.txt): SGML
+# holding every exhibit, often with uuencoded binaries. It is never used as
+# the document. filings() returns each filing's index page instead
+# (<accession>-index.htm), and parse_filing_index() reads the primary
+# document (sequence 1 of "Document Format Files") from that page.
+
+import datetime as dt
+import glob
+import io
+import os
+import re
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bs4 import BeautifulSoup
+
+INDEX_DIR = os.path.join("data", "edgar_index")
+ARCHIVES = "https://www.sec.gov/Archives/"
+SEC = "https://www.sec.gov"
+
+# A missing daily index younger than this may just not be published yet
+DAILY_GRACE_DAYS = 3
+
+INDEX_SCHEMA = pa.schema([
+    ("cik", pa.int64()),
+    ("company", pa.string()),
+    ("form", pa.string()),
+    ("filingDate", pa.timestamp("ns")),
+    ("filename", pa.string()),
+])
+
+
+def _quarter(d: dt.date) -> int:
+    return (d.month - 1) // 3 + 1
+
+
+def _quarters(start, end) -> List[tuple]:
+    s, e = pd.Timestamp(start), pd.Timestamp(end)
+    return [(p.year, p.quarter) for p in pd.period_range(s, e, freq="Q")]
+
+
+def parse_master_index(text: str) -> pd.DataFrame:
+    """Parses the body of a master.idx file (full or daily) into INDEX_SCHEMA columns."""
+    # Data starts after the dashed rule under the column header
+    lines = text.splitlines()
+    start = next((i + 1 for i, line in enumerate(lines) if line.startswith("-----")), None)
+    if start is None: return INDEX_SCHEMA.empty_table().to_pandas()
+    df = pd.read_csv(io.StringIO("\n".join(lines[start:])), sep="|", header=None, dtype=str,
+                     names=["cik", "company", "form", "filingDate", "filename"],
+                     on_bad_lines="skip", keep_default_na=False, quoting=3)
+    df["cik"] = pd.to_numeric(df["cik"], errors="coerce")
+    # Daily files use YYYYMMDD, quarterly ones YYYY-MM-DD
+    dates = df["filingDate"].str.replace("-", "", regex=False)
+    df["filingDate"] = pd.to_datetime(dates, format="%Y%m%d", errors="coerce")
+    df = df.dropna(subset=["cik", "filingDate"])
+    df["cik"] = df["cik"].astype("int64")
+    df["form"] = df["form"].str.strip()
+    return df.reset_index(drop=True)
+
+
+def index_page_url(filename: str) -> str:
+    """edgar/data/<cik>/<accession>.txt -> the filing's <accession>-index.htm page."""
+    folder, name = filename.rsplit("/", 1)
+    acc = name[:-4] if name.endswith(".txt") else name
+    return f"{ARCHIVES}{folder}/{acc.replace('-', '')}/{acc}-index.htm"
+
+
+def parse_filing_index(html: str) -> Optional[Tuple[str, str, str]]:
+    """
+    (primary document URL, description, type) from a filing index page: the
+    sequence-1 row of its "Document Format Files" table. None if the page has no
+    such row.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    table = soup.find("table", summary="Document Format Files") or soup.find("table", class_="tableFile")
+    if table is None: return None
+    for tr in table.find_all("tr"):
+        cells = tr.find_all("td")
+        if len(cells) < 4 or cells[0].get_text(strip=True) != "1": continue
+        a = cells[2].find("a", href=True)
+        if a is None: return None
+        # Inline XBRL documents are linked through the viewer: /ix?doc=/Archives/...
+        href = re.sub(r"^/ix\?doc=", "", a["href"])
+        url = href if href.startswith("http") else SEC + href
+        return url, cells[1].get_text(strip=True), cells[3].get_text(strip=True)
+    return None
+
+
+class EdgarIndex:
+    def __init__(self, fetch: Callable[[str, Optional[float]], Optional[str]], root: str = INDEX_DIR):
+        """
+        fetch(url, ttl) returns the body of an index file, "" for a file that does not
+        exist (404), or None on any other failure. ttl is passed through for callers
+        that cache responses (None = immutable).
+        """
+        self.fetch = fetch
+        self.root = root
+        for sub in ("quarters", "daily"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _quarter_path(self, year: int, q: int) -> str:
+        return os.path.join(self.root, "quarters", f"{year}Q{q}.parquet")
+
+    def _daily_path(self, day: dt.date) -> str:
+        return os.path.join(self.root, "daily", f"{day:%Y%m%d}.parquet")
+
+    @staticmethod
+    def _write(df: pd.DataFrame, path: str) -> None:
+        table = pa.Table.from_pandas(df[INDEX_SCHEMA.names], schema=INDEX_SCHEMA, preserve_index=False)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    def ingest_text(self, text: str, path: str) -> int:
+        """Parses one master.idx body and stores it at path; returns the row count."""
+        df = parse_master_index(text)
+        self._write(df, path)
+        return len(df)
+
+    def ingest_file(self, idx_path: str, year: int, q: int) -> int:
+        """Loads a quarter from a local master.idx (e.g. a fixture or a manual download)."""
+        with open(idx_path, encoding="latin-1") as f:
+            return self.ingest_text(f.read(), self._quarter_path(year, q))
+
+    def refresh(self, start, end, today: Optional[dt.date] = None) -> None:
+        """Makes sure every quarter overlapping [start, end] is indexed locally."""
+        today = today or dt.date.today()
+        for year, q in _quarters(start, end):
+            if (year, q) < (today.year, _quarter(today)):
+                if os.path.exists(self._quarter_path(year, q)): continue
+                url = f"{ARCHIVES}edgar/full-index/{year}/QTR{q}/master.idx"
+                text = self.fetch(url, None)
+                if text is None:
+                    print(f"  [edgar-index] {year} QTR{q} failed; will retry next run")
+                    continue
+                n = self.ingest_text(text, self._quarter_path(year, q))
+                print(f"  [edgar-index] {year} QTR{q}: {n:,} filings")
+            elif (year, q) == (today.year, _quarter(today)):
+                self._refresh_days(pd.Timestamp(year=year, month=3 * q - 2, day=1).date(),
+                                   min(pd.Timestamp(end).date(), today - dt.timedelta(days=1)), today)
+
+    def _refresh_days(self, first: dt.date, last: dt.date, today: dt.date) -> None:
+        for day in pd.bdate_range(first, last).date:
+            if os.path.exists(self._daily_path(day)): continue
+            url = f"{ARCHIVES}edgar/daily-index/{day.year}/QTR{_quarter(day)}/master.{day:%Y%m%d}.idx"
+            text = self.fetch(url, None)
+            if text is None: continue
+            # "" = no file. A recent day may simply not be published yet, so ask again
+            # next run; an old one is a holiday: store it empty so it is not asked for again
+            if text == "" and (today - day).days < DAILY_GRACE_DAYS: continue
+            self.ingest_text(text, self._daily_path(day))
+
+    def _paths(self, start, end) -> List[str]:
+        paths = [self._quarter_path(y, q) for y, q in _quarters(start, end)]
+        paths = [p for p in paths if os.path.exists(p)]
+        s, e = pd.Timestamp(start).strftime("%Y%m%d"), pd.Timestamp(end).strftime("%Y%m%d")
+        for p in sorted(glob.glob(os.path.join(self.root, "daily", "*.parquet"))):
+            if s <= os.path.basename(p)[:8] <= e: paths.append(p)
+        return paths
+
+    def filings(self, ciks: Iterable, forms: Iterable[str], start, end) -> pd.DataFrame:
+        """
+        Filings by any of `ciks` whose base form (amendments folded in) is in `forms`,
+        filed within [start, end], in the loader's filing schema plus `cik`,
+        `company` and `index_url` columns. doc_url is the filing's index page until
+        the primary document is resolved from it (see parse_filing_index).
+        """
+        ciks = [int(c) for c in ciks]
+        forms = {f.upper() for f in forms}
+        # Pushed down to the Parquet reader: only matching row groups are decoded
+        wanted = list(forms | {f + "/A" for f in forms})
+        filters = [("cik", "in", ciks), ("form", "in", wanted),
+                   ("filingDate", ">=", pd.Timestamp(start)), ("filingDate", "<=", pd.Timestamp(end))]
+        tables = [pq.read_table(p, filters=filters) for p in self._paths(start, end)]
+        df = pa.concat_tables(tables).to_pandas() if tables else INDEX_SCHEMA.empty_table().to_pandas()
+
+        # edgar/data/<cik>/<accession>.txt -> accession number and Archives URL
+        acc = df["filename"].str.rsplit("/", n=1).str[-1].str.replace(".txt", "", regex=False)
+        out = pd.DataFrame({
+            "cik": df["cik"],
+            "filingDate": df["filingDate"],
+            "window_date": df["filingDate"],
+            "form": df["form"],
+            "form_base": df["form"].str.upper().str.replace(r"/A$", "", regex=True),
+            "doc_url": df["filename"].map(index_page_url),
+            "accessionNumber": acc,
+            "primaryDocument": "",
+            "primaryDocDescription": "",
+            "company": df["company"],
+            "index_url": df["filename"].map(index_page_url),
+        })
+        out = out.drop_duplicates(subset=["doc_url"])
+        return out.sort_values(["cik", "filingDate"], kind="stable").reset_index(drop=True)
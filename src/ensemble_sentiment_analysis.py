@@ -6,27 +6,63 @@
 #
 # In the case that all models yield a different result, VADER breaks the tie
 # because it has demonstrated higher accuracy so far.
+#
+# All three models are kept resident in the process-wide model registry, so
+# only the first call pays for loading. Call warmup() at startup to move that
+# cost out of the first request.
 
 import torch
 import numpy as np
 import pickle
 import os
+import json
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from model_registry import registry
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-BASE_MODEL = os.path.join(BASE_DIR, "tfidf_lr_model.pkl")
+# BASE_MODEL=src/online_model.pkl swaps in the incrementally trained model (online_model.py)
+BASE_MODEL = os.environ.get("BASE_MODEL", os.path.join(BASE_DIR, "tfidf_lr_model.pkl"))
+FINBERT_MODEL = "yiyanghkust/finbert-tone"
 
 labels = ["UP", "DOWN", "NEUTRAL"]
 
+"""
+Model Loading
+"""
+def _load_finbert():
+    model = AutoModelForSequenceClassification.from_pretrained(FINBERT_MODEL)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(FINBERT_MODEL)
+    return model, tokenizer
+
+def _load_base():
+    with open(BASE_MODEL, "rb") as f:
+        saved = pickle.load(f)
+    return saved["vectorizer"], saved["model"]
+
+registry.register("vader", SentimentIntensityAnalyzer)
+registry.register("finbert", _load_finbert)
+registry.register("base", _load_base)
+
+def warmup():
+    """Loads every ensemble model so the first text only pays for inference."""
+    registry.warmup(["vader", "finbert", "base"])
+
+def unload():
+    """Releases the ensemble models; they are reloaded lazily on next use."""
+    registry.unload(["vader", "finbert", "base"])
+
 """
 VADER Sentiment
 """
 def analyze_sentiment_vader(text):
-    vader_analyzer = SentimentIntensityAnalyzer()
+    vader_analyzer = registry.get("vader")
     scores = vader_analyzer.polarity_scores(text)
-    polarity = scores["compound"]
+    return _vader_label(scores["compound"])
 
+def _vader_label(polarity):
     if polarity > 0.05:
         return "UP"
     elif polarity < -0.05:
@@ -38,8 +74,7 @@ def analyze_sentiment_vader(text):
 FinBERT Sentiment
 """
 def analyze_sentiment_finbert(text):
-    finbert_model = AutoModelForSequenceClassification.from_pretrained("yiyanghkust/finbert-tone")
-    finbert_tokenizer = AutoTokenizer.from_pretrained("yiyanghkust/finbert-tone")
+    finbert_model, finbert_tokenizer = registry.get("finbert")
 
     if not text.strip():
         return 0.0, "NEUTRAL"
@@ -60,10 +95,7 @@ def analyze_sentiment_finbert(text):
 Base Model Sentiment
 """
 def analyze_sentiment_base(text):
-    with open(BASE_MODEL, "rb") as f:
-        saved = pickle.load(f)
-    vectorizer = saved["vectorizer"]
-    model = saved["model"]
+    vectorizer, model = registry.get("base")
 
     X_tfidf = vectorizer.transform([text])
     pred = model.predict(X_tfidf)[0]
@@ -73,23 +105,277 @@ def analyze_sentiment_base(text):
 """
 Voting Ensemble
 """
-def analyze_sentiment(text):
+def _vote(votes, tie_breaker):
+    vote_counts = {label: votes.count(label) for label in labels}
+
+    # Find max votes
+    max_votes = max(vote_counts.values())
+    candidates = [label for label, count in vote_counts.items() if count == max_votes]
+
+    # Tie breaker (VADER) decides between candidates
+    if len(candidates) > 1:
+        return tie_breaker
+    return candidates[0]
+
+def analyze_sentiment(text, cascade=False):
+    if cascade:
+        # FinBERT only runs if the cheap voters are unsure (see Cascade below)
+        return analyze_sentiment_cascade([text])[0][0]
+
     base_vote = analyze_sentiment_base(text)
     vader_vote = analyze_sentiment_vader(text)
     finbert_vote = analyze_sentiment_finbert(text)
 
     votes = [base_vote, vader_vote, finbert_vote]
     votes = [vader_vote, finbert_vote]
-    vote_counts = {label: votes.count(label) for label in labels}
 
-    # Find max votes
-    max_votes = max(vote_counts.values())
-    candidates = [label for label, count in vote_counts.items() if count == max_votes]
+    return _vote(votes, tie_breaker=vader_vote)
 
-    # VADER breaks tie
-    if len(candidates) > 1:
-        final_label = vader_vote
-    else:
-        final_label = candidates[0]
+"""
+Batched Ensemble
+
+Scores many texts with one pass per voter: a single vectorized TF-IDF + LR
+call, VADER over the whole list, and FinBERT in padded micro-batches sorted by
+token length so each batch is only padded to its own longest member.
+"""
+FINBERT_BATCH_SIZE = 32
+FINBERT_MAX_LENGTH = 512
+
+def _vader_probabilities(texts, with_compound=False):
+    vader_analyzer = registry.get("vader")
+    probs = np.zeros((len(texts), len(labels)), dtype=np.float32)
+    compound = np.zeros(len(texts), dtype=np.float32)
+    votes = []
+    for i, text in enumerate(texts):
+        scores = vader_analyzer.polarity_scores(text)
+        probs[i] = (scores["pos"], scores["neg"], scores["neu"])
+        compound[i] = scores["compound"]
+        votes.append(_vader_label(scores["compound"]))
+    if with_compound:
+        return probs, votes, compound
+    return probs, votes
+
+def _finbert_probabilities(texts, batch_size=FINBERT_BATCH_SIZE):
+    finbert_model, finbert_tokenizer = registry.get("finbert")
+
+    # Blank texts are NEUTRAL without touching the model
+    probs = np.zeros((len(texts), len(labels)), dtype=np.float32)
+    probs[:, labels.index("NEUTRAL")] = 1.0
+    keep = [i for i, text in enumerate(texts) if text.strip()]
+    if not keep:
+        return probs
+
+    encoded = finbert_tokenizer([texts[i] for i in keep], truncation=True, max_length=FINBERT_MAX_LENGTH)
+    order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        inputs = finbert_tokenizer.pad(
+            {key: [encoded[key][j] for j in batch] for key in encoded.keys()},
+            return_tensors="pt",
+        )
+        with torch.no_grad():
+            logits = finbert_model(**inputs).logits
+        probs[[keep[j] for j in batch]] = torch.softmax(logits, dim=1).numpy()
+
+    return probs
+
+def _base_probabilities(texts):
+    vectorizer, model = registry.get("base")
+
+    X_tfidf = vectorizer.transform(texts)
+    raw = model.predict_proba(X_tfidf)
+
+    # Reorder the classifier's columns to match `labels`
+    classes = list(model.classes_)
+    probs = np.zeros((len(texts), len(labels)), dtype=np.float32)
+    for j, label in enumerate(labels):
+        if label in classes:
+            probs[:, j] = raw[:, classes.index(label)]
+    return probs
+
+def analyze_sentiment_many(texts, batch_size=FINBERT_BATCH_SIZE):
+    """
+    Scores a list (or any iterable) of texts with the voting ensemble.
+
+    Returns (final_labels, probabilities) where final_labels[i] is the ensemble
+    label of texts[i] and probabilities maps each voter ("base", "vader",
+    "finbert") to an (n, 3) array whose columns follow `labels`.
+    """
+    texts = ["" if text is None else str(text) for text in texts]
+    if not texts:
+        return [], {name: np.zeros((0, len(labels)), dtype=np.float32)
+                    for name in ("base", "vader", "finbert")}
+
+    base_probs = _base_probabilities(texts)
+    vader_probs, vader_votes = _vader_probabilities(texts)
+    finbert_probs = _finbert_probabilities(texts, batch_size=batch_size)
+
+    finbert_votes = [labels[j] for j in finbert_probs.argmax(axis=1)]
+    final_labels = [
+        _vote([vader_vote, finbert_vote], tie_breaker=vader_vote)
+        for vader_vote, finbert_vote in zip(vader_votes, finbert_votes)
+    ]
+
+    probabilities = {"base": base_probs, "vader": vader_probs, "finbert": finbert_probs}
+    return final_labels, probabilities
+
+def label_confidences(final_labels, probabilities):
+    """Mean probability FinBERT and the base model give each final label."""
+    j = np.array([labels.index(label) for label in final_labels], dtype=int)
+    rows = np.arange(len(j))
+    # VADER's pos/neg/neu are token proportions, not class probabilities, so it has no say here
+    return (probabilities["finbert"][rows, j] + probabilities["base"][rows, j]) / 2
+
+def analyze_sentiment_with_confidence(text):
+    """
+    Returns (label, confidence) for one text. confidence is the mean probability
+    the probabilistic models (FinBERT's softmax, the base model's predict_proba)
+    give the ensemble label, in [0, 1].
+    """
+    final_labels, probabilities = analyze_sentiment_many([text])
+    return final_labels[0], float(label_confidences(final_labels, probabilities)[0])
+
+"""
+Confidence Gate
+
+Texts whose confidence reaches the gate keep the ensemble label; the rest go
+to the LLM adjudicator. The gate comes from confidence_gate.json when
+tune_confidence_gate() has written one, otherwise DEFAULT_CONFIDENCE_GATE.
+"""
+CONFIDENCE_GATE_FILE = os.path.join(BASE_DIR, "confidence_gate.json")
+DEFAULT_CONFIDENCE_GATE = 0.7
+
+def load_confidence_gate(path=CONFIDENCE_GATE_FILE):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return float(json.load(f)["gate"])
+    return DEFAULT_CONFIDENCE_GATE
+
+def tune_confidence_gate(texts, y_true, target_accuracy=0.85, path=CONFIDENCE_GATE_FILE,
+                         batch_size=FINBERT_BATCH_SIZE):
+    """
+    Picks the lowest gate at which the texts passing it (kept without the LLM)
+    are at least target_accuracy correct on a labeled validation set, and saves
+    it to `path` with its pass-through rate (share of texts kept).
+    """
+    texts = ["" if text is None else str(text) for text in texts]
+    y_true = np.array(y_true, dtype=object)
+    final_labels, probabilities = analyze_sentiment_many(texts, batch_size=batch_size)
+    confidence = label_confidences(final_labels, probabilities)
+    correct = np.array(final_labels, dtype=object) == y_true
+
+    result = None
+    for gate in np.round(np.arange(0.0, 1.0001, 0.01), 2):
+        passed = confidence >= gate
+        if not passed.any(): break
+        accuracy = float(correct[passed].mean())
+        if accuracy >= target_accuracy:
+            result = {"gate": float(gate), "pass_through": float(passed.mean()), "accuracy_passed": accuracy,
+                      "accuracy_all": float(correct.mean()), "n": len(texts)}
+            break
+
+    if result is None:
+        raise ValueError("no gate keeps the passing texts at target_accuracy")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+"""
+Cascade
+
+Runs the cheap voters (TF-IDF + LR and VADER) on everything and only sends
+texts they are unsure about to FinBERT. The cheap tier decides a text when
+both models agree, the LR margin (top probability minus runner-up) reaches
+base_margin, and, for UP/DOWN, |VADER compound| reaches vader_margin.
+Everything else is escalated and takes FinBERT's label. (Escalated texts are
+not re-voted like analyze_sentiment_many: with VADER breaking the two-voter
+tie, that vote always equals VADER and FinBERT could never change a label.)
+Thresholds come from cascade_thresholds.json when tune_cascade_thresholds()
+has written one, otherwise from the defaults below.
+"""
+CASCADE_THRESHOLDS_FILE = os.path.join(BASE_DIR, "cascade_thresholds.json")
+DEFAULT_CASCADE_THRESHOLDS = {"base_margin": 0.3, "vader_margin": 0.5}
+
+def load_cascade_thresholds(path=CASCADE_THRESHOLDS_FILE):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        return {k: float(saved[k]) for k in DEFAULT_CASCADE_THRESHOLDS}
+    return dict(DEFAULT_CASCADE_THRESHOLDS)
+
+def _cheap_decisions(base_probs, vader_votes, vader_compound, thresholds):
+    """(cheap label per text, mask of texts the cheap tier decides)"""
+    top2 = np.sort(base_probs, axis=1)[:, -2:]
+    base_margin = top2[:, 1] - top2[:, 0]
+    base_votes = np.array([labels[j] for j in base_probs.argmax(axis=1)], dtype=object)
+    vader_votes = np.array(vader_votes, dtype=object)
+
+    decided = (base_votes == vader_votes) & (base_margin >= thresholds["base_margin"])
+    polar = vader_votes != "NEUTRAL"
+    decided &= ~polar | (np.abs(vader_compound) >= thresholds["vader_margin"])
+    return base_votes, decided
+
+def analyze_sentiment_cascade(texts, thresholds=None, batch_size=FINBERT_BATCH_SIZE):
+    """
+    Scores texts with the cascade. Returns (final_labels, tiers) where tiers[i]
+    is "cheap" if TF-IDF/LR + VADER decided texts[i] and "finbert" if it was
+    escalated.
+    """
+    texts = ["" if text is None else str(text) for text in texts]
+    if not texts:
+        return [], []
+    thresholds = thresholds or load_cascade_thresholds()
+
+    base_probs = _base_probabilities(texts)
+    _, vader_votes, vader_compound = _vader_probabilities(texts, with_compound=True)
+    cheap_votes, decided = _cheap_decisions(base_probs, vader_votes, vader_compound, thresholds)
+
+    final_labels = list(cheap_votes)
+    tiers = ["cheap"] * len(texts)
+    escalate = np.flatnonzero(~decided)
+    if len(escalate):
+        finbert_probs = _finbert_probabilities([texts[i] for i in escalate], batch_size=batch_size)
+        for i, j in zip(escalate, finbert_probs.argmax(axis=1)):
+            final_labels[i] = labels[j]
+            tiers[i] = "finbert"
+    return final_labels, tiers
+
+def tune_cascade_thresholds(texts, y_true, max_accuracy_drop=0.01, path=CASCADE_THRESHOLDS_FILE,
+                            batch_size=FINBERT_BATCH_SIZE):
+    """
+    Grid-searches the cascade thresholds on a labeled validation set: picks the
+    pair that escalates the fewest texts to FinBERT while staying within
+    max_accuracy_drop of escalating everything (FinBERT on every text), and
+    saves it to `path`. Each model scores the texts once (FinBERT included, so
+    every escalation outcome is known); grid points only re-combine the outputs.
+    """
+    texts = ["" if text is None else str(text) for text in texts]
+    y_true = np.array(y_true, dtype=object)
+    base_probs = _base_probabilities(texts)
+    _, vader_votes, vader_compound = _vader_probabilities(texts, with_compound=True)
+    finbert_probs = _finbert_probabilities(texts, batch_size=batch_size)
+    finbert_labels = np.array([labels[j] for j in finbert_probs.argmax(axis=1)], dtype=object)
+    finbert_accuracy = float(np.mean(finbert_labels == y_true))
+
+    best = None
+    for base_margin in np.round(np.arange(0.0, 1.0001, 0.05), 2):
+        for vader_margin in np.round(np.arange(0.05, 1.0001, 0.05), 2):
+            thresholds = {"base_margin": float(base_margin), "vader_margin": float(vader_margin)}
+            cheap_votes, decided = _cheap_decisions(base_probs, vader_votes, vader_compound, thresholds)
+            # Escalated texts get exactly FinBERT's label
+            pred = np.where(decided, cheap_votes, finbert_labels)
+            accuracy = float(np.mean(pred == y_true))
+            escalated = float(1.0 - decided.mean())
+            if accuracy < finbert_accuracy - max_accuracy_drop: continue
+            key = (escalated, -accuracy)
+            if best is None or key < best[0]:
+                best = (key, {**thresholds, "accuracy": accuracy, "escalated": escalated,
+                              "finbert_accuracy": finbert_accuracy, "n": len(texts)})
 
-    return final_label
+    if best is None:
+        raise ValueError("no threshold pair stays within max_accuracy_drop of FinBERT on every text")
+    result = best[1]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return result
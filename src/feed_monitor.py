@@ -0,0 +1,169 @@
+# feed_monitor.py
+#
+# Event-driven RSS monitor: asyncio feed polling feeding a bounded worker pool.
+#
+#   pollers (one task per feed) --entries--> workers (N tasks) --results--> reporter
+#
+# Each feed is polled with a conditional GET (If-None-Match / If-Modified-Since),
+# so an unchanged feed costs a 304 and no parsing. Polling intervals adapt per
+# feed: a poll that turns up new entries halves the feed's interval (down to
+# min_interval), a quiet one stretches it by 1.5x (up to max_interval). New
+# entries are queued as soon as their feed is parsed; workers run the blocking
+# per-article work (body fetch, scoring) on a thread pool, so one slow article
+# never holds up the feeds or the other articles. A single reporter task
+# consumes results, so output lines and CSV rows never interleave.
+#
+# A link is only added to `seen` once it is finished: its result reported, or
+# process() decided to drop it. Links in flight are tracked in memory, so an
+# entry that fails, or is still queued when the monitor stops, is picked up
+# again from its feed on the next start.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+import aiohttp
+import feedparser
+
+
+class FeedState:
+    def __init__(self, url: str, interval: float):
+        self.url = url
+        self.interval = interval
+        self.etag = None
+        self.modified = None
+        self.links = set()  # links in the last parsed version of the feed
+        self.polls = 0
+        self.new_entries = 0
+
+
+class FeedMonitor:
+    def __init__(self, feeds: Iterable[str], process: Callable, report: Callable,
+                 accept: Callable = lambda entry: True, seen=None, workers: int = 4,
+                 min_interval: float = 30, max_interval: float = 600, queue_size: int = 256,
+                 headers: Optional[dict] = None, timeout: float = 20):
+        """
+        accept(entry) -> bool filters parsed feed entries; process(entry) -> result runs
+        on a worker thread for every accepted entry not already in `seen` (anything
+        with `in` and `add`, keyed by link; `discard`, if it has one, is called for
+        entries that fail); report(result) runs on the event loop, one result at a
+        time. A process() returning None is not reported.
+        """
+        self.feeds = [FeedState(u, min_interval) for u in feeds]
+        self.process = process
+        self.report = report
+        self.accept = accept
+        self.seen = seen if seen is not None else set()
+        self._pending = set()  # links queued or in flight, not yet in seen
+        self.workers = workers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.queue_size = queue_size
+        self.headers = headers or {"User-Agent": "Mozilla/5.0"}
+        self.timeout = timeout
+
+    # ---- polling ----
+    async def _fetch_feed(self, session: aiohttp.ClientSession, feed: FeedState) -> Optional[bytes]:
+        """Feed body, or None when unchanged since the last poll."""
+        if not feed.url.startswith(("http://", "https://")):
+            # Local feed file: the mtime stands in for Last-Modified
+            mtime = os.path.getmtime(feed.url)
+            if mtime == feed.modified: return None
+            feed.modified = mtime
+            with open(feed.url, "rb") as f:
+                return f.read()
+
+        headers = dict(self.headers)
+        if feed.etag: headers["If-None-Match"] = feed.etag
+        if feed.modified: headers["If-Modified-Since"] = feed.modified
+        async with session.get(feed.url, headers=headers) as r:
+            if r.status == 304: return None
+            r.raise_for_status()
+            feed.etag = r.headers.get("ETag")
+            feed.modified = r.headers.get("Last-Modified")
+            return await r.read()
+
+    async def _poll(self, session, feed: FeedState, entries: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = time.monotonic()
+            fresh = 0
+            try:
+                body = await self._fetch_feed(session, feed)
+                if body is not None:
+                    parsed = await loop.run_in_executor(None, feedparser.parse, body)
+                    links = set()
+                    for entry in parsed.entries:
+                        link = getattr(entry, "link", "").strip()
+                        if not link: continue
+                        links.add(link)
+                        if link in feed.links: continue
+                        fresh += 1
+                        if link not in self._pending and link not in self.seen and self.accept(entry):
+                            self._pending.add(link)
+                            await entries.put(entry)
+                    feed.links = links
+                feed.interval = max(self.min_interval, feed.interval / 2) if fresh \
+                    else min(self.max_interval, feed.interval * 1.5)
+            except Exception as e:
+                print(f"  [feed] {feed.url}: {e}")
+                feed.interval = self.max_interval
+            feed.polls += 1; feed.new_entries += fresh
+            await asyncio.sleep(max(0.0, feed.interval - (time.monotonic() - started)))
+
+    # ---- workers ----
+    def _finish(self, link: str) -> None:
+        self.seen.add(link)
+        self._pending.discard(link)
+
+    def _fail(self, link: str) -> None:
+        # Not marked seen: the entry is tried again when its feed is next read from scratch
+        self._pending.discard(link)
+        if hasattr(self.seen, "discard"): self.seen.discard(link)
+
+    async def _work(self, pool: ThreadPoolExecutor, entries: asyncio.Queue, results: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await entries.get()
+            link = getattr(entry, "link", "").strip()
+            try:
+                result = await loop.run_in_executor(pool, self.process, entry)
+                if result is None:
+                    self._finish(link)
+                else:
+                    await results.put((link, result))
+            except Exception as e:
+                print(f"  [worker] {link or '?'}: {e}")
+                self._fail(link)
+            finally:
+                entries.task_done()
+
+    async def _report(self, results: asyncio.Queue) -> None:
+        while True:
+            link, result = await results.get()
+            try:
+                self.report(result)
+                self._finish(link)
+            except Exception as e:
+                print(f"  [report] {e}")
+                self._fail(link)
+            finally:
+                results.task_done()
+
+    async def run(self) -> None:
+        """Runs until cancelled."""
+        entries = asyncio.Queue(maxsize=self.queue_size)
+        results = asyncio.Queue()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                tasks = [asyncio.create_task(self._poll(session, f, entries)) for f in self.feeds]
+                tasks += [asyncio.create_task(self._work(pool, entries, results)) for _ in range(self.workers)]
+                tasks.append(asyncio.create_task(self._report(results)))
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    for t in tasks: t.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
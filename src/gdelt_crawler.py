@@ -0,0 +1,243 @@
+# gdelt_crawler.py
+#
+# Concurrent, resumable window crawler for the GDELT DOC API.
+#
+# Windows for every ticker run on a thread pool behind a shared rate limiter.
+# Window size adapts to how dense the news is:
+#   - a response that hits the maxrecords cap is split (month -> week -> day)
+#     and the ticker's next windows shrink to the split size; a day that is
+#     still capped is re-queried in 6-hour blocks, and capped blocks hour by
+#     hour (the API takes datetimes to the second);
+#   - a sparse response (below sparse_fraction of the cap) doubles the span of
+#     the ticker's next window, up to max_days, merging quiet stretches into
+#     one request.
+# Every completed window is checkpointed (rows to <ticker>.csv, then the window
+# to windows.jsonl), so a crash resumes at the first uncovered day instead of
+# day one. Rows carry a hash of the query that found them, so changing a
+# ticker's query never mixes the old query's rows into the new one's.
+
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+GDELT_FMT = "%Y%m%d%H%M%S"
+DAY = pd.Timedelta(days=1)
+HOUR = pd.Timedelta(hours=1)
+
+
+def _gdelt_span(start: pd.Timestamp, end: pd.Timestamp) -> Tuple[str, str]:
+    return start.strftime(GDELT_FMT), (end + DAY - pd.Timedelta(seconds=1)).strftime(GDELT_FMT)
+
+
+def _split(start: pd.Timestamp, end: pd.Timestamp) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Month-sized (or larger) windows split into weeks; week-sized ones into days."""
+    step = 7 if (end - start).days + 1 > 7 else 1
+    out, cur = [], start
+    while cur <= end:
+        nxt = min(cur + pd.Timedelta(days=step - 1), end)
+        out.append((cur, nxt)); cur = nxt + DAY
+    return out
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+
+
+class Checkpoint:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._log = os.path.join(root, "windows.jsonl")
+
+    def covered(self, ticker: str, query: str) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """Completed windows for ticker under this exact query, merged and sorted."""
+        spans = []
+        if os.path.exists(self._log):
+            with open(self._log, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    # Windows logged before rows carried a query hash are crawled again, and so
+                    # are capped ones (days logged before capped days were split by hours)
+                    if rec.get("ticker") == ticker and rec.get("query") == query and "query_hash" in rec \
+                            and not rec.get("capped"):
+                        spans.append((pd.Timestamp(rec["start"]), pd.Timestamp(rec["end"])))
+        merged = []
+        for s, e in sorted(spans):
+            if merged and s <= merged[-1][1] + DAY:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        return merged
+
+    def record(self, ticker: str, query: str, start: pd.Timestamp, end: pd.Timestamp,
+               rows: pd.DataFrame, capped: bool, hours_capped: int = 0) -> None:
+        path = os.path.join(self.root, f"{ticker}.csv")
+        qh = query_hash(query)
+        with self._lock:
+            if not rows.empty:
+                self._upgrade(path)
+                rows.assign(query_hash=qh).to_csv(path, mode="a", index=False, header=not os.path.exists(path))
+            # The window only counts as done once its rows are on disk
+            with open(self._log, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ticker": ticker, "query": query, "query_hash": qh,
+                                    "start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d"),
+                                    "rows": len(rows), "capped": capped, "hours_capped": hours_capped}) + "\n")
+
+    @staticmethod
+    def _upgrade(path: str) -> None:
+        # Files written before rows carried a query hash get an empty one (matched by no query)
+        if not os.path.exists(path): return
+        with open(path, encoding="utf-8") as f:
+            header = f.readline().rstrip("\r\n").split(",")
+        if "query_hash" in header: return
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df.assign(query_hash="").to_csv(path, index=False)
+
+    def rows(self, ticker: str, query: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """Rows found by this exact query for ticker within [start, end]."""
+        path = os.path.join(self.root, f"{ticker}.csv")
+        if not os.path.exists(path): return pd.DataFrame()
+        df = pd.read_csv(path, keep_default_na=False, dtype={"query_hash": str})
+        # Appended batches may format dates differently (a batch of midnights drops the time)
+        df["date"] = pd.to_datetime(df["date"], format="mixed")
+        if "query_hash" not in df.columns: return pd.DataFrame()
+        keep = (df["query_hash"] == query_hash(query)) & df["date"].between(start, end + DAY, inclusive="left")
+        return df[keep].drop(columns=["query_hash"]).reset_index(drop=True)
+
+
+class _TickerPlan:
+    def __init__(self, ticker, query, start, end, covered, span):
+        self.ticker, self.query = ticker, query
+        self.cursor, self.end = start, end
+        self.covered = covered
+        self.span = span
+
+    def next_window(self):
+        cur = self.cursor
+        for s, e in self.covered:
+            if s <= cur <= e: cur = e + DAY
+        if cur > self.end: return None
+        stop = min(cur + pd.Timedelta(days=self.span - 1), self.end)
+        for s, _ in self.covered:
+            if cur < s <= stop: stop = s - DAY
+        self.cursor = stop + DAY
+        return cur, stop
+
+
+class GdeltCrawler:
+    def __init__(self, fetch_window: Callable, checkpoint_dir: str, workers: int = 4,
+                 max_records: int = 250, initial_days: int = 30, max_days: int = 92,
+                 sparse_fraction: float = 0.25):
+        """
+        fetch_window(ticker, query, start_dt, end_dt) -> (raw_count, rows) runs one
+        GDELT query (GDELT datetime strings) and returns the number of records the
+        API returned plus the normalized rows to keep.
+        """
+        self.fetch_window = fetch_window
+        self.checkpoint = Checkpoint(checkpoint_dir)
+        self.workers = workers
+        self.max_records = max_records
+        self.initial_days = initial_days
+        self.max_days = max_days
+        self.sparse_fraction = sparse_fraction
+
+    def _run_window(self, plan: _TickerPlan, start, end):
+        s, e = _gdelt_span(start, end)
+        return self.fetch_window(plan.ticker, plan.query, s, e)
+
+    def _fetch_hours(self, plan: _TickerPlan, start: pd.Timestamp, hours: int):
+        end = start + hours * HOUR - pd.Timedelta(seconds=1)
+        return self.fetch_window(plan.ticker, plan.query, start.strftime(GDELT_FMT), end.strftime(GDELT_FMT))
+
+    def _run_day_by_hours(self, plan: _TickerPlan, day: pd.Timestamp):
+        """(hours still at the cap, rows) for a day whose single query hit the cap."""
+        parts, capped = [], 0
+        for block in range(0, 24, 6):
+            start = day + block * HOUR
+            raw_count, rows = self._fetch_hours(plan, start, 6)
+            if raw_count < self.max_records:
+                parts.append(rows); continue
+            for h in range(6):
+                raw_count, rows = self._fetch_hours(plan, start + h * HOUR, 1)
+                capped += raw_count >= self.max_records
+                parts.append(rows)
+        parts = [p for p in parts if not p.empty]
+        return capped, pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def crawl(self, queries: Dict[str, str], start, end) -> Dict[str, pd.DataFrame]:
+        """Crawls [start, end] for every ticker -> query; returns checkpointed rows per ticker."""
+        start = pd.Timestamp(start).normalize(); end = pd.Timestamp(end).normalize()
+        plans = [_TickerPlan(t, q, start, end, self.checkpoint.covered(t, q), self.initial_days)
+                 for t, q in queries.items()]
+        splits = deque()
+        active = deque(plans)
+        running = {}
+        by_hours = set()  # futures re-querying a capped day hour by hour
+
+        def next_job():
+            if splits: return splits.popleft()
+            while active:
+                plan = active.popleft()
+                window = plan.next_window()
+                if window is not None:
+                    active.append(plan)  # round-robin across tickers
+                    return (plan,) + window
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                while len(running) < self.workers:
+                    job = next_job()
+                    if job is None: break
+                    running[pool.submit(self._run_window, *job)] = job
+                if not running: break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    plan, ws, we = running.pop(fut)
+                    days = (we - ws).days + 1
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        print(f"  [gdelt] {plan.ticker} {ws.date()}..{we.date()} failed: {e}")
+                        by_hours.discard(fut)
+                        continue  # left uncovered; picked up on the next run
+
+                    if fut in by_hours:
+                        by_hours.discard(fut)
+                        hours_capped, rows = result
+                        if hours_capped:
+                            print(f"  [gdelt] {plan.ticker} {ws.date()}: {hours_capped} hours still hit "
+                                  f"the {self.max_records} cap")
+                        self.checkpoint.record(plan.ticker, plan.query, ws, we, rows, capped=False,
+                                               hours_capped=hours_capped)
+                        continue
+
+                    raw_count, rows = result
+
+                    if raw_count >= self.max_records and days > 1:
+                        parts = _split(ws, we)
+                        splits.extend((plan,) + p for p in parts)
+                        plan.span = min(plan.span, (parts[0][1] - parts[0][0]).days + 1)
+                        continue
+
+                    if raw_count >= self.max_records:
+                        # A capped day is not recorded; its hourly re-query is
+                        hourly = pool.submit(self._run_day_by_hours, plan, ws)
+                        running[hourly] = (plan, ws, we); by_hours.add(hourly)
+                        continue
+                    if raw_count < self.sparse_fraction * self.max_records:
+                        plan.span = min(self.max_days, max(plan.span, days) * 2)
+                    self.checkpoint.record(plan.ticker, plan.query, ws, we, rows, capped=False)
+
+        return {t: self.checkpoint.rows(t, q, start, end) for t, q in queries.items()}
@@ -0,0 +1,234 @@
+# http_cache.py
+#
+# Shared on-disk HTTP response cache for the ingest pipelines.
+#
+# Responses are keyed by a hash of (method, URL, payload) and stored as
+# zlib-compressed blobs under data/http_cache, with a small SQLite index that
+# tracks headers, validators and access times. Entries older than their TTL
+# are revalidated with If-None-Match / If-Modified-Since, so an unchanged
+# resource costs a 304 instead of a full download. The cache is size-bounded
+# and evicts least-recently-used entries first.
+#
+# Offline replay: set HTTP_CACHE_OFFLINE=1 and every request is answered from
+# the cache only; misses come back as a synthetic 504 so callers treat them
+# like any other failed request.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Anchored to the repo (not the working directory) so every script shares one cache
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "http_cache"))
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 4 * 1024 ** 3))
+OFFLINE = os.environ.get("HTTP_CACHE_OFFLINE", "") == "1"
+
+DAY = 24 * 3600
+
+
+class CachedResponse:
+    """The subset of requests.Response the pipelines use, backed by cached bytes."""
+
+    def __init__(self, status_code: int, headers: dict, content: bytes, url: str,
+                 encoding: Optional[str] = None, from_cache: bool = False):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.url = url
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @classmethod
+    def from_response(cls, r: requests.Response) -> "CachedResponse":
+        return cls(r.status_code, dict(r.headers), r.content, r.url, encoding=r.encoding)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+
+def request_key(method: str, url: str, payload=None) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")) if payload is not None else ""
+    return hashlib.sha256(f"{method.upper()}\n{url}\n{body}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES, offline: bool = OFFLINE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.offline = offline
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, method TEXT, url TEXT, status INTEGER, headers TEXT,
+                encoding TEXT, size INTEGER, stored_at REAL, last_access REAL,
+                etag TEXT, last_modified TEXT)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        self._db.commit()
+
+    # ---- blobs ----
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.root, "blobs", key[:2], key + ".z")
+
+    def _read_blob(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def _write_blob(self, key: str, content: bytes) -> int:
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(content, 6)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    # ---- index ----
+    def _lookup(self, key: str):
+        with self._lock:
+            return self._db.execute(
+                "SELECT status, headers, encoding, stored_at, etag, last_modified, url FROM entries WHERE key=?",
+                (key,)).fetchone()
+
+    def _touch(self, key: str, refreshed: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._db.execute("UPDATE entries SET last_access=?, stored_at=? WHERE key=?", (now, now, key))
+            else:
+                self._db.execute("UPDATE entries SET last_access=? WHERE key=?", (now, key))
+            self._db.commit()
+
+    def _store(self, key: str, method: str, r: CachedResponse) -> None:
+        size = self._write_blob(key, r.content)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (key, method.upper(), r.url, r.status_code, json.dumps(dict(r.headers)), r.encoding,
+                 size, now, now, r.headers.get("ETag"), r.headers.get("Last-Modified")))
+            self._db.commit()
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE key=?", [(k,) for k in victims])
+            self._db.commit()
+        for key in victims:
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+
+    def invalidate(self, method: str, url: str, payload=None) -> None:
+        """Drops one entry, e.g. when a cached page turned out to be a block/CAPTCHA page."""
+        key = request_key(method, url, payload)
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key=?", (key,))
+            self._db.commit()
+        try:
+            os.remove(self._blob_path(key))
+        except OSError:
+            pass
+
+    # ---- main entry point ----
+    def request(self, send: Callable, method: str, url: str, payload=None, headers: Optional[dict] = None,
+                ttl: Optional[float] = None, cacheable: Optional[Callable] = None) -> CachedResponse:
+        """
+        Returns the response for (method, url, payload), from the cache when possible.
+
+        send(method, url, payload, headers) performs the real request and returns a
+        requests.Response; it is only called on a miss or a stale entry. ttl=None
+        means the entry never goes stale. cacheable(response) can veto storing a
+        2xx response (e.g. an HTML error page served with status 200).
+        """
+        key = request_key(method, url, payload)
+        entry = self._lookup(key)
+        cached = None
+        if entry is not None:
+            status, hdrs, encoding, stored_at, etag, last_modified, stored_url = entry
+            content = self._read_blob(key)
+            if content is not None:
+                cached = CachedResponse(status, json.loads(hdrs), content, stored_url,
+                                        encoding=encoding, from_cache=True)
+                if self.offline or ttl is None or time.time() - stored_at < ttl:
+                    self._touch(key)
+                    return cached
+
+        if self.offline:
+            return CachedResponse(504, {}, b"", url)
+
+        req_headers = dict(headers or {})
+        if cached is not None:
+            if etag: req_headers["If-None-Match"] = etag
+            if last_modified: req_headers["If-Modified-Since"] = last_modified
+
+        r = send(method, url, payload, req_headers)
+        if r.status_code == 304 and cached is not None:
+            self._touch(key, refreshed=True)
+            return cached
+
+        resp = CachedResponse.from_response(r)
+        if 200 <= resp.status_code < 300 and (cacheable is None or cacheable(resp)):
+            self._store(key, method, resp)
+        return resp
+
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_cache() -> ResponseCache:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResponseCache()
+        return _default
+
+def _send_with_requests(timeout: float, limiter=None):
+    def send(method, url, payload, headers):
+        if limiter is not None: limiter.acquire()
+        return requests.request(method, url, json=payload, headers=headers, timeout=timeout)
+    return send
+
+def cached_get(url: str, headers: Optional[dict] = None, timeout: float = 30, ttl: Optional[float] = None,
+               cacheable: Optional[Callable] = None, limiter=None) -> CachedResponse:
+    """
+    Drop-in for requests.get(url, headers=..., timeout=...) through the shared cache.
+    If a rate limiter is given, a token is taken only when the request reaches the network.
+    """
+    return default_cache().request(_send_with_requests(timeout, limiter), "GET", url, headers=headers,
+                                   ttl=ttl, cacheable=cacheable)
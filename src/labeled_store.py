@@ -0,0 +1,112 @@
+# labeled_store.py
+#
+# Typed columnar storage for the labeled datasets (*_labeled.parquet).
+#
+# A dataset is written as two Parquet files with the same row order:
+#   X_labeled.parquet        ticker/form/labels/source as dictionary (categorical)
+#                            columns, datetime dates, float32 returns, float64 prices
+#   X_labeled.text.parquet   the long document text (snippet, full text)
+# read_labeled() only opens the files holding the requested columns, so scans
+# over labels and returns never touch the text, and nothing is re-parsed or
+# re-coerced on load. CSV paths are still accepted and converted on the fly.
+#
+#   python labeled_store.py data/*_labeled.csv     # convert existing CSVs
+
+import os
+import sys
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CATEGORICAL = ["ticker", "form", "label_3d", "label_5d", "source"]
+FLOAT32 = ["ret_3d", "ret_5d"]
+FLOAT64 = ["price_t0"]
+STRINGS = ["url", "title", "doc_id"]
+TEXT_COLUMNS = ["snippet", "text"]
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+_TYPES = {**{c: _DICT for c in CATEGORICAL}, **{c: pa.float32() for c in FLOAT32},
+          **{c: pa.float64() for c in FLOAT64},
+          **{c: pa.string() for c in STRINGS + TEXT_COLUMNS}, "date": pa.timestamp("ns")}
+
+
+def text_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return root + ".text.parquet"
+
+
+def coerce(df: pd.DataFrame) -> pd.DataFrame:
+    """Casts the known labeled-dataset columns to their storage dtypes (others are left as-is)."""
+    df = df.copy()
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for c in FLOAT32:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+    for c in FLOAT64:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+    for c in CATEGORICAL:
+        if c in df.columns: df[c] = df[c].astype("category")
+    return df
+
+
+def to_table(df: pd.DataFrame) -> pa.Table:
+    """Arrow table with the storage types for known columns (inferred for the rest)."""
+    schema = pa.schema([pa.field(c, _TYPES[c]) if c in _TYPES else
+                        pa.Schema.from_pandas(df[[c]], preserve_index=False).field(c)
+                        for c in df.columns])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _write(table: pa.Table, path: str) -> None:
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def write_labeled(df: pd.DataFrame, path: str) -> None:
+    """Writes df as path (typed metadata columns) plus text_path(path) (document text)."""
+    df = coerce(df.reset_index(drop=True))
+    text_cols = [c for c in df.columns if c in TEXT_COLUMNS]
+    meta_cols = [c for c in df.columns if c not in TEXT_COLUMNS]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if text_cols:
+        _write(to_table(df[text_cols]), text_path(path))
+    elif os.path.exists(text_path(path)):
+        os.remove(text_path(path))
+    # Metadata last: readers key off this file, so they never see a half-written pair
+    _write(to_table(df[meta_cols]), path)
+
+
+def labeled_columns(path: str) -> List[str]:
+    cols = pq.read_schema(path).names
+    if os.path.exists(text_path(path)):
+        cols += pq.read_schema(text_path(path)).names
+    return cols
+
+
+def read_labeled(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Loads a labeled dataset, reading only `columns` (all by default).
+    A .csv path is parsed and coerced to the same dtypes.
+    """
+    if path.endswith(".csv"):
+        return coerce(pd.read_csv(path, usecols=list(columns) if columns is not None else None))
+    columns = labeled_columns(path) if columns is None else list(columns)
+    meta_names = set(pq.read_schema(path).names)
+    meta = [c for c in columns if c in meta_names]
+    text = [c for c in columns if c not in meta_names]
+    parts = []
+    if meta or not text:
+        parts.append(pq.read_table(path, columns=meta).to_pandas())
+    if text:
+        parts.append(pq.read_table(text_path(path), columns=text).to_pandas())
+    return pd.concat(parts, axis=1)[columns]
+
+
+if __name__ == "__main__":
+    for src in sys.argv[1:]:
+        dst = os.path.splitext(src)[0] + ".parquet"
+        write_labeled(pd.read_csv(src), dst)
+        print(f"✅ {src} -> {dst} (+ {os.path.basename(text_path(dst))})")
@@ -0,0 +1,85 @@
+# labeling.py
+#
+# Forward-return labels for dated documents (filings, news articles).
+#
+# The entry price of a document is the first close on or after its date; the
+# exit price for horizon h is the first close on or after date + h calendar
+# days. Every horizon is resolved with one searchsorted over the sorted
+# trading-day index, so labeling is O((rows + prices) log prices) instead of a
+# price-frame scan per row and horizon.
+
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def close_series(prices: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted trading dates (datetime64[ns]) and their closes from a date/Close frame."""
+    p = prices.dropna(subset=["date"]).sort_values("date", kind="stable")
+    close = p["Close"]
+    # yfinance can return a one-column frame under a (field, ticker) MultiIndex
+    if isinstance(close, pd.DataFrame):
+        close = close.iloc[:, 0]
+    dates = pd.to_datetime(p["date"]).to_numpy(dtype="datetime64[ns]")
+    return dates, close.to_numpy(dtype=float)
+
+
+def forward_returns(dates, prices: pd.DataFrame, horizons: Iterable[int] = (3, 5)) -> dict:
+    """
+    Returns {"price_t0": array, h: array of returns, ...} aligned with `dates`.
+    Missing entry/exit prices come back as NaN.
+    """
+    trade_dates, closes = close_series(prices)
+    d = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[ns]")
+    missing = np.isnat(d)
+    n = len(trade_dates)
+
+    def price_on_or_after(when):
+        idx = np.searchsorted(trade_dates, when, side="left")
+        ok = (idx < n) & ~missing
+        return np.where(ok, closes[np.minimum(idx, n - 1)] if n else np.nan, np.nan)
+
+    p0 = price_on_or_after(d)
+    out = {"price_t0": p0}
+    for h in horizons:
+        ph = price_on_or_after(d + np.timedelta64(int(h), "D"))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[h] = ph / p0 - 1.0
+    return out
+
+
+def label_returns(returns, threshold: Optional[float] = None) -> np.ndarray:
+    """
+    UP/DOWN labels (threshold=None: UP iff return > 0), or UP/DOWN/NEUTRAL with a
+    dead band of +-threshold. NaN returns get None.
+    """
+    r = np.asarray(returns, dtype=float)
+    if threshold is None:
+        labels = np.where(r > 0, "UP", "DOWN").astype(object)
+    else:
+        labels = np.select([r > threshold, r < -threshold], ["UP", "DOWN"], default="NEUTRAL").astype(object)
+    labels[np.isnan(r)] = None
+    return labels
+
+
+def label_with_returns(rows: pd.DataFrame, prices: pd.DataFrame, horizons: Iterable[int] = (3, 5),
+                       date_col: str = "date", threshold: Optional[float] = None) -> pd.DataFrame:
+    """
+    Returns the rows that have an entry price, with price_t0 and ret_{h}d /
+    label_{h}d columns appended for every horizon. The original index is kept so
+    callers can join back to their own columns.
+    """
+    horizons = list(horizons)
+    if rows.empty or prices.empty:
+        return rows.iloc[0:0].copy()
+
+    fwd = forward_returns(rows[date_col], prices, horizons)
+    keep = ~np.isnan(fwd["price_t0"])
+    out = rows.loc[keep].copy()
+    out["price_t0"] = fwd["price_t0"][keep]
+    for h in horizons:
+        ret = fwd[h][keep]
+        out[f"ret_{h}d"] = ret
+        out[f"label_{h}d"] = label_returns(ret, threshold)
+    return out
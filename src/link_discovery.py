@@ -0,0 +1,281 @@
+# link_discovery.py
+#
+# Concurrent, incremental discovery of article links from Google News search.
+#
+# Each year is one task that walks its search pages in order (newest first)
+# until a page comes back empty; years run concurrently on a thread pool, and
+# every request goes through one shared rate limiter. Years are scheduled
+# from the newest backwards, and no older year is started once a year turns
+# up no links at all (the old "year runout").
+#
+# Discovered links are kept in SQLite with the time they were first seen, and
+# a year is recorded as complete once its pages run out. In incremental mode
+# a year completed after it ended is skipped outright, and any other year
+# stops at the first page whose links are all already known, so a re-run
+# only costs the pages with new articles.
+#
+# A CAPTCHA page trips a circuit breaker: every worker is paused through the
+# shared limiter for a cooldown that doubles on each consecutive trip, then
+# the same page is retried. Block pages that other workers hit while a pause
+# is already running (requests sent before it started) do not count as new
+# trips. After max_trips consecutive trips the run stops cleanly, keeping
+# everything found so far, instead of silently dropping the rest of the year.
+#
+# Each unfinished year also keeps a page cursor (the next page to fetch). A
+# later incremental run first walks the year's newest pages for new links
+# and, once it reaches known ones, jumps to the cursor and carries on to the
+# end of the year, so a year interrupted by a block still gets finished.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+from rate_limit import TokenBucket
+
+LINKS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "forbes_links.sqlite")
+MAX_PAGES = 99
+
+_BAD_RESPONSE = re.compile(r'<!DOCTYPE [^>]+>')
+
+
+class CaptchaBlocked(Exception):
+    pass
+
+
+# Build Google News search url according to search string, year, and page
+def build_search(search_string: str, year: int, page: int = 0) -> str:
+    base = "https://www.google.com/search?q="
+    search = search_string.replace(" ", "+")
+    date = "+before:" + str(year + 1) + "-01-01+after:" + str(year) + "-01-01"
+    tags = "&tbs=sbd:1&tbm=nws&start=" + str(page * 10)
+    return base + search + date + tags
+
+
+def parse_search_page(html: str, year: int, pattern: str = "https://www.forbes.com/sites") -> Tuple[Optional[List[str]], int]:
+    """
+    (links from `year`, number of matching anchors) for one results page, or
+    (None, 0) when the page is a CAPTCHA / block page instead of results.
+    """
+    if _BAD_RESPONSE.match(html):
+        return None, 0
+    anchors = BeautifulSoup(html, "html.parser").find_all(href=re.compile(pattern))
+    links = []
+    for a in anchors:
+        # Google wraps results as /url?q=<target>&...
+        href = a.get("href") or ""
+        href = href[href.find("=") + 1:] if "=" in href else href
+        href = href.split("&")[0]
+        parts = href.split("/")
+        if len(parts) > 5 and parts[5] == str(year) and href not in links:
+            links.append(href)
+    return links, len(anchors)
+
+
+class LinkStore:
+    def __init__(self, path: str = LINKS_DB):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS links (
+                url TEXT PRIMARY KEY, query TEXT, year INTEGER, page INTEGER,
+                first_seen REAL, last_seen REAL)""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS years (
+                query TEXT, year INTEGER, completed REAL, links INTEGER,
+                PRIMARY KEY (query, year))""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                query TEXT, year INTEGER, page INTEGER,
+                PRIMARY KEY (query, year))""")
+        self._db.commit()
+
+    def add(self, query: str, year: int, page: int, urls: List[str]) -> int:
+        """Records urls; returns how many were not known before."""
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO links VALUES (?,?,?,?,?,?)",
+                                 ((u, query, year, page, now, now) for u in urls))
+            new = self._db.total_changes - before
+            self._db.executemany("UPDATE links SET last_seen=? WHERE url=?", ((now, u) for u in urls))
+            self._db.commit()
+        return new
+
+    def mark_complete(self, query: str, year: int, links: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO years VALUES (?,?,?,?)", (query, year, time.time(), links))
+            self._db.execute("DELETE FROM cursors WHERE query=? AND year=?", (query, year))
+            self._db.commit()
+
+    def completed(self, query: str, year: int) -> bool:
+        """Whether the year's pages have ever been walked to the end."""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM years WHERE query=? AND year=?", (query, year)).fetchone() is not None
+
+    def cursor(self, query: str, year: int) -> Optional[int]:
+        """Next page to fetch for a year whose crawl was interrupted, else None."""
+        with self._lock:
+            row = self._db.execute("SELECT page FROM cursors WHERE query=? AND year=?", (query, year)).fetchone()
+        return None if row is None else row[0]
+
+    def save_cursor(self, query: str, year: int, page: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cursors VALUES (?,?,?)", (query, year, page))
+            self._db.commit()
+
+    def finished_year(self, query: str, year: int) -> Optional[int]:
+        """
+        Link count of a year that was fully crawled after it ended (so it cannot
+        have new articles), else None.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT completed, links FROM years WHERE query=? AND year=?",
+                                   (query, year)).fetchone()
+        if row is None or pd.Timestamp(row[0], unit="s").year <= year:
+            return None
+        return row[1]
+
+    def links(self, query: Optional[str] = None) -> pd.DataFrame:
+        sql = "SELECT url AS Link, year, first_seen FROM links"
+        params = ()
+        if query is not None:
+            sql += " WHERE query=?"
+            params = (query,)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY year DESC, page, first_seen", self._db, params=params)
+        df["first_seen"] = pd.to_datetime(df["first_seen"], unit="s")
+        return df
+
+
+class CircuitBreaker:
+    def __init__(self, limiter: TokenBucket, base_cooldown: float = 60.0, max_cooldown: float = 1800.0,
+                 max_trips: int = 5):
+        self.limiter = limiter
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max_trips
+        self.trips = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def trip(self) -> None:
+        """Pauses every worker for the next cooldown; raises CaptchaBlocked once trips run out."""
+        with self._lock:
+            # Other workers' requests sent before the current pause come back blocked too
+            if time.monotonic() < self._paused_until: return
+            self.trips += 1
+            if self.trips > self.max_trips:
+                raise CaptchaBlocked(f"still blocked after {self.max_trips} cooldowns")
+            cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (self.trips - 1))
+            self._paused_until = time.monotonic() + cooldown
+        print(f"BAD HTML RESPONSE - POSSIBLE CAPTCHA BLOCK (pausing {cooldown:.0f}s)")
+        self.limiter.pause(cooldown)
+
+    def success(self) -> None:
+        with self._lock:
+            self.trips = 0
+
+
+def _fetch_with_requests(url: str) -> str:
+    return requests.get(url, timeout=30).text
+
+
+class DiscoveryService:
+    def __init__(self, query: str, store: LinkStore, fetch: Callable[[str], str] = _fetch_with_requests,
+                 limiter: Optional[TokenBucket] = None, breaker: Optional[CircuitBreaker] = None,
+                 workers: int = 3, max_pages: int = MAX_PAGES, incremental: bool = True):
+        self.query = query
+        self.store = store
+        self.fetch = fetch
+        self.limiter = limiter or TokenBucket(rate=1.0, capacity=1)
+        self.breaker = breaker or CircuitBreaker(self.limiter)
+        self.workers = workers
+        self.max_pages = max_pages
+        self.incremental = incremental
+        self._stop = threading.Event()
+
+    def _page(self, year: int, page: int) -> Optional[Tuple[List[str], int]]:
+        url = build_search(self.query, year, page)
+        while not self._stop.is_set():
+            self.limiter.acquire()
+            links, anchors = parse_search_page(self.fetch(url), year)
+            if links is not None:
+                self.breaker.success()
+                return links, anchors
+            self.breaker.trip()
+        return None
+
+    def search_year(self, year: int) -> Tuple[int, int]:
+        """(links seen in the year's pages, of which new); walks pages until they run out."""
+        seen = new = 0
+        # Years that were never walked to the end keep a cursor, so an interrupted crawl can resume
+        tracked = not self.store.completed(self.query, year)
+        resume = self.store.cursor(self.query, year) if tracked else None
+        page = 0
+        while page < self.max_pages:
+            try:
+                result = self._page(year, page)
+            except CaptchaBlocked as e:
+                print(f"Stopping discovery: {e}")
+                self._stop.set()
+                return seen, new
+            if result is None:  # run stopped elsewhere
+                return seen, new
+            links, anchors = result
+            added = self.store.add(self.query, year, page, links)
+            seen += len(links); new += added
+            print(f"Year {year} page {page + 1}: {len(links)} links ({added} new)")
+            if tracked and (resume is None or page >= resume):
+                self.store.save_cursor(self.query, year, page + 1)
+            if not anchors:
+                print(f"Page runout - ending search for year {year}")
+                self.store.mark_complete(self.query, year, seen)
+                break
+            if self.incremental and links and added == 0:
+                if resume is None:
+                    print(f"Year {year}: reached known links")
+                    break
+                if page + 1 < resume:
+                    print(f"Year {year}: reached known links - resuming interrupted crawl at page {resume + 1}")
+                    page = resume
+                    continue
+            page += 1
+        return seen, new
+
+    def run(self, start_year: int, end_year: int = 1990) -> int:
+        """Searches start_year backwards; returns the number of new links."""
+        total_new = 0
+        years = iter(range(start_year, end_year - 1, -1))
+        runout = None  # newest year that came back with no links
+        inflight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                while len(inflight) < self.workers and runout is None and not self._stop.is_set():
+                    year = next(years, None)
+                    if year is None: break
+                    finished = self.store.finished_year(self.query, year) if self.incremental else None
+                    if finished is not None:
+                        # Decided without a request, so a finished empty year stops scheduling right here
+                        print(f"Year {year} already complete - skipping")
+                        if finished == 0: runout = year
+                        continue
+                    inflight[pool.submit(self.search_year, year)] = year
+                if not inflight: break
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    year = inflight.pop(fut)
+                    seen, new = fut.result()
+                    total_new += new
+                    if seen == 0 and not self._stop.is_set():
+                        print(f"Year runout - no articles in {year}")
+                        runout = year if runout is None else max(runout, year)
+        return total_new
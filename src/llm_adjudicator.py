@@ -0,0 +1,173 @@
+# llm_adjudicator.py
+#
+# LLM second opinion for articles the local ensemble is unsure about.
+#
+# - Confidence gate: when the ensemble's confidence reaches `gate`, its label
+#   stands and no request is made.
+# - Verdict cache: answers are stored in SQLite keyed by (model, prompt
+#   version, content hash), so a re-seen or syndicated article is never billed
+#   twice. Bump PROMPT_VERSION whenever PROMPT_TEMPLATE changes.
+# - In-flight dedup: concurrent requests for the same key share one call.
+# - Trimming: only the sentences most relevant to the watched names (plus the
+#   lead) are sent, capped at max_chars.
+# - Backends: anything with generate(model, prompt) -> str. GeminiBackend
+#   holds one client for the process; StubBackend answers locally for tests
+#   and offline runs.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional, Tuple
+
+from doc_store import doc_id
+
+LABELS = ("UP", "DOWN", "NEUTRAL")
+CACHE_DB = os.path.join("data", "llm_cache.sqlite")
+
+PROMPT_VERSION = "v1"
+PROMPT_TEMPLATE = """You are a financial sentiment classifier.
+You will be given an article title, the most relevant sentences of the article body, and a suggested sentiment score.
+The score is only a suggestion — you may override it if the text clearly supports a different sentiment.
+Your task: Output ONLY ONE WORD indicating the sentiment:
+- "UP" for positive sentiment
+- "DOWN" for negative sentiment
+- "NEUTRAL" for mixed or unclear sentiment
+Rules:
+- Output exactly one word and nothing else. No punctuation, no explanation.
+- Ignore formatting, metadata, or irrelevant content in the article text.
+
+Title: {title}
+Body: {body}
+Suggested sentiment: {suggested}
+Respond with one word only: UP, DOWN, or NEUTRAL."""
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'“])")
+# Words that tend to carry the direction of a financial story
+_SIGNAL = re.compile(r"\b(shares?|stock|revenue|earnings|guidance|forecast|profit|loss|sales|demand|"
+                     r"beat|miss(ed)?|rais(e|ed)|cut|surge[ds]?|jump(ed|s)?|fell|falls?|drop(ped|s)?|"
+                     r"rall(y|ied)|slump(ed)?|upgrade[ds]?|downgrade[ds]?|record|outlook)\b", re.I)
+
+
+def trim_sentences(body: str, keywords: Iterable[str] = (), max_sentences: int = 8,
+                   max_chars: int = 4000, lead: int = 2) -> str:
+    """
+    The first `lead` sentences plus the highest-scoring others (keyword mentions
+    count double, direction words once), kept in their original order.
+    """
+    sentences = [s.strip() for s in _SENTENCE.split(" ".join((body or "").split())) if s.strip()]
+    if len(sentences) <= max_sentences and sum(map(len, sentences)) <= max_chars:
+        return " ".join(sentences)
+    kw = [k.lower() for k in keywords]
+
+    def score(s):
+        low = s.lower()
+        return 2 * sum(low.count(k) for k in kw) + len(_SIGNAL.findall(s))
+
+    ranked = sorted(range(lead, len(sentences)), key=lambda i: (-score(sentences[i]), i))
+    chosen = list(range(min(lead, len(sentences)))) + [i for i in ranked if score(sentences[i]) > 0]
+    out, total = [], 0
+    for i in sorted(chosen[:max_sentences]):
+        if total + len(sentences[i]) > max_chars: break
+        out.append(sentences[i]); total += len(sentences[i]) + 1
+    return " ".join(out)
+
+
+def parse_label(text: Optional[str]) -> Optional[str]:
+    """First UP/DOWN/NEUTRAL word in the model's answer, if any."""
+    for word in re.findall(r"[A-Za-z]+", text or ""):
+        if word.upper() in LABELS: return word.upper()
+    return None
+
+
+class GeminiBackend:
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def generate(self, model: str, prompt: str) -> str:
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client()
+        return self._client.models.generate_content(model=model, contents=prompt).text
+
+
+class StubBackend:
+    def __init__(self, answer: Callable[[str], str] = lambda prompt: "NEUTRAL"):
+        self.answer = answer
+        self.calls = 0
+
+    def generate(self, model: str, prompt: str) -> str:
+        self.calls += 1
+        return self.answer(prompt)
+
+
+class Adjudicator:
+    def __init__(self, backend, model: str = "gemini-2.5-flash", gate: float = 0.7,
+                 cache_path: str = CACHE_DB, keywords: Iterable[str] = (), max_chars: int = 4000):
+        self.backend = backend
+        self.model = model
+        self.gate = gate
+        self.keywords = list(keywords)
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._pending = {}
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                model TEXT, prompt_version TEXT, content_hash TEXT, label TEXT, created REAL,
+                PRIMARY KEY (model, prompt_version, content_hash))""")
+        self._db.commit()
+
+    def _cached(self, content_hash: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT label FROM verdicts WHERE model=? AND prompt_version=? AND content_hash=?",
+                                   (self.model, PROMPT_VERSION, content_hash)).fetchone()
+        return row[0] if row else None
+
+    def _store(self, content_hash: str, label: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO verdicts VALUES (?,?,?,?,?)",
+                             (self.model, PROMPT_VERSION, content_hash, label, time.time()))
+            self._db.commit()
+
+    def adjudicate(self, title: str, body: str, suggested: str, confidence: float) -> Tuple[str, str]:
+        """
+        Returns (label, source) where source is "ensemble" (confident enough, or the
+        LLM answer was unusable), "cache" or "llm".
+        """
+        if confidence >= self.gate:
+            return suggested, "ensemble"
+
+        excerpt = trim_sentences(body, self.keywords, max_chars=self.max_chars)
+        # The suggestion is part of the prompt, so it is part of the key
+        content_hash = doc_id(f"{title}\n{excerpt}\n{suggested}")
+        label = self._cached(content_hash)
+        if label is not None:
+            return label, "cache"
+
+        with self._lock:
+            fut = self._pending.get(content_hash)
+            owner = fut is None
+            if owner:
+                fut = self._pending[content_hash] = Future()
+        if not owner:
+            label = fut.result()
+            return (label, "cache") if label else (suggested, "ensemble")
+
+        label = None
+        try:
+            prompt = PROMPT_TEMPLATE.format(title=title, body=excerpt, suggested=suggested)
+            label = parse_label(self.backend.generate(self.model, prompt))
+            if label: self._store(content_hash, label)
+        except Exception as e:
+            print(f"  [llm] adjudication failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(content_hash, None)
+            fut.set_result(label)
+        return (label, "llm") if label else (suggested, "ensemble")
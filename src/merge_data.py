@@ -1,27 +1,38 @@
 # src/merge_datasets.py
 """
 Merge all labeled datasets into one training file:
- - scans data/*_labeled.csv (EDGAR, GDELT, etc.)
+ - scans data/*_labeled.parquet / *_labeled.csv (EDGAR, GDELT, etc.)
  - harmonizes columns
- - de-duplicates
- - writes data/all_sources_labeled.csv
+ - appends only new rows of new/changed files to the partitioned
+   dataset in data/all_sources/ (see merged_dataset.py); the training and
+   backtest scripts read that dataset directly
+ - with --export, also writes the whole dataset out as
+   data/all_sources_labeled.parquet (typed, see labeled_store.py) and
+   data/all_sources_labeled.csv; this rewrites every row, so it is opt-in
 
 Expected columns (if present):
-  ticker, date, form, url, title, snippet, price_t0, ret_3d, label_3d, ret_5d, label_5d, source
+  ticker, date, form, url, title, snippet, price_t0, ret_3d, label_3d, ret_5d, label_5d, source, doc_id
+(doc_id points at the full text in the document store, see doc_store.py)
 Missing columns are filled with sensible defaults.
 """
 
+import argparse
 import glob
 import os
 import sys
 import pandas as pd
 
+import labeled_store
+from merged_dataset import MergedDataset
+
 DATA_DIR = "data"
 OUT_FILE = os.path.join(DATA_DIR, "all_sources_labeled.csv")
+OUT_PARQUET = os.path.join(DATA_DIR, "all_sources_labeled.parquet")
+DATASET_DIR = os.path.join(DATA_DIR, "all_sources")
 
 REQUIRED = [
     "ticker", "date", "form", "url", "title", "snippet",
-    "price_t0", "ret_3d", "label_3d", "ret_5d", "label_5d", "source",
+    "price_t0", "ret_3d", "label_3d", "ret_5d", "label_5d", "source", "doc_id",
 ]
 
 def coerce_cols(df: pd.DataFrame, source_name: str) -> pd.DataFrame:
@@ -79,50 +90,70 @@ def coerce_cols(df: pd.DataFrame, source_name: str) -> pd.DataFrame:
     return df[REQUIRED]
 
 
+def input_paths() -> list:
+    """*_labeled.parquet and *_labeled.csv inputs, preferring Parquet when both exist for a dataset."""
+    by_stem = {}
+    for p in sorted(glob.glob(os.path.join(DATA_DIR, "*_labeled.csv"))) + \
+             sorted(glob.glob(os.path.join(DATA_DIR, "*_labeled.parquet"))):
+        by_stem[os.path.splitext(os.path.basename(p))[0]] = p
+    outputs = {os.path.abspath(OUT_FILE), os.path.abspath(OUT_PARQUET)}
+    return [p for _, p in sorted(by_stem.items()) if os.path.abspath(p) not in outputs]
+
+
+def export(ds: MergedDataset, csv: bool = True) -> pd.DataFrame:
+    """Materializes the dataset as the flat, sorted files the training scripts read."""
+    all_df = ds.read()
+    all_df = all_df[REQUIRED].sort_values(["ticker", "date", "form", "url"], kind="stable")
+    labeled_store.write_labeled(all_df, OUT_PARQUET)
+    if csv:
+        all_df.to_csv(OUT_FILE, index=False)
+    return all_df
+
+
 def main():
-    paths = sorted(glob.glob(os.path.join(DATA_DIR, "*_labeled.csv")))
+    ap = argparse.ArgumentParser(description="Append new labeled rows to the merged dataset.")
+    ap.add_argument("--export", action="store_true",
+                    help=f"also rewrite the flat {OUT_PARQUET} and {OUT_FILE} from the whole dataset")
+    ap.add_argument("--no-csv", action="store_true", help=f"with --export, only write {OUT_PARQUET}, not {OUT_FILE}")
+    args = ap.parse_args()
+
+    paths = input_paths()
     if not paths:
-        print("No *_labeled.csv files found in data/. Nothing to merge.")
+        print("No *_labeled files found in data/. Nothing to merge.")
         sys.exit(0)
 
+    ds = MergedDataset(DATASET_DIR)
     print("Merging the following files:")
+    added = 0
     for p in paths:
-        print("  -", os.path.basename(p))
-
-    frames = []
-    for p in paths:
-        src = os.path.basename(p).replace("_labeled.csv", "")
+        src = os.path.basename(p).split("_labeled.")[0]
         try:
-            df = pd.read_csv(p)
+            n = ds.ingest(p, prepare=lambda df: labeled_store.coerce(coerce_cols(df, source_name=src)),
+                          read=labeled_store.read_labeled)
         except Exception as e:
             print(f"  ! Skipping {p}: {e}")
             continue
-        frames.append(coerce_cols(df, source_name=src))
-
-    if not frames:
+        if n is None:
+            print("  -", os.path.basename(p), "(unchanged)")
+        else:
+            print("  -", os.path.basename(p), f"(+{n:,} rows)")
+            added += n
+
+    all_df = ds.read(columns=["source", "date", "label_3d"])
+    if all_df.empty:
         print("No valid files to merge after parsing.")
         sys.exit(0)
 
-    all_df = pd.concat(frames, ignore_index=True)
-
-    # Drop rows without a date or ticker
-    all_df = all_df.dropna(subset=["date", "ticker"])
-
-    # Sort and de-duplicate
-    all_df = all_df.sort_values(["ticker", "date", "form", "url"], kind="stable")
-    all_df = all_df.drop_duplicates(subset=["ticker", "date", "form", "url"], keep="first")
-
     # Quick summary
     by_src = all_df["source"].value_counts()
     print("\nRows by source:\n", by_src.to_string())
     print("\nLabel balance (3d):\n", all_df["label_3d"].value_counts(dropna=False).to_string())
     print("\nDate range:", all_df["date"].min(), "→", all_df["date"].max())
+    print(f"\n✅ Added {added:,} new rows to {DATASET_DIR} ({len(all_df):,} total)")
 
-    # Write
-    os.makedirs(DATA_DIR, exist_ok=True)
-    all_df.to_csv(OUT_FILE, index=False)
-    print(f"\n✅ Wrote {len(all_df):,} rows to {OUT_FILE}")
+    if args.export:
+        export(ds, csv=not args.no_csv)
+        print(f"✅ Wrote {len(all_df):,} rows to {OUT_PARQUET}" + ("" if args.no_csv else f" and {OUT_FILE}"))
 
 if __name__ == "__main__":
     main()
-
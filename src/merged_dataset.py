@@ -0,0 +1,148 @@
+# merged_dataset.py
+#
+# Append-only, partitioned Parquet dataset of labeled rows from every source.
+#
+# Layout under data/all_sources/:
+#   parts/source=<src>/ticker=<T>/year=<Y>/part-<digest>.parquet   row data
+#   manifest.json                                                  ingested files
+#   dedup.sqlite                                                   (ticker, date, form, url) keys
+#
+# ingest() skips a source file whose size/mtime (or, failing that, content
+# hash) matches the manifest. For a new or changed file only the rows whose
+# key is not already in the dedup index are appended, as new part files, so
+# merging costs work proportional to what changed rather than to the whole
+# history.
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Callable, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+from labeled_store import to_table
+
+DEDUP_KEY = ["ticker", "date", "form", "url"]
+PARTITIONS = ["source", "ticker", "year"]
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class MergedDataset:
+    def __init__(self, root: str):
+        self.root = root
+        self.parts_dir = os.path.join(root, "parts")
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self._manifest_path = os.path.join(root, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        self._db = sqlite3.connect(os.path.join(root, "dedup.sqlite"))
+        self._db.execute("""CREATE TABLE IF NOT EXISTS seen (
+            ticker TEXT, date TEXT, form TEXT, url TEXT, PRIMARY KEY (ticker, date, form, url))""")
+        self._db.commit()
+
+    def _save_manifest(self) -> None:
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self._manifest_path)
+
+    def is_current(self, path: str) -> bool:
+        """True if path was already ingested in its current state."""
+        entry = self.manifest.get(os.path.abspath(path))
+        if entry is None: return False
+        st = os.stat(path)
+        if entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return True
+        if entry["size"] == st.st_size and entry["sha256"] == file_digest(path):
+            # Touched but identical: remember the new mtime so the next check is cheap
+            entry["mtime"] = st.st_mtime; self._save_manifest()
+            return True
+        return False
+
+    def _new_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drops rows whose key is already stored (or repeated within df), then records the rest."""
+        keys = pd.DataFrame({
+            "ticker": df["ticker"].astype(str),
+            "date": df["date"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "form": df["form"].astype(str),
+            "url": df["url"].astype(str),
+        }, index=df.index)
+        rows = list(keys.itertuples(index=False, name=None))
+        # Look the batch up with one join instead of a query per row
+        self._db.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (i INTEGER, ticker TEXT, date TEXT, form TEXT, url TEXT)")
+        self._db.execute("DELETE FROM incoming")
+        self._db.executemany("INSERT INTO incoming VALUES (?,?,?,?,?)", ((i,) + r for i, r in enumerate(rows)))
+        known = {i for (i,) in self._db.execute("SELECT i FROM incoming JOIN seen USING (ticker, date, form, url)")}
+
+        keep = ~keys.duplicated(keep="first").to_numpy()
+        keep[list(known)] = False
+        self._db.executemany("INSERT OR IGNORE INTO seen VALUES (?,?,?,?)",
+                             (r for r, k in zip(rows, keep) if k))
+        return df[keep]
+
+    def _write_parts(self, df: pd.DataFrame, tag: str) -> None:
+        df = df.assign(year=df["date"].dt.year)
+        for (source, ticker, year), part in df.groupby(PARTITIONS, sort=False, observed=True):
+            out_dir = os.path.join(self.parts_dir, f"source={source}", f"ticker={ticker}", f"year={int(year)}")
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"part-{tag}.parquet")
+            tmp = os.path.join(out_dir, f".part-{tag}.tmp")  # dot prefix: ignored by dataset reads
+            pq.write_table(to_table(part.drop(columns=PARTITIONS)), tmp, compression="zstd")
+            os.replace(tmp, path)
+
+    def ingest(self, path: str, prepare: Callable[[pd.DataFrame], pd.DataFrame],
+               read: Callable[[str], pd.DataFrame] = pd.read_csv) -> Optional[int]:
+        """
+        Appends the new rows of one source file. prepare() turns the raw frame into
+        the merged schema (including 'source'). Returns rows added, or None if the
+        file was already current.
+        """
+        if self.is_current(path): return None
+        digest = file_digest(path)
+        df = prepare(read(path))
+        df = df.dropna(subset=["date", "ticker"])
+        df = df.sort_values(DEDUP_KEY, kind="stable")
+        new = self._new_rows(df)
+        if not new.empty:
+            self._write_parts(new, digest[:16])
+        st = os.stat(path)
+        # Parts are on disk before the keys and the manifest are committed
+        self._db.commit()
+        self.manifest[os.path.abspath(path)] = {"sha256": digest, "size": st.st_size,
+                                                "mtime": st.st_mtime, "rows": len(new)}
+        self._save_manifest()
+        return len(new)
+
+    def part_files(self) -> List[str]:
+        out = []
+        for dirpath, _, files in os.walk(self.parts_dir):
+            out += [os.path.join(dirpath, f) for f in files if f.endswith(".parquet")]
+        return sorted(out)
+
+    def read(self, columns: Optional[Iterable[str]] = None, filters=None) -> pd.DataFrame:
+        """Loads the dataset (optionally a column subset / pyarrow filters) with partition columns restored."""
+        files = self.part_files()
+        if not files: return pd.DataFrame(columns=list(columns) if columns else None)
+        # Parts written before a column was added lack it; read them as nulls
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files])
+        partitioning = pads.partitioning(pa.schema([("source", pa.string()), ("ticker", pa.string()),
+                                                    ("year", pa.int32())]), flavor="hive")
+        for f in partitioning.schema:
+            schema = schema.append(f)
+        dataset = pads.dataset(files, schema=schema, partitioning=partitioning, partition_base_dir=self.parts_dir)
+        table = dataset.to_table(columns=list(columns) if columns else None,
+                                 filter=pq.filters_to_expression(filters) if filters else None)
+        return table.to_pandas()
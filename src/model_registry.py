@@ -0,0 +1,63 @@
+# model_registry.py
+#
+# Process-wide registry for models that are expensive to load (transformer
+# weights, pickled sklearn pipelines, lexicons).
+#
+# Each model is registered with a zero-argument loader. The loader runs the
+# first time the model is requested and the result stays resident until it is
+# explicitly unloaded. Loading is guarded by a per-model lock, so concurrent
+# callers block on a single load instead of each loading their own copy.
+
+import threading
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        """Registers a loader under name. Re-registering drops any loaded copy."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+            self._models.pop(name, None)
+
+    def get(self, name):
+        """Returns the resident model, loading it on first use."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        try:
+            lock = self._locks[name]
+        except KeyError:
+            raise KeyError(f"No model registered under '{name}'") from None
+
+        with lock:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is None:
+                model = self._loaders[name]()
+                self._models[name] = model
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warmup(self, names=None):
+        """Loads the given models (all registered models by default)."""
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def unload(self, names=None):
+        """Drops the given models (all loaded models by default)."""
+        for name in names or list(self._models):
+            with self._locks[name]:
+                self._models.pop(name, None)
+
+
+# Shared by every module in the process
+registry = ModelRegistry()
@@ -2,11 +2,14 @@
 Monitors RSS feeds for new articles that mention Nvidia in their title or
 summary. Logs date, title, and body of relevant articles to CSV.
 
+Feeds are polled concurrently with conditional GETs (see feed_monitor.py);
+matching articles are fetched and scored on a worker pool as soon as they
+appear.
+
 Expandable for multiple feeds and domains.
 """
 
-import feedparser
-import requests
+import asyncio
 from bs4 import BeautifulSoup
 import csv
 import time
@@ -15,9 +18,12 @@ from urllib.parse import urlparse
 import os
 from colorama import init, Fore, Style
 
-from ensemble_sentiment_analysis import analyze_sentiment
-from google import genai
-from google.genai import types
+from alias_matcher import AliasMatcher
+from ensemble_sentiment_analysis import analyze_sentiment_with_confidence, load_confidence_gate, warmup
+from feed_monitor import FeedMonitor
+from http_cache import cached_get
+from llm_adjudicator import Adjudicator, GeminiBackend, StubBackend
+from seen_index import SeenIndex
 
 FEED_URLS = [
     "https://www.forbes.com/investing/feed/",
@@ -27,6 +33,10 @@ FEED_URLS = [
     "./testfeed.xml"
 ]
 
+# Tickers (and the names that count as a mention) the monitor logs articles for
+WATCH_ALIASES = {"NVDA": ["Nvidia"]}
+watch_matcher = AliasMatcher(WATCH_ALIASES)
+
 init(autoreset=True)
 def print_colored_sentiment(sentiment):
     """Prints the text in color based on sentiment"""
@@ -40,14 +50,30 @@ def print_colored_sentiment(sentiment):
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_FILE = os.path.join(BASE_DIR, "../data/nvidia_articles.csv")
-CHECK_INTERVAL = 600 # check feeds every 10 minutes
-
-seen_links = set()
+# Feeds are polled adaptively between these bounds (seconds): busy feeds
+# converge to MIN_INTERVAL, quiet ones back off to CHECK_INTERVAL
+MIN_INTERVAL = 30
+CHECK_INTERVAL = 600
+WORKERS = 4  # concurrent article fetch + scoring jobs
+SEEN_RETENTION_DAYS = 180  # forget processed articles after this long
+
+# Gemini is only asked when the ensemble's confidence is below the gate (tuned on
+# labeled data by test_ensemble_accuracy.py --tune-gate); LLM_BACKEND=stub answers
+# locally (offline runs, tests)
+GEMINI_MODEL = "gemini-2.5-flash"
+LLM_CONFIDENCE_GATE = load_confidence_gate()
+LLM_CACHE = os.path.join(BASE_DIR, "../data/llm_cache.sqlite")
+adjudicator = Adjudicator(StubBackend() if os.environ.get("LLM_BACKEND") == "stub" else GeminiBackend(),
+                          model=GEMINI_MODEL, gate=LLM_CONFIDENCE_GATE, cache_path=LLM_CACHE,
+                          keywords=[a for names in WATCH_ALIASES.values() for a in names])
+
+# Survives restarts: links (canonicalized) and article bodies already processed
+seen_links = SeenIndex(os.path.join(BASE_DIR, "../data/seen_articles.sqlite"), retention_days=SEEN_RETENTION_DAYS)
 
 def get_article_text_generic(url):
     """Fetch text inside <p> tags"""
     try:
-        response = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+        response = cached_get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
         paragraphs = soup.find_all("p")
@@ -69,85 +95,64 @@ def get_article_text(url):
 
     return get_article_text_generic(url)
 
-def check_for_new_articles():
-    """Parse RSS feeds and append new Nvidia articles to CSV"""
-    global seen_links
-
-    for feed_url in FEED_URLS:
-        feed = feedparser.parse(feed_url)
-
-        for entry in feed.entries:
-            title = getattr(entry, "title", "").strip()
-            link = getattr(entry, "link", "").strip()
-            summary = getattr(entry, "summary", "").strip()
-
-            # Get published date
-            if hasattr(entry, "published_parsed") and entry.published_parsed:
-                # Standardize date for CSV
-                published_csv = time.strftime("%Y-%m-%d", entry.published_parsed)
-
-                # Pretty printing for console
-                published_pretty = time.strftime("[%Y-%m-%d %a %H:%M]", entry.published_parsed)
-            else:
-                # If published date unavailable, use current time
-                now = datetime.now()
-                published_csv = now.strftime("%Y-%m-%d")
-                published_pretty = now.strftime("[%Y-%m-%d %a %H:%M]")
-
-            if "nvidia" in title.lower() or "nvidia" in summary.lower():
-                if link not in seen_links:
-                    seen_links.add(link)
-
-                    body = get_article_text(link)
-                    sentiment = analyze_sentiment(body)
-                    final_result = gemini_analysis(title, body, sentiment)
-
-                    print(f"╠{published_pretty}", end="")
-                    print_colored_sentiment(final_result)
-                    print(f"[{Fore.BLUE}{Style.BRIGHT}\033]8;;{link}\033\\{title}\033]8;;\033\\{Style.RESET_ALL}]\n║")
-
-                    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        writer.writerow([published_csv, final_result, title, body])
-
-def gemini_analysis(ARTICLE_TITLE, ARTICLE_BODY, SCORE): 
-    client = genai.Client() 
-
-    prompt = f"""You are a financial sentiment classifier. 
-        You will be given an article title, an article body, and a suggested sentiment score. 
-        The score is only a suggestion — you may override it if the text clearly supports a 
-        different sentiment. 
-        Your task: Output ONLY ONE WORD indicating the sentiment: 
-        - "UP" for positive sentiment 
-        - "DOWN" for negative sentiment 
-        - "NEUTRAL" for mixed or unclear sentiment Rules: 
-        - Output exactly one word and nothing else. No punctuation, no explanation. 
-        - Ignore formatting, metadata, or irrelevant content in the article text. 
-
-        Title: {ARTICLE_TITLE} 
-        Body: {ARTICLE_BODY} 
-        Suggested sentiment: {SCORE} 
-        Respond with one word only: UP, DOWN, or NEUTRAL.""" 
-
-    response = client.models.generate_content( 
-        model="gemini-2.5-flash", 
-        contents= prompt ) 
-
-    return response.text
-
+def _published(entry):
+    """(CSV date, console timestamp) for an entry; now if the feed has no date"""
+    if hasattr(entry, "published_parsed") and entry.published_parsed:
+        # Standardize date for CSV
+        published_csv = time.strftime("%Y-%m-%d", entry.published_parsed)
+
+        # Pretty printing for console
+        published_pretty = time.strftime("[%Y-%m-%d %a %H:%M]", entry.published_parsed)
+    else:
+        # If published date unavailable, use current time
+        now = datetime.now()
+        published_csv = now.strftime("%Y-%m-%d")
+        published_pretty = now.strftime("[%Y-%m-%d %a %H:%M]")
+    return published_csv, published_pretty
+
+def is_relevant(entry):
+    """Entry mentions a watched ticker in its title or summary"""
+    title = getattr(entry, "title", "").strip()
+    summary = getattr(entry, "summary", "").strip()
+    return bool(watch_matcher.tag(title) or watch_matcher.tag(summary))
+
+def process_article(entry):
+    """Fetch and score one article (runs on a monitor worker thread)"""
+    title = getattr(entry, "title", "").strip()
+    link = getattr(entry, "link", "").strip()
+    published_csv, published_pretty = _published(entry)
+
+    body = get_article_text(link)
+    if not seen_links.claim_content(link, body):
+        return None  # same story already scored under another URL
+    sentiment, confidence = analyze_sentiment_with_confidence(body)
+    final_result, decided_by = adjudicator.adjudicate(title, body, sentiment, confidence)
+    return {"published_csv": published_csv, "published_pretty": published_pretty,
+            "title": title, "link": link, "body": body, "label": final_result,
+            "decided_by": decided_by}
+
+def report_article(result):
+    """Print and log one scored article"""
+    print(f"╠{result['published_pretty']}", end="")
+    print_colored_sentiment(result["label"])
+    print(f"[{Fore.BLUE}{Style.BRIGHT}\033]8;;{result['link']}\033\\{result['title']}\033]8;;\033\\{Style.RESET_ALL}]\n║")
+
+    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([result["published_csv"], result["label"], result["title"], result["body"]])
 
 def main():
-    while True:
-        print(f"╔[{datetime.now().strftime('%Y-%m-%d %a %H:%M')}][Checking feeds for Nvidia articles]\n║")
-        check_for_new_articles()
-        print(f"╚[{datetime.now().strftime('%Y-%m-%d %a %H:%M')}][Checked all feeds]\n")
-
-        time.sleep(CHECK_INTERVAL)
+    # Load the models before the first article arrives, not inside its worker
+    warmup()
+    monitor = FeedMonitor(FEED_URLS, process=process_article, report=report_article, accept=is_relevant,
+                          seen=seen_links, workers=WORKERS, min_interval=MIN_INTERVAL, max_interval=CHECK_INTERVAL)
+    print(f"╔[{datetime.now().strftime('%Y-%m-%d %a %H:%M')}][Monitoring {len(FEED_URLS)} feeds for Nvidia articles]\n║")
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        pass
+    print(f"╚[{datetime.now().strftime('%Y-%m-%d %a %H:%M')}][Stopped]\n")
 
 
 if __name__ == "__main__":
     main()
-
-
-
-
@@ -0,0 +1,247 @@
+# online_model.py
+#
+# Incremental trainer for the TF-IDF + linear base model.
+#
+# tfidf_lr_model.py refits its vocabulary and classifier from scratch on the
+# whole history. This trainer keeps both online instead:
+#   - features come from a stateless HashingVectorizer (no vocabulary to refit),
+#     reweighted by IDF statistics that are updated with every batch;
+#   - the classifier is an SGDClassifier (logistic loss) trained with
+#     partial_fit, with "balanced" sample weights from running class counts.
+# The checkpoint is the same pickled {"vectorizer", "model"} dict the ensemble
+# loads (transform() / predict_proba() / classes_), plus the trainer state:
+# class counts and the merged-dataset parts already consumed. A run trains on
+# new rows only, so a refresh costs time proportional to them: parts of the
+# merged dataset (data/all_sources, see merged_dataset.py) that a previous run
+# consumed are not even read, and Forbes articles, which come as whole CSVs,
+# are filtered by per-article keys kept in SQLite next to the checkpoint
+# (<checkpoint>.keys.sqlite), so the pickle does not grow with history.
+#
+#   python online_model.py [--dataset data/all_sources] [--articles forbes_articles.csv]
+#                          [--checkpoint online_model.pkl] [--passes 3]
+
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import normalize
+
+from merged_dataset import MergedDataset
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "online_model.pkl")
+DATASET_DIR = os.path.join(BASE_DIR, "../data/all_sources")
+
+LABELS = ["UP", "DOWN", "NEUTRAL"]
+
+
+class OnlineTfidfVectorizer:
+    """Hashed term counts with smoothed IDF weights whose document frequencies update online."""
+
+    def __init__(self, n_features=2 ** 18, use_idf=True, stop_words="english"):
+        self.n_features = n_features
+        self.use_idf = use_idf
+        self.hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                        stop_words=stop_words)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+
+    @property
+    def idf_(self):
+        return np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1.0
+
+    def _weight(self, counts):
+        if self.use_idf:
+            counts = counts.multiply(self.idf_).tocsr()
+        return normalize(counts)
+
+    def partial_fit(self, texts):
+        counts = self.hasher.transform(texts)
+        self.doc_freq += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs += counts.shape[0]
+        return counts
+
+    def partial_fit_transform(self, texts):
+        """Updates the IDF statistics with texts, then weights them (hashing once)."""
+        return self._weight(self.partial_fit(texts))
+
+    def transform(self, texts):
+        return self._weight(self.hasher.transform(texts))
+
+
+def row_key(*parts):
+    return hashlib.sha1("\x1f".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+
+class KeyStore:
+    """Keys of individually tracked rows (Forbes articles) already trained on."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+        self._db.commit()
+
+    def unseen(self, keys):
+        """Mask of the keys not trained on yet."""
+        keys = list(keys)
+        known = set()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            sql = "SELECT key FROM seen WHERE key IN (%s)" % ",".join("?" * len(chunk))
+            known.update(k for (k,) in self._db.execute(sql, chunk))
+        return np.array([k not in known for k in keys], dtype=bool)
+
+    def add(self, keys):
+        self._db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((k,) for k in keys))
+        self._db.commit()
+
+
+def key_store_path(checkpoint_path):
+    return checkpoint_path + ".keys.sqlite"
+
+
+def new_checkpoint(n_features=2 ** 18, use_idf=True, alpha=1e-5):
+    return {
+        "vectorizer": OnlineTfidfVectorizer(n_features=n_features, use_idf=use_idf),
+        "model": SGDClassifier(loss="log_loss", alpha=alpha, random_state=42),
+        "class_counts": {label: 0 for label in LABELS},
+        "consumed_parts": set(),
+        "rows": 0,
+        "updated": None,
+    }
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    if not os.path.exists(path):
+        return new_checkpoint()
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_checkpoint(ckpt, path=CHECKPOINT_PATH):
+    ckpt["updated"] = time.time()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(ckpt, f)
+    os.replace(tmp, path)
+
+
+def partial_train(ckpt, texts, labels, passes=3, seed=42):
+    """
+    Trains the checkpoint on a batch of new rows (callers drop the ones already
+    trained on). Returns (rows trained, accuracy of the pre-update model on them) -
+    the accuracy is a progressive validation score, None for the first batch.
+    """
+    df = pd.DataFrame({"text": list(texts), "label": list(labels)})
+    df = df[df["label"].isin(LABELS)]
+    if df.empty:
+        return 0, None
+
+    vectorizer, model = ckpt["vectorizer"], ckpt["model"]
+    texts = df["text"].fillna("").astype(str).tolist()
+    y = df["label"].to_numpy()
+
+    accuracy = None
+    if ckpt["rows"]:
+        accuracy = float(np.mean(model.predict(vectorizer.transform(texts)) == y))
+
+    X = vectorizer.partial_fit_transform(texts)
+
+    # Online stand-in for class_weight="balanced" (partial_fit can't use it)
+    counts = ckpt["class_counts"]
+    for label, n in zip(*np.unique(y, return_counts=True)):
+        counts[label] += int(n)
+    total = sum(counts.values())
+    seen_labels = [label for label in LABELS if counts[label]]
+    weights = {label: total / (len(seen_labels) * counts[label]) for label in seen_labels}
+    sample_weight = np.array([weights[label] for label in y])
+
+    rng = np.random.default_rng(seed + ckpt["rows"])
+    for _ in range(passes):
+        order = rng.permutation(len(y))
+        model.partial_fit(X[order], y[order], classes=LABELS, sample_weight=sample_weight[order])
+
+    ckpt["rows"] += len(df)
+    return len(df), accuracy
+
+
+def train_from_dataset(ckpt, dataset_dir=DATASET_DIR, label_col="label_3d", passes=3):
+    """Trains on merged-dataset parts that no earlier run consumed."""
+    if not os.path.isdir(dataset_dir):
+        return 0
+    dataset = MergedDataset(dataset_dir)
+    parts = [p for p in dataset.part_files() if os.path.relpath(p, dataset.parts_dir) not in ckpt["consumed_parts"]]
+    trained = 0
+    for path in parts:
+        df = pd.read_parquet(path, columns=["date", "form", "url", "title", "snippet", label_col])
+        texts = df["title"].fillna("").astype(str) + " " + df["snippet"].fillna("").astype(str)
+        n, accuracy = partial_train(ckpt, texts, df[label_col].astype(str), passes=passes)
+        trained += n
+        ckpt["consumed_parts"].add(os.path.relpath(path, dataset.parts_dir))
+        if n:
+            print(f"{os.path.relpath(path, dataset.parts_dir)}: {n} rows"
+                  + (f" (accuracy before update {accuracy:.3f})" if accuracy is not None else ""))
+    return trained
+
+
+def train_from_articles(ckpt, articles_csv, key_store, passes=3):
+    """
+    Trains on Forbes articles (labeled like tfidf_lr_model.py) not seen before.
+    Returns (rows trained, their keys); the keys go to key_store once the
+    checkpoint holding them is saved.
+    """
+    from tfidf_lr_model import load_labeled_articles
+    merged = load_labeled_articles(articles_csv)
+    merged["key"] = [row_key("forbes", link) for link in merged["Link"]]
+    merged = merged.drop_duplicates("key")
+    merged = merged[key_store.unseen(merged["key"])]
+    n, accuracy = partial_train(ckpt, merged["text"], merged["Label"].astype(str), passes=passes)
+    if n:
+        print(f"{articles_csv}: {n} articles"
+              + (f" (accuracy before update {accuracy:.3f})" if accuracy is not None else ""))
+    return n, list(merged["key"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally train the hashed TF-IDF + SGD base model")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help="pickle with the ensemble's {vectorizer, model} layout plus trainer state")
+    parser.add_argument("--dataset", default=DATASET_DIR, help="merged dataset directory ('' to skip)")
+    parser.add_argument("--articles", action="append", default=[], help="Forbes articles CSV (repeatable)")
+    parser.add_argument("--passes", type=int, default=3, help="SGD passes over each new batch")
+    args = parser.parse_args()
+
+    ckpt = load_checkpoint(args.checkpoint)
+    key_store = KeyStore(key_store_path(args.checkpoint))
+    # Checkpoints from before the key store kept every row key in the pickle
+    legacy_keys = ckpt.pop("seen_keys", None)
+    if legacy_keys: key_store.add(legacy_keys)
+    consumed = len(ckpt["consumed_parts"])
+    trained = 0
+    new_keys = []
+    if args.dataset:
+        trained += train_from_dataset(ckpt, args.dataset, passes=args.passes)
+    for path in args.articles:
+        n, keys = train_from_articles(ckpt, path, key_store, passes=args.passes)
+        trained += n; new_keys += keys
+
+    # An untrained model is no use to the ensemble, so nothing is written until the first rows
+    if ckpt["rows"] and (trained or len(ckpt["consumed_parts"]) != consumed or legacy_keys is not None):
+        save_checkpoint(ckpt, args.checkpoint)
+        # Only once the model that learned them is on disk
+        key_store.add(new_keys)
+    print(f"Trained on {trained} new rows ({ckpt['rows']} total); checkpoint: {args.checkpoint}")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so the pickled vectorizer is online_model.OnlineTfidfVectorizer
+    # (a __main__ class could not be unpickled by the ensemble)
+    import online_model
+    online_model.main()
@@ -3,12 +3,23 @@
 # If windowed rows are 0 after submissions/search-index, auto-scrape HTML and union.
 # Robust schema normalization, safe doc_url building, 3d/5d return labels.
 
-import os, re, time, datetime as dt, requests
+import hashlib, os, re, time, datetime as dt, requests
 import pandas as pd
-import yfinance as yf
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from typing import List, Optional, Tuple
 
+import labeling
+from company_aliases import ALIAS_MAP
+from doc_store import default_store
+from edgar_checkpoint import FILING_COLUMNS, FilingCheckpoint
+from edgar_index import INDEX_DIR, EdgarIndex, parse_filing_index
+from http_cache import DAY, default_cache
+from labeled_store import write_labeled
+from price_store import PriceStore
+from rate_limit import TokenBucket, retry_after_seconds
+
 # ========= Config =========
 OUT_DIR = "data"; os.makedirs(OUT_DIR, exist_ok=True)
 
@@ -32,6 +43,10 @@ PRICE_END   = "2019-01-31"
 # Returns horizons (calendar days → next trading day)
 HORIZONS = [3, 5]
 
+# Filing discovery: "bulk" answers every CIK from EDGAR's quarterly/daily master.idx
+# files (see edgar_index.py); "company" walks submissions/search-index/HTML per CIK
+DISCOVERY = "bulk"
+
 # Cap text fetches per ticker (raise to get more)
 MAX_DOCS = 500
 
@@ -43,13 +58,51 @@ CHUNK_YEARS = 3      # try 3-year chunks between START and END
 SEARCH_PAGES = 10    # pages per chunk per query (each page returns up to 'size' rows)
 SEARCH_SIZE  = 200   # rows per page
 
+# SEC fair-access ceiling is 10 req/s per client; one bucket is shared by every
+# request this module makes, across all tickers and worker threads
+SEC_MAX_RPS = 10
+FETCH_WORKERS = 8       # concurrent filing downloads
+PARSE_WORKERS = None    # HTML->text processes (None = one per CPU)
+
+# Response cache TTLs: index/listing responses are revalidated daily (a 304 if
+# unchanged); filing documents are immutable once published
+INDEX_TTL = DAY
+FILING_TTL = None
+
+# Streamed filing pages + per-(cik, source, chunk) cursors (see edgar_checkpoint.py)
+FILINGS_DIR = os.path.join(OUT_DIR, "edgar_filings")
+
+_PRICES = PriceStore()
+
 # ========= HTTP helpers =========
+_SEC_LIMITER = TokenBucket(rate=SEC_MAX_RPS, capacity=SEC_MAX_RPS)
+
+_session = requests.Session()
+_session.headers.update(UA)
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_WORKERS))
+
+def _sec_request(method: str, url: str, payload: Optional[dict] = None, headers: Optional[dict] = None,
+                 max_throttles: int = 5, timeout: int = 30) -> requests.Response:
+    """One rate-limited request. On 429/503 every worker backs off for Retry-After, then it retries."""
+    for i in range(max_throttles):
+        _SEC_LIMITER.acquire()
+        r = _session.request(method, url, json=payload, headers=headers, timeout=timeout)
+        if r.status_code not in (429, 503):
+            return r
+        wait = retry_after_seconds(r.headers, default=2.0 * (2 ** i))
+        print(f"  [sec] {r.status_code} throttled, backing off {wait:.1f}s")
+        _SEC_LIMITER.pause(wait)
+    return r
+
+def _cached_sec_request(method: str, url: str, payload: Optional[dict] = None, ttl: Optional[float] = INDEX_TTL):
+    # Only cache misses and stale entries reach the network (and the limiter)
+    return default_cache().request(_sec_request, method, url, payload=payload, ttl=ttl)
+
 def _get_json(url: str, method: str = "GET", payload: Optional[dict] = None,
               max_retries: int = 4, sleep_base: float = 0.7):
     for i in range(max_retries):
         try:
-            r = requests.post(url, headers=UA, json=payload, timeout=30) if method == "POST" \
-                else requests.get(url, headers=UA, timeout=30)
+            r = _cached_sec_request(method, url, payload=payload)
             if r.ok:
                 return r.json()
         except Exception:
@@ -60,7 +113,7 @@ def _get_json(url: str, method: str = "GET", payload: Optional[dict] = None,
 def _get_html(url: str, max_retries: int = 4, sleep_base: float = 0.7) -> Optional[str]:
     for i in range(max_retries):
         try:
-            r = requests.get(url, headers=UA, timeout=30)
+            r = _cached_sec_request("GET", url)
             if r.ok:
                 return r.text
         except Exception:
@@ -103,6 +156,8 @@ def _base_form(s: str) -> str:
     return s[:-2] if s.endswith("/A") else s
 
 # ========= Submissions path =========
+# Page fetchers return a DataFrame of raw rows (empty = stream exhausted) or
+# None when the request failed, so a failed page is retried on the next run.
 def _load_company_submissions(cik: str) -> Optional[dict]:
     url = f"https://data.sec.gov/submissions/CIK{int(cik):010d}.json"
     return _get_json(url)
@@ -120,10 +175,10 @@ def _recent_filings_df(sub: dict) -> pd.DataFrame:
         if c not in df.columns: df[c] = ""
     return df
 
-def _load_year_file(name: str) -> pd.DataFrame:
+def _load_year_file(name: str) -> Optional[pd.DataFrame]:
     url = f"https://data.sec.gov/submissions/{name}"
     j = _get_json(url)
-    if not j: return pd.DataFrame()
+    if not j: return None
     rows = j.get("filings", [])
     df = pd.DataFrame(rows)
     if df.empty: return df
@@ -133,6 +188,24 @@ def _load_year_file(name: str) -> pd.DataFrame:
         if c not in df.columns: df[c] = ""
     return df
 
+def _submission_streams(cik: str):
+    """(source, chunk, fetch_page, max_pages) for the recent filings and every yearly file."""
+    sub = _load_company_submissions(cik)
+    if not sub: return
+    # "recent" changes as filings arrive: one stream whose page is replaced whenever its
+    # accession list changes; yearly files never change
+    recent = _recent_filings_df(sub)
+    for chunk in _CHECKPOINT.chunks(cik, "submissions"):
+        if chunk.startswith("recent@"):  # per-day streams written by earlier versions
+            _CHECKPOINT.drop_stream(cik, "submissions", chunk)
+    accessions = "\n".join(recent["accessionNumber"].astype(str)) if not recent.empty else ""
+    _CHECKPOINT.renew(cik, "submissions", "recent", hashlib.sha1(accessions.encode("utf-8")).hexdigest())
+    yield "submissions", "recent", lambda page: recent, 1
+    for f in sub.get("filings", {}).get("files", []):
+        name = f.get("name")
+        if name:
+            yield "submissions", name, lambda page, name=name: _load_year_file(name), 1
+
 # ========= Search-index (chunked) =========
 def _year_chunks(start: str, end: str, span_years: int) -> List[Tuple[str,str]]:
     s = pd.Timestamp(start); e = pd.Timestamp(end)
@@ -145,38 +218,8 @@ def _year_chunks(start: str, end: str, span_years: int) -> List[Tuple[str,str]]:
         cur = nxt + pd.Timedelta(days=1)
     return chunks
 
-def _search_index_once(keys: List[str], ciks: List[str], start: str, end: str,
-                       use_forms: bool, pages: int, size: int) -> pd.DataFrame:
-    url = "https://efts.sec.gov/LATEST/search-index"
-    forms = sorted(list(BASE_FORMS)) + [f"{f}/A" for f in BASE_FORMS] if use_forms else None
-    frames = []
-
-    # textual keys
-    for key in keys:
-        for page in range(pages):
-            payload = {"keys": key, "category":"custom", "startdt":start, "enddt":end,
-                       "from": page*size, "size": size}
-            if use_forms: payload["forms"] = forms
-            j = _get_json(url, method="POST", payload=payload)
-            if not j: break
-            hits = j.get("hits", {}).get("hits", [])
-            if not hits: break
-            frames.append(pd.json_normalize([h.get("_source", {}) for h in hits]))
-
-    # explicit CIKs
-    for cik in ciks:
-        for page in range(pages):
-            payload = {"ciks":[str(int(cik))], "category":"custom", "startdt":start, "enddt":end,
-                       "from": page*size, "size": size}
-            if use_forms: payload["forms"] = forms
-            j = _get_json(url, method="POST", payload=payload)
-            if not j: break
-            hits = j.get("hits", {}).get("hits", [])
-            if not hits: break
-            frames.append(pd.json_normalize([h.get("_source", {}) for h in hits]))
-
-    if not frames: return pd.DataFrame()
-    raw = pd.concat(frames, ignore_index=True, sort=False).drop_duplicates(subset=["adsh"], keep="first")
+def _search_hits_df(hits: List[dict]) -> pd.DataFrame:
+    raw = pd.json_normalize([h.get("_source", {}) for h in hits])
 
     out = pd.DataFrame()
     out["filingDate"] = pd.to_datetime(raw.get("filed", ""), errors="coerce")
@@ -204,172 +247,234 @@ def _search_index_once(keys: List[str], ciks: List[str], start: str, end: str,
         if c not in out.columns: out[c] = ""
     return out.dropna(subset=["filingDate"]).reset_index(drop=True)
 
-def _search_index_chunked(keys: List[str], ciks: List[str], start: str, end: str) -> pd.DataFrame:
-    chunks = _year_chunks(start, end, CHUNK_YEARS)
-    frames = []
-    for cs, ce in chunks:
-        df = _search_index_once(keys, ciks, cs, ce, True, SEARCH_PAGES, SEARCH_SIZE)
-        if df.empty:
-            df = _search_index_once(keys, ciks, cs, ce, False, SEARCH_PAGES, SEARCH_SIZE)
-        if not df.empty:
-            frames.append(df)
-        time.sleep(0.2)
-    return pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+def _search_page(selector: dict, start: str, end: str, use_forms: bool, page: int,
+                 size: int = SEARCH_SIZE) -> Optional[pd.DataFrame]:
+    url = "https://efts.sec.gov/LATEST/search-index"
+    payload = {**selector, "category":"custom", "startdt":start, "enddt":end, "from": page*size, "size": size}
+    if use_forms: payload["forms"] = sorted(list(BASE_FORMS)) + [f"{f}/A" for f in BASE_FORMS]
+    j = _get_json(url, method="POST", payload=payload)
+    if not j: return None
+    hits = j.get("hits", {}).get("hits", [])
+    return _search_hits_df(hits) if hits else pd.DataFrame()
+
+def _search_streams(keys: List[str], ciks: List[str], start: str, end: str, use_forms: bool):
+    """One paginated stream per textual key and per explicit CIK in [start, end]."""
+    selectors = [("key", k, {"keys": k}) for k in keys] + [("cik", c, {"ciks": [str(int(c))]}) for c in ciks]
+    for kind, value, selector in selectors:
+        chunk = f"{start}..{end}|{kind}={value}|forms={int(use_forms)}"
+        yield "search", chunk, (lambda page, sel=selector: _search_page(sel, start, end, use_forms, page)), SEARCH_PAGES
 
 # ========= HTML scraper =========
-def _scrape_company_filings_html(cik: str, start: str, end: str, base_forms=BASE_FORMS,
-                                 max_pages: int = 12, count_per_page: int = 100) -> pd.DataFrame:
-    def parse_table(html: str) -> List[dict]:
-        soup = BeautifulSoup(html, "lxml")
-        table = soup.find("table", class_="tableFile2")
-        out = []
-        if not table: return out
-        for tr in table.find_all("tr")[1:]:
-            tds = tr.find_all("td")
-            if len(tds) < 5: continue
-            form = tds[0].get_text(strip=True)
-            if not form: continue
-            base = _base_form(form)
-            filing_href = tds[1].find("a")
-            doc_href    = tds[1].find_all("a")[-1] if tds[1].find_all("a") else None
-            date_str = tds[3].get_text(strip=True)
-            fdate = pd.to_datetime(date_str, errors="coerce")
-            doc_url = ""
-            if doc_href and doc_href.get("href"):
-                u = doc_href.get("href")
-                doc_url = "https://www.sec.gov" + u if u.startswith("/") else u
-            elif filing_href and filing_href.get("href"):
-                u = filing_href.get("href")
-                doc_url = ("https://www.sec.gov" + u + "index.html") if u.endswith("/") \
-                          else ("https://www.sec.gov" + u.rsplit("/",1)[0] + "/index.html")
-            out.append({
-                "filingDate": fdate, "form": form, "form_base": base,
-                "doc_url": doc_url, "accessionNumber": "", "primaryDocument": "", "primaryDocDescription": ""
-            })
-        return out
-
-    frames = []
-    for f in base_forms:
-        for page in range(max_pages):
-            start_idx = page * count_per_page
-            url = ("https://www.sec.gov/cgi-bin/browse-edgar"
-                   f"?action=getcompany&CIK={int(cik)}&type={f}&owner=exclude"
-                   f"&count={count_per_page}&start={start_idx}")
-            html = _get_html(url)
-            if not html: break
-            items = parse_table(html)
-            if not items: break
-            frames.append(pd.DataFrame(items))
-            time.sleep(0.4)
-
-    if not frames: return pd.DataFrame()
-    df = pd.concat(frames, ignore_index=True, sort=False)
-    df = df.dropna(subset=["filingDate"])
-    df = df[df["filingDate"].between(start, end)]
-    df = df.drop_duplicates(subset=["doc_url"]).reset_index(drop=True)
-    print(f"  [html-scraper] rows: {len(df)}")
-    return df
+def _parse_listing_table(html: str) -> List[dict]:
+    soup = BeautifulSoup(html, "lxml")
+    table = soup.find("table", class_="tableFile2")
+    out = []
+    if not table: return out
+    for tr in table.find_all("tr")[1:]:
+        tds = tr.find_all("td")
+        if len(tds) < 5: continue
+        form = tds[0].get_text(strip=True)
+        if not form: continue
+        base = _base_form(form)
+        filing_href = tds[1].find("a")
+        doc_href    = tds[1].find_all("a")[-1] if tds[1].find_all("a") else None
+        date_str = tds[3].get_text(strip=True)
+        fdate = pd.to_datetime(date_str, errors="coerce")
+        doc_url = ""
+        if doc_href and doc_href.get("href"):
+            u = doc_href.get("href")
+            doc_url = "https://www.sec.gov" + u if u.startswith("/") else u
+        elif filing_href and filing_href.get("href"):
+            u = filing_href.get("href")
+            doc_url = ("https://www.sec.gov" + u + "index.html") if u.endswith("/") \
+                      else ("https://www.sec.gov" + u.rsplit("/",1)[0] + "/index.html")
+        out.append({
+            "filingDate": fdate, "form": form, "form_base": base,
+            "doc_url": doc_url, "accessionNumber": "", "primaryDocument": "", "primaryDocDescription": ""
+        })
+    return out
 
-# ========= Master loader =========
-def load_filings_in_range(cik: str, company_key: str, start: str, end: str) -> pd.DataFrame:
-    frames = []
+def _html_listing_page(cik: str, form: str, page: int, count_per_page: int = 100) -> Optional[pd.DataFrame]:
+    url = ("https://www.sec.gov/cgi-bin/browse-edgar"
+           f"?action=getcompany&CIK={int(cik)}&type={form}&owner=exclude"
+           f"&count={count_per_page}&start={page * count_per_page}")
+    html = _get_html(url)
+    if not html: return None
+    return pd.DataFrame(_parse_listing_table(html))
 
-    # 1) submissions (recent + yearly files)
-    sub = _load_company_submissions(cik)
-    if sub:
-        recent = _recent_filings_df(sub)
-        if not recent.empty: frames.append(recent)
-        for f in sub.get("filings", {}).get("files", []):
-            name = f.get("name")
-            if name:
-                yr = _load_year_file(name)
-                if not yr.empty: frames.append(yr)
-
-    # 2) chunked search-index for the exact years you want
-    keys = [company_key, company_key.upper(), company_key.lower()]
-    alias_map = {"NVDA":["NVIDIA","NVIDIA Corporation"],
-                 "AMD":["AMD","Advanced Micro Devices"],
-                 "TSM":["TSMC","Taiwan Semiconductor"]}
-    keys += alias_map.get(company_key.upper(), [])
-    si = _search_index_chunked(keys=keys, ciks=[str(int(cik))], start=start, end=end)
-    if not si.empty: frames.append(si)
-
-    df = pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
-    if df.empty:
-        # 3) if still empty before normalization, scrape HTML
-        print("  (no rows from submissions/search-index — scraping classic EDGAR)")
-        html_df = _scrape_company_filings_html(cik, start, end, base_forms=BASE_FORMS)
-        df = html_df if not html_df.empty else pd.DataFrame()
+def _html_streams(cik: str, base_forms=BASE_FORMS, max_pages: int = 12):
+    for f in sorted(base_forms):
+        yield "html", f"type={f}", (lambda page, f=f: _html_listing_page(cik, f, page)), max_pages
 
-    if df.empty: return df
+# ========= Streaming loader =========
+_CHECKPOINT = FilingCheckpoint(FILINGS_DIR)
 
-    # Normalize BEFORE filtering
+def _normalize_filings(df: pd.DataFrame, cik: str) -> pd.DataFrame:
+    """One page of raw rows -> base-form filings with a window date and a doc_url (not windowed)."""
+    if df.empty: return pd.DataFrame(columns=FILING_COLUMNS)
     df = _normalize_schema(df)
-
-    # Coalesced window date, and apply target window
     df["window_date"] = _coalesce_datetime(df, ["filingDate","filed","dateFiled","reportDate","accepted"])
     df = df[~df["window_date"].isna()].copy()
-    print(f"  rows before windowing: {len(df)}")
-    print(f"  date span (min → max): {df['window_date'].min()} → {df['window_date'].max()}")
-
-    df = df[df["window_date"].between(START, END)].copy()
-    print(f"  rows after windowing: {len(df)}")
-
-    # If window still empty, scrape HTML as a fallback and union
-    if df.empty:
-        print("  (window empty — pulling HTML fallback for target years)")
-        html_df = _scrape_company_filings_html(cik, start, end, base_forms=BASE_FORMS)
-        if not html_df.empty:
-            html_df = _normalize_schema(html_df)
-            html_df["window_date"] = _coalesce_datetime(html_df, ["filingDate","filed","dateFiled","reportDate","accepted"])
-            html_df = html_df[~html_df["window_date"].isna()]
-            html_df = html_df[html_df["window_date"].between(START, END)]
-            df = html_df.copy()
-            print(f"  rows after HTML fallback: {len(df)}")
-
-    if df.empty:
-        return df
-
-    # Debug forms before base-filter
-    pre_counts = df["form"].value_counts().sort_index()
-    print("  pre-filter (raw) form counts:", ", ".join(f"{k}:{v}" for k,v in pre_counts.items()) if not pre_counts.empty else "(none)")
-
-    # Base-form filter
     df["form_base"] = df["form"].astype(str).map(_base_form)
-    df = df[df["form_base"].isin(BASE_FORMS)]
-    if df.empty:
-        print("  after base-form filtering: 0")
-        return df
+    df = df[df["form_base"].isin(BASE_FORMS)].copy()
+    if df.empty: return pd.DataFrame(columns=FILING_COLUMNS)
 
     # Ensure doc_url exists or build safely
-    if "doc_url" not in df.columns: df["doc_url"] = ""
-    doc_missing = df["doc_url"].astype(str).str.strip() == ""
+    doc_missing = df["doc_url"].fillna("").astype(str).str.strip() == ""
     if doc_missing.any():
         base = f"https://www.sec.gov/Archives/edgar/data/{int(cik)}"
-        acc  = df["accessionNumber"].astype(str) if "accessionNumber" in df.columns else pd.Series("", index=df.index)
-        nod  = acc.fillna("").str.replace("-", "", regex=False)
-        prim = df["primaryDocument"].astype(str) if "primaryDocument" in df.columns else pd.Series("", index=df.index)
-        prim = prim.fillna("")
+        nod  = df["accessionNumber"].fillna("").astype(str).str.replace("-", "", regex=False)
+        prim = df["primaryDocument"].fillna("").astype(str)
         built = base + "/" + nod + "/" + prim
         built = built.where(~built.str.endswith("/"), built + "index.html")
         df.loc[doc_missing, "doc_url"] = built.loc[doc_missing]
 
-    # Final tidy & dedup
-    for c in ["primaryDocDescription","primaryDocument","accessionNumber","doc_url"]:
-        if c not in df.columns: df[c] = ""
+    for c in ["form","form_base","doc_url","accessionNumber","primaryDocument","primaryDocDescription"]:
+        df[c] = df[c].fillna("").astype(str)
+    return df[FILING_COLUMNS].reset_index(drop=True)
+
+def _run_stream(cik: str, source: str, chunk: str, fetch_page, max_pages: int):
+    """Fetches the stream's remaining pages; each page is stored and its cursor advanced before it is yielded."""
+    position, raw_rows, done = _CHECKPOINT.cursor(cik, source, chunk)
+    while not done and position < max_pages:
+        raw = fetch_page(position)
+        if raw is None:
+            print(f"  [{source}] {chunk} page {position} failed; will resume there next run")
+            return
+        if raw.empty:
+            break
+        page = _normalize_filings(raw, cik)
+        _CHECKPOINT.write_page(cik, source, chunk, position, page)
+        position += 1; raw_rows += len(raw)
+        _CHECKPOINT.advance(cik, source, chunk, position, raw_rows)
+        if not page.empty:
+            yield page
+    if not done:
+        _CHECKPOINT.advance(cik, source, chunk, position, raw_rows, done=True)
+
+def _streams_state(cik: str, streams) -> Tuple[int, bool]:
+    """(raw rows fetched by the streams, whether every one of them finished)."""
+    cursors = [_CHECKPOINT.cursor(cik, source, chunk) for source, chunk, _, _ in streams]
+    return sum(c[1] for c in cursors), all(c[2] for c in cursors)
+
+def stream_filings(cik: str, company_key: str, start: str, end: str):
+    """
+    Yields normalized filing pages for cik as they arrive: submissions files, then the
+    chunked search-index, then (only if nothing landed in [start, end]) classic EDGAR
+    listings. Pages are checkpointed under FILINGS_DIR, so a restart resumes where the
+    previous run stopped. A failed stream is not read as "no rows": the fallbacks wait
+    until it finishes on a later run. Yielded pages are not windowed or de-duplicated;
+    see load_filings_in_range().
+    """
+    complete = True
+    # 1) submissions (recent + yearly files)
+    for stream in _submission_streams(cik):
+        yield from _run_stream(cik, *stream)
+
+    # 2) chunked search-index for the exact years you want (form-filtered first)
+    keys = list(dict.fromkeys([company_key, company_key.upper(), company_key.lower(),
+                               *ALIAS_MAP.get(company_key.upper(), [])]))
+    for cs, ce in _year_chunks(start, end, CHUNK_YEARS):
+        streams = list(_search_streams(keys, [cik], cs, ce, use_forms=True))
+        for stream in streams:
+            yield from _run_stream(cik, *stream)
+        raw_rows, finished = _streams_state(cik, streams)
+        if not finished:
+            print(f"  [search] {cs}..{ce} incomplete; unfiltered fallback waits for the next run")
+            complete = False
+        elif raw_rows == 0:
+            fallback = list(_search_streams(keys, [cik], cs, ce, use_forms=False))
+            for stream in fallback:
+                yield from _run_stream(cik, *stream)
+            complete &= _streams_state(cik, fallback)[1]
+
+    # 3) classic EDGAR listings when the window is still empty
+    if not complete:
+        print("  (search-index incomplete — classic EDGAR fallback waits for the next run)")
+    elif _CHECKPOINT.read(cik, start, end).empty:
+        print("  (no rows in window from submissions/search-index — scraping classic EDGAR)")
+        for stream in _html_streams(cik):
+            yield from _run_stream(cik, *stream)
+
+def load_filings_in_range(cik: str, company_key: str, start: str, end: str) -> pd.DataFrame:
+    pages = rows = 0
+    for page in stream_filings(cik, company_key, start, end):
+        pages += 1; rows += len(page)
+    print(f"  streamed {rows} filings in {pages} new pages")
+
+    # Everything stored for this CIK, windowed and de-duplicated across sources
+    df = _CHECKPOINT.read(cik, start, end)
     df = df.drop_duplicates(subset=["doc_url"]).reset_index(drop=True)
+    if df.empty:
+        print("  after windowing/base-form filtering: 0")
+        return df
 
     counts_raw  = df["form"].value_counts().sort_index().to_dict()
     counts_base = df["form_base"].value_counts().sort_index().to_dict()
     print("  loaded filings:", len(df), "| by raw form:", counts_raw, " | by base form:", counts_base)
     return df
 
+# ========= Bulk index loader =========
+def _fetch_index_file(url: str, ttl: Optional[float]) -> Optional[str]:
+    # "" tells the index the file does not exist (e.g. no daily index on a holiday)
+    try:
+        r = _cached_sec_request("GET", url, ttl=ttl)
+    except Exception:
+        return None
+    if r.status_code == 404: return ""
+    return r.text if r.ok else None
+
+_INDEX = EdgarIndex(_fetch_index_file, INDEX_DIR)
+
+def _primary_document(index_url: str):
+    # A filing's index page never changes once published
+    try:
+        r = _cached_sec_request("GET", index_url, ttl=FILING_TTL)
+    except Exception:
+        return None
+    return parse_filing_index(r.text) if r.ok else None
+
+def resolve_primary_documents(filings: pd.DataFrame, fetch_workers: int = FETCH_WORKERS) -> pd.DataFrame:
+    """
+    Points doc_url at each filing's primary document, read from its index page
+    (the master.idx filename is the whole SGML submission, exhibits included).
+    Filings whose index page cannot be read are dropped, and retried next run.
+    """
+    if filings.empty: return filings.drop(columns=["index_url"], errors="ignore")
+    with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+        resolved = list(pool.map(_primary_document, filings["index_url"]))
+    keep = [r is not None for r in resolved]
+    out = filings[keep].copy()
+    found = [r for r in resolved if r is not None]
+    out["doc_url"] = [r[0] for r in found]
+    out["primaryDocument"] = [r[0].rsplit("/", 1)[-1] for r in found]
+    out["primaryDocDescription"] = [r[1] for r in found]
+    if len(out) < len(filings):
+        print(f"  [edgar-index] {len(filings) - len(out)} filings without a readable index page; skipped")
+    return out.drop(columns=["index_url"]).drop_duplicates(subset=["doc_url"]).reset_index(drop=True)
+
+def load_filings_bulk(ciks, start: str, end: str, max_per_cik: Optional[int] = None) -> dict:
+    """
+    {int cik: filings} for many CIKs from the local EDGAR index, refreshed first.
+    Only the first max_per_cik filings of each CIK get their primary document resolved
+    (one index-page request each).
+    """
+    _INDEX.refresh(start, end)
+    df = _INDEX.filings(ciks, BASE_FORMS, start, end)
+    out = {}
+    for c in ciks:
+        g = df[df["cik"] == int(c)].drop(columns=["cik"])
+        g = resolve_primary_documents(g.iloc[:max_per_cik] if max_per_cik else g)
+        out[int(c)] = g
+        counts = g["form_base"].value_counts().sort_index().to_dict()
+        print(f"  [edgar-index] CIK {int(c)}: {len(g)} filings | by base form: {counts}")
+    return out
+
 # ========= Text, prices, labeling =========
-def fetch_text(url: str) -> str:
+def _html_to_text(html: str) -> str:
+    # Top-level so it can run in a worker process
     try:
-        r = requests.get(url, headers=UA, timeout=30)
-        if not r.ok: return ""
-        soup = BeautifulSoup(r.text, "lxml")
+        soup = BeautifulSoup(html, "lxml")
         for tag in soup(["script","style","noscript"]): tag.extract()
         text = soup.get_text("\n")
         text = re.sub(r"\n{2,}", "\n", text)
@@ -378,64 +483,96 @@ def fetch_text(url: str) -> str:
     except Exception:
         return ""
 
+def _fetch_raw(url: str) -> str:
+    try:
+        r = _cached_sec_request("GET", url, ttl=FILING_TTL)
+        return r.text if r.ok else ""
+    except Exception:
+        return ""
+
+def fetch_text(url: str) -> str:
+    html = _fetch_raw(url)
+    return _html_to_text(html) if html else ""
+
+def fetch_texts(urls: List[str], parse_pool: Optional[ProcessPoolExecutor] = None,
+                fetch_workers: int = FETCH_WORKERS) -> List[str]:
+    """
+    Fetches many filings concurrently under the shared SEC limiter. Downloads run on
+    a thread pool; HTML parsing is handed to a process pool as each download lands,
+    so lxml work never holds up the network side. Returns texts aligned with urls.
+    """
+    own_pool = parse_pool is None
+    if own_pool:
+        parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    texts = [""] * len(urls)
+    parsing = {}
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            downloads = {fetch_pool.submit(_fetch_raw, u): i for i, u in enumerate(urls)}
+            for fut in as_completed(downloads):
+                html = fut.result()
+                if html:
+                    parsing[parse_pool.submit(_html_to_text, html)] = downloads[fut]
+        for fut in as_completed(parsing):
+            texts[parsing[fut]] = fut.result()
+    finally:
+        if own_pool: parse_pool.shutdown()
+    return texts
+
 def fetch_prices(ticker: str, start: str, end: str) -> pd.DataFrame:
-    df = yf.download(ticker, start=start, end=end, auto_adjust=True, progress=False)
-    if df.empty: return pd.DataFrame()
-    df = df.reset_index().rename(columns={"Date":"date"})
-    df["date"] = pd.to_datetime(df["date"])
-    return df[["date","Open","High","Low","Close","Volume"]]
+    # Served from the local price store; only bars not yet stored are downloaded
+    return _PRICES.load(ticker, start, end)
 
-def first_on_or_after(prices: pd.DataFrame, dt0: pd.Timestamp):
-    sub = prices[prices["date"] >= dt0]
-    return None if sub.empty else sub.iloc[0]
+def _text_col(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns: return pd.Series("", index=df.index)
+    return df[col].fillna("").astype(str)
 
 def label_with_returns(rows: pd.DataFrame, prices: pd.DataFrame, horizons=(3,5)) -> pd.DataFrame:
     if rows.empty or prices.empty: return pd.DataFrame()
-    out = []
-    for _, r in rows.iterrows():
-        d0 = r["filingDate"]
-        row0 = first_on_or_after(prices, d0)
-        if row0 is None: continue
-        p0 = float(row0["Close"].item() if hasattr(row0["Close"], "item") else row0["Close"])
-        rec = {
-            "date": d0,
-            "form": r.get("form_base") or r.get("form") or "",
-            "url": r["doc_url"],
-            "title": (r.get("primaryDocDescription") or r.get("primaryDocument") or "").strip(),
-            "snippet": "",
-            "price_t0": p0
-        }
-        for h in horizons:
-            rowh = first_on_or_after(prices, d0 + pd.Timedelta(days=h))
-            if rowh is None:
-                rec[f"ret_{h}d"] = None; rec[f"label_{h}d"] = None
-            else:
-                pH = float(rowh["Close"].item() if hasattr(rowh["Close"], "item") else rowh["Close"])
-                ret = pH / p0 - 1.0
-                rec[f"ret_{h}d"] = ret
-                rec[f"label_{h}d"] = "UP" if ret > 0 else "DOWN"
-        out.append(rec)
-    return pd.DataFrame(out).reset_index(drop=True)
+    lab = labeling.label_with_returns(rows, prices, horizons, date_col="filingDate")
+    if lab.empty: return pd.DataFrame()
+    form = _text_col(lab, "form_base")
+    desc = _text_col(lab, "primaryDocDescription")
+    out = pd.DataFrame({
+        "date": lab["filingDate"],
+        "form": form.where(form != "", _text_col(lab, "form")),
+        "url": lab["doc_url"],
+        "title": desc.where(desc != "", _text_col(lab, "primaryDocument")).str.strip(),
+        # fetched filing text, when the caller attached it
+        "snippet": _text_col(lab, "text").str[:2000],
+        "price_t0": lab["price_t0"],
+    })
+    if "doc_id" in lab.columns:
+        out["doc_id"] = lab["doc_id"]  # full filing text lives in the document store
+    for h in horizons:
+        out[f"ret_{h}d"] = lab[f"ret_{h}d"]; out[f"label_{h}d"] = lab[f"label_{h}d"]
+    return out.reset_index(drop=True)
 
 # ========= Main =========
 if __name__ == "__main__":
     all_frames = []
+    parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+
+    if DISCOVERY == "bulk":
+        print(f"\n=== EDGAR index {START}..{END} ({len(TICKER_CIK)} CIKs) ===")
+        bulk = load_filings_bulk(TICKER_CIK.values(), START, END, max_per_cik=MAX_DOCS)
 
     for tkr, cik in TICKER_CIK.items():
         print(f"\n=== {tkr} EDGAR {START}..{END} ===")
-        filings = load_filings_in_range(cik, company_key=tkr, start=START, end=END)
+        if DISCOVERY == "bulk":
+            filings = bulk[int(cik)]
+        else:
+            filings = load_filings_in_range(cik, company_key=tkr, start=START, end=END)
         if filings.empty:
             print("  (no filings after loaders)")
             continue
 
-        # Fetch text (polite & capped)
-        texts = []
-        for i, (_, row) in enumerate(filings.iterrows()):
-            if i >= MAX_DOCS: break
-            texts.append(fetch_text(row["doc_url"]))
-            time.sleep(0.5)
-        filings = filings.iloc[:len(texts)].copy()
-        filings["text"] = texts
+        # Fetch text (concurrent, SEC rate-limited & capped)
+        filings = filings.iloc[:MAX_DOCS].copy()
+        filings["text"] = fetch_texts(filings["doc_url"].tolist(), parse_pool=parse_pool)
+        # Full text is kept once per distinct body (amendments often repeat it verbatim)
+        filings["doc_id"] = default_store().put_many(
+            filings["text"], zip(filings["doc_url"], filings["accessionNumber"]))
 
         # Prices + labels
         prices = fetch_prices(tkr, PRICE_START, PRICE_END)
@@ -444,20 +581,19 @@ if __name__ == "__main__":
             continue
 
         labeled = label_with_returns(filings, prices, HORIZONS)
-        labeled["snippet"] = [(filings.iloc[i]["text"] or "")[:2000] for i in range(len(labeled))]
         labeled.insert(0, "ticker", tkr)
         print("  labeled rows:", len(labeled))
 
         if not labeled.empty:
-            out_path = os.path.join(OUT_DIR, f"{tkr}_edgar_labeled.csv")
-            labeled.to_csv(out_path, index=False)
+            write_labeled(labeled, os.path.join(OUT_DIR, f"{tkr}_edgar_labeled.parquet"))
             all_frames.append(labeled)
 
+    parse_pool.shutdown()
+
     if all_frames:
-        pd.concat(all_frames, ignore_index=True)\
-          .sort_values(["ticker","date"])\
-          .to_csv(os.path.join(OUT_DIR, "all_edgar_labeled.csv"), index=False)
-        print("\n✅ EDGAR combined written to data/all_edgar_labeled.csv")
+        write_labeled(pd.concat(all_frames, ignore_index=True).sort_values(["ticker","date"]),
+                      os.path.join(OUT_DIR, "all_edgar_labeled.parquet"))
+        print("\n✅ EDGAR combined written to data/all_edgar_labeled.parquet")
     else:
         print("\n⚠️ EDGAR produced no labeled data — raise MAX_DOCS, add tickers, or extend dates.")
 
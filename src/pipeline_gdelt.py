@@ -1,10 +1,18 @@
 # src/pipeline_gdelt.py
 import os, io, re, time, requests
 import pandas as pd
-import yfinance as yf
 from datetime import timedelta
 from urllib.parse import quote_plus
 
+import labeling
+from alias_matcher import AliasMatcher, merge_aliases
+from company_aliases import ALIAS_MAP as EDGAR_ALIASES
+from gdelt_crawler import GdeltCrawler
+from http_cache import cached_get
+from labeled_store import write_labeled
+from price_store import PriceStore
+from rate_limit import TokenBucket
+
 OUT_DIR = "data"; os.makedirs(OUT_DIR, exist_ok=True)
 
 COMPANY_ALIASES = {
@@ -12,6 +20,7 @@ COMPANY_ALIASES = {
     "AMD":  ["AMD","Advanced Micro Devices","Ryzen","EPYC","Radeon","GPU","CPU","graphics card","Lisa Su","Bulldozer"],
     "TSM":  ["TSMC","Taiwan Semiconductor","TSM","semiconductor","chip fabrication","foundry","wafer","node","28nm","14nm","7nm"],
 }
+ALIAS_MATCHER = AliasMatcher(merge_aliases(COMPANY_ALIASES, EDGAR_ALIASES))
 SECTOR_TERMS = ["semiconductor","chip","GPU","foundry","graphics","datacenter","AI chip","machine learning"]
 
 NEWS_START = "2010-01-01"; NEWS_END = "2016-12-31"
@@ -19,6 +28,14 @@ PRICE_START = "2009-12-01"; PRICE_END = "2017-01-31"
 HORIZONS = [3,5]
 RUN_FULL = False  # first run does a short test
 
+# Crawler: concurrent windows under one global GDELT rate limit, checkpointed for resume
+GDELT_MAX_RPS = 1.0
+CRAWL_WORKERS = 4
+CHECKPOINT_DIR = os.path.join(OUT_DIR, "gdelt_checkpoint")
+
+_PRICES = PriceStore()
+_GDELT_LIMITER = TokenBucket(rate=GDELT_MAX_RPS, capacity=1)
+
 def day_range(start_date: str, end_date: str):
     cur = pd.to_datetime(start_date).normalize()
     end = pd.to_datetime(end_date).normalize()
@@ -61,89 +78,85 @@ def _normalize_news_df(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
         out[c] = out[c].astype(str).replace({"None":""}).str.strip()
     return out
 
-def gdelt_query(query, start_dt, end_dt, maxrecords=250, sleep_sec=1.0, retries=4, timeout=30):
+def gdelt_query(query, start_dt, end_dt, maxrecords=250, sleep_sec=1.0, retries=4, timeout=30,
+                limiter=None, strict=False):
+    # limiter: shared TokenBucket that paces network requests (replaces the post-request sleep)
+    # strict: raise when every retry failed instead of returning an empty frame
     base = "https://api.gdeltproject.org/api/v2/doc/doc"
     q = quote_plus(query)
     json_url = f"{base}?query={q}&mode=ArtList&format=json&sort=DateAsc&startdatetime={start_dt}&enddatetime={end_dt}&maxrecords={maxrecords}"
     csv_url  = f"{base}?query={q}&mode=ArtList&format=csv&sort=DateAsc&startdatetime={start_dt}&enddatetime={end_dt}&maxrecords={maxrecords}"
     headers = {"User-Agent":"stock-news-llm/0.1 you@example.com"}
     delay = sleep_sec
+    # GDELT answers rate limits with a 200 text/html page, so only cache real payloads
+    is_json = lambda r: r.headers.get("Content-Type","").lower().startswith("application/json")
+    is_csv = lambda r: bool(r.text.strip()) and not r.text.lstrip().startswith("<")
     for _ in range(retries):
         try:
-            r = requests.get(json_url, headers=headers, timeout=timeout)
-            if r.status_code==200 and r.headers.get("Content-Type","").lower().startswith("application/json"):
-                data = r.json(); time.sleep(delay); return pd.DataFrame(data.get("articles",[]))
-            r2 = requests.get(csv_url, headers=headers, timeout=timeout)
-            if r2.status_code==200 and r2.text.strip() and not r2.text.lstrip().startswith("<"):
-                df = pd.read_csv(io.StringIO(r2.text), on_bad_lines="skip"); time.sleep(delay); return df
+            r = cached_get(json_url, headers=headers, timeout=timeout, cacheable=is_json, limiter=limiter)
+            if r.status_code==200 and is_json(r):
+                data = r.json()
+                if not r.from_cache and limiter is None: time.sleep(delay)
+                return pd.DataFrame(data.get("articles",[]))
+            r2 = cached_get(csv_url, headers=headers, timeout=timeout, cacheable=is_csv, limiter=limiter)
+            if r2.status_code==200 and is_csv(r2):
+                df = pd.read_csv(io.StringIO(r2.text), on_bad_lines="skip")
+                if not r2.from_cache and limiter is None: time.sleep(delay)
+                return df
             time.sleep(delay); delay *= 2
         except Exception:
             time.sleep(delay); delay *= 2
+    if strict: raise RuntimeError(f"GDELT query failed after {retries} attempts: {start_dt}..{end_dt}")
     return pd.DataFrame()
 
 def _build_query_for_ticker(ticker: str) -> str:
-    terms = list({*COMPANY_ALIASES.get(ticker,[ticker]), *SECTOR_TERMS})
+    # ordered de-dup: the query string must be stable across runs (cache + checkpoint keys)
+    terms = list(dict.fromkeys([*COMPANY_ALIASES.get(ticker,[ticker]), *SECTOR_TERMS]))
     return "("+ " OR ".join(terms) +")"
 
-def _alias_regex(ticker:str)->re.Pattern:
-    pats = [r"\b"+re.escape(a).replace(r"\ ", r"\s+")+r"\b" for a in COMPANY_ALIASES.get(ticker,[ticker])]
-    return re.compile("|".join(pats), re.IGNORECASE)
-
 def filter_hits_to_ticker(df, ticker):
+    # one regex scan per column (all aliases in one alternation) tags every ticker; alias_hits is kept for relevance scoring
     if df.empty: return df
-    rgx = _alias_regex(ticker)
-    mask = df["title"].fillna("").str.contains(rgx) | df["content"].fillna("").str_contains(rgx)
-    # str.contains above; pandas <2.2 has no str_contains method; fallback:
-    if "str_contains" in dir(pd.Series.str):
-        pass
-    else:
-        mask = df["title"].fillna("").str.contains(rgx) | df["content"].fillna("").str.contains(rgx)
-    return df[mask].reset_index(drop=True)
-
-def fetch_news_for_ticker(ticker, start, end):
-    # use daily slices for <=2014, monthly for later
-    def windows():
-        if pd.to_datetime(start).year <= 2014:
-            return day_range(start, end)
-        return month_range(start, end)
-    frames = []
-    query = _build_query_for_ticker(ticker)
-    for s,e in windows():
-        raw = gdelt_query(query, s, e)
-        if not raw.empty: frames.append(_normalize_news_df(raw, ticker))
-    if not frames: return pd.DataFrame()
-    news = pd.concat(frames, ignore_index=True)
+    hits = ALIAS_MATCHER.count_frame(df, ["title","content"]).map(lambda c: c.get(ticker, 0))
+    out = df[hits > 0].copy()
+    out["alias_hits"] = hits[hits > 0]
+    return out.reset_index(drop=True)
+
+def _fetch_window(ticker, query, start_dt, end_dt):
+    raw = gdelt_query(query, start_dt, end_dt, limiter=_GDELT_LIMITER, strict=True)
+    rows = _normalize_news_df(raw, ticker) if not raw.empty else pd.DataFrame()
+    return len(raw), rows
+
+def _finalize_news(news, ticker):
+    if news.empty: return pd.DataFrame()
     news = filter_hits_to_ticker(news, ticker)
     news["title_lc"]=news["title"].str.lower()
     news = news.drop_duplicates(subset=["ticker","date","title_lc","url"]).drop(columns=["title_lc"]).reset_index(drop=True)
     return news
 
-def fetch_prices(ticker, start, end):
-    df = yf.download(ticker, start=start, end=end, auto_adjust=True, progress=False)
-    if df.empty: return pd.DataFrame()
-    df = df.reset_index().rename(columns={"Date":"date"})
-    df["date"]=pd.to_datetime(df["date"])
-    return df[["date","Open","High","Low","Close","Volume"]]
+def fetch_news(tickers, start, end):
+    # all tickers crawled together: windows run concurrently under the shared limiter
+    crawler = GdeltCrawler(_fetch_window, CHECKPOINT_DIR, workers=CRAWL_WORKERS)
+    raw = crawler.crawl({t: _build_query_for_ticker(t) for t in tickers}, start, end)
+    return {t: _finalize_news(raw[t], t) for t in tickers}
 
-def first_on_or_after(prices, dt):
-    sub = prices[prices["date"]>=dt]; return None if sub.empty else sub.iloc[0]
+def fetch_news_for_ticker(ticker, start, end):
+    return fetch_news([ticker], start, end)[ticker]
+
+def fetch_prices(ticker, start, end):
+    # Served from the local price store; only bars not yet stored are downloaded
+    return _PRICES.load(ticker, start, end)
 
 def label_with_returns(news, prices, horizons=(3,5)):
     if news.empty or prices.empty: return pd.DataFrame()
-    rows=[]
-    for _,r in news.iterrows():
-        d0=r["date"]; row0 = first_on_or_after(prices, d0)
-        if row0 is None: continue
-        p0=float(row0["Close"])
-        rec={"ticker":r["ticker"],"date":d0,"title":r.get("title","") or "","url":r.get("url","") or "","snippet":(r.get("content","") or "").strip(),"price_t0":p0}
-        for h in horizons:
-            rowh = first_on_or_after(prices, d0+pd.Timedelta(days=h))
-            if rowh is None:
-                rec[f"ret_{h}d"]=None; rec[f"label_{h}d"]=None
-            else:
-                ret=float(rowh["Close"])/p0-1.0; rec[f"ret_{h}d"]=ret; rec[f"label_{h}d"]="UP" if ret>0 else "DOWN"
-        rows.append(rec)
-    out=pd.DataFrame(rows).drop_duplicates(subset=["ticker","date","title","url"]).reset_index(drop=True)
+    lab = labeling.label_with_returns(news, prices, horizons, date_col="date")
+    if lab.empty: return pd.DataFrame()
+    col = lambda c: lab[c].fillna("").astype(str) if c in lab.columns else pd.Series("", index=lab.index)
+    out = pd.DataFrame({"ticker":lab["ticker"],"date":lab["date"],"title":col("title"),"url":col("url"),
+                        "snippet":col("content").str.strip(),"price_t0":lab["price_t0"]})
+    for h in horizons:
+        out[f"ret_{h}d"]=lab[f"ret_{h}d"]; out[f"label_{h}d"]=lab[f"label_{h}d"]
+    out=out.drop_duplicates(subset=["ticker","date","title","url"]).reset_index(drop=True)
     out["title"]=out["title"].fillna("").str.strip()
     out["snippet"]=out["snippet"].fillna("").str.replace(r"\s+"," ",regex=True).str.strip()
     return out
@@ -162,19 +175,21 @@ if __name__=="__main__":
         print("\n➡️ Full crawl OFF (set RUN_FULL=True in this file)\n"); raise SystemExit(0)
 
     all_frames=[]
+    print(f"\n=== GDELT crawl {', '.join(COMPANY_ALIASES)} {NEWS_START}..{NEWS_END} ===")
+    all_news = fetch_news(list(COMPANY_ALIASES), NEWS_START, NEWS_END)
     for tkr in COMPANY_ALIASES.keys():
         print(f"\n=== {tkr} GDELT {NEWS_START}..{NEWS_END} ===")
-        n = fetch_news_for_ticker(tkr, NEWS_START, NEWS_END)
+        n = all_news[tkr]
         p = fetch_prices(tkr, PRICE_START, PRICE_END)
         print("news rows:", len(n), "price rows:", len(p))
         if n.empty or p.empty:
             print("[skip] insufficient data for", tkr); continue
         lab = label_with_returns(n,p,HORIZONS); print("labeled rows:", len(lab))
-        lab.to_csv(os.path.join(OUT_DIR,f"{tkr}_gdelt_labeled.csv"), index=False)
+        write_labeled(lab, os.path.join(OUT_DIR,f"{tkr}_gdelt_labeled.parquet"))
         all_frames.append(lab)
     if all_frames:
-        pd.concat(all_frames, ignore_index=True).sort_values(["ticker","date"]).to_csv(os.path.join(OUT_DIR,"all_gdelt_labeled.csv"), index=False)
-        print("\n✅ GDELT combined written to data/all_gdelt_labeled.csv")
+        write_labeled(pd.concat(all_frames, ignore_index=True).sort_values(["ticker","date"]), os.path.join(OUT_DIR,"all_gdelt_labeled.parquet"))
+        print("\n✅ GDELT combined written to data/all_gdelt_labeled.parquet")
     else:
         print("\n⚠️ GDELT produced no labeled data — broaden terms or try later.")
 
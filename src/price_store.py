@@ -0,0 +1,163 @@
+# price_store.py
+#
+# Local daily OHLCV store: one Parquet file per ticker under data/prices
+# (anchored to the repo, not the working directory). Every bar is stored on
+# one basis: split/dividend adjusted, as yfinance returns with auto_adjust.
+#
+# refresh() only asks yfinance for bars after the last stored date (and for any
+# requested range before the first one). Since yfinance returns split/dividend
+# adjusted prices, the last stored bar is re-fetched with every refresh; if its
+# close no longer matches, history was re-adjusted and the ticker is
+# re-downloaded in full.
+#
+# Reads are served from an in-process cache, and arrays() returns closes for
+# many tickers aligned on one date axis for vectorized consumers.
+
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+PRICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "prices")
+COLUMNS = ["date", "Open", "High", "Low", "Close", "Volume"]
+
+# Relative close mismatch on the overlapping bar that triggers a full re-download
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+def _download(ticker: str, start, end) -> pd.DataFrame:
+    df = yf.download(ticker, start=start, end=end, auto_adjust=True, progress=False)
+    if df is None or df.empty: return pd.DataFrame(columns=COLUMNS)
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df.reset_index().rename(columns={"Date": "date"})
+    df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
+    return df[COLUMNS]
+
+
+class PriceStore:
+    def __init__(self, root: str = PRICE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, f"{ticker.upper()}.parquet")
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        """Full stored history for ticker (empty frame if none)."""
+        ticker = ticker.upper()
+        with self._lock:
+            if ticker not in self._frames:
+                path = self._path(ticker)
+                self._frames[ticker] = pd.read_parquet(path) if os.path.exists(path) \
+                    else pd.DataFrame(columns=COLUMNS)
+            return self._frames[ticker]
+
+    def write(self, ticker: str, df: pd.DataFrame) -> None:
+        ticker = ticker.upper()
+        df = df[COLUMNS].dropna(subset=["date"]).drop_duplicates(subset=["date"], keep="last")
+        # Concatenating onto an empty (object) frame leaves the dates as objects
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.sort_values("date").reset_index(drop=True)
+        df = df.astype({"Open": "float64", "High": "float64", "Low": "float64",
+                        "Close": "float64", "Volume": "float64"})
+        tmp = self._path(ticker) + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self._path(ticker))
+        with self._lock:
+            self._frames[ticker] = df
+
+    def last_date(self, ticker: str) -> Optional[pd.Timestamp]:
+        df = self.read(ticker)
+        return None if df.empty else df["date"].iloc[-1]
+
+    def covers(self, ticker: str, start, end) -> bool:
+        """True if the stored history spans [start, end]."""
+        df = self.read(ticker)
+        return not df.empty and df["date"].iloc[0] <= pd.Timestamp(start) and df["date"].iloc[-1] >= pd.Timestamp(end)
+
+    def refresh(self, ticker: str, start, end=None) -> pd.DataFrame:
+        """Brings the stored history up to cover [start, end), downloading only missing bars."""
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+        stored = self.read(ticker)
+        if stored.empty:
+            self.write(ticker, _download(ticker, start, end))
+            return self.read(ticker)
+
+        first, last = stored["date"].iloc[0], stored["date"].iloc[-1]
+        parts = [stored]
+        if end > last + pd.Timedelta(days=1):
+            # Overlap one bar so re-adjusted history can be detected
+            new = _download(ticker, last, end)
+            overlap = new[new["date"] == last]
+            if not overlap.empty:
+                old_close = float(stored["Close"].iloc[-1])
+                new_close = float(overlap["Close"].iloc[0])
+                if old_close and abs(new_close / old_close - 1.0) > ADJUSTMENT_TOLERANCE:
+                    print(f"  [prices] {ticker} history was re-adjusted; re-downloading")
+                    self.write(ticker, _download(ticker, min(start, first), end))
+                    return self.read(ticker)
+            parts.append(new)
+        if start < first:
+            parts.append(_download(ticker, start, first))
+
+        if len(parts) > 1:
+            self.write(ticker, pd.concat(parts, ignore_index=True))
+        return self.read(ticker)
+
+    def load(self, ticker: str, start=None, end=None, refresh: bool = True) -> pd.DataFrame:
+        """date/Open/High/Low/Close/Volume rows in [start, end), refreshing the store first by default."""
+        df = self.refresh(ticker, start, end) if refresh and start is not None else self.read(ticker)
+        if start is not None: df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None: df = df[df["date"] < pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+
+    def arrays(self, tickers: Iterable[str], start=None, end=None, field: str = "Close",
+               refresh: bool = False) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        Returns (dates, values, tickers): the union of trading dates as datetime64[ns],
+        a (len(dates), len(tickers)) float array of `field` with NaN where a ticker
+        has no bar, and the ticker order of the columns.
+        """
+        tickers = [t.upper() for t in tickers]
+        series = {}
+        for t in tickers:
+            df = self.load(t, start, end, refresh=refresh)
+            series[t] = pd.Series(df[field].to_numpy(dtype=float), index=pd.DatetimeIndex(df["date"]))
+        wide = pd.DataFrame(series, columns=tickers).sort_index()
+        return wide.index.to_numpy(dtype="datetime64[ns]"), wide.to_numpy(dtype=float), tickers
+
+    def import_csv(self, ticker: str, path: str, date_format: Optional[str] = None) -> pd.DataFrame:
+        """
+        Fills gaps in a ticker's history from a Yahoo Finance style CSV export
+        (Date,Open,High,Low,Close,AdjClose,Volume). Bars are converted to the
+        store's basis (split/dividend adjusted, like yfinance's auto_adjust):
+        scaled by AdjClose/Close, then by the median ratio to any stored bars
+        on the same dates. Stored bars win on overlapping dates.
+        """
+        df = pd.read_csv(path, thousands=",")
+        df["date"] = pd.to_datetime(df["Date"], format=date_format)
+        # Split/dividend event rows ("10:1 Stock Splits") carry no prices
+        for c in ("Open", "High", "Low", "Close"):
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        df = df.dropna(subset=["Close"])
+        adj = next((c for c in ("AdjClose", "Adj Close") if c in df.columns), None)
+        if adj is not None:
+            factor = df[adj] / df["Close"]
+            for c in ("Open", "High", "Low", "Close"):
+                df[c] = df[c] * factor
+
+        stored = self.read(ticker)
+        overlap = df[["date", "Close"]].merge(stored[["date", "Close"]], on="date", suffixes=("", "_stored"))
+        if not overlap.empty:
+            ratio = float((overlap["Close_stored"] / overlap["Close"]).median())
+            for c in ("Open", "High", "Low", "Close"):
+                df[c] = df[c] * ratio
+        self.write(ticker, pd.concat([df[COLUMNS], stored], ignore_index=True))
+        return self.read(ticker)
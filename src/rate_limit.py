@@ -0,0 +1,58 @@
+# rate_limit.py
+#
+# Thread-safe token-bucket rate limiter shared by the crawlers.
+#
+# A bucket refills at `rate` tokens per second up to `capacity`; every request
+# takes one token and blocks until one is available. pause() stops all callers
+# for a while, which is how we honor a server's Retry-After across every
+# worker that talks to the same host.
+
+import datetime as dt
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Blocks until `tokens` are available, then takes them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Blocks every caller for at least `seconds` and drains the bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def retry_after_seconds(headers, default: float) -> float:
+    """Parses a Retry-After header (delta-seconds or HTTP date); falls back to `default`."""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - dt.datetime.now(when.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return default
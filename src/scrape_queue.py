@@ -0,0 +1,187 @@
+# scrape_queue.py
+#
+# Durable work queue and pipelined engine for article scraping.
+#
+# Every URL is a row in SQLite with its position in the input list, a status
+# (pending / running / done / failed), an attempt count and the earliest time
+# it may be tried again. A failed fetch or parse reschedules the URL with
+# exponential backoff (base * 2^attempts, jittered, capped) until max_attempts,
+# after which it is parked as failed. Rows claimed by a run that died are put
+# back to pending on open, and done URLs are never fetched again, so a run can
+# be killed at any point and restarted.
+#
+#   queue --claim--> fetch threads --html--> parse processes --row--> writer
+#
+# Fetching is I/O-bound and runs on a small thread pool; HTML parsing is
+# CPU-bound and runs on a process pool. Finished rows are appended to the
+# output CSV (and flushed) as they complete, then marked done, so nothing is
+# held in memory until the end of the run.
+
+import csv
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class ScrapeQueue:
+    def __init__(self, path: str, max_attempts: int = 6, base_delay: float = 5.0, max_delay: float = 900.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                url TEXT PRIMARY KEY, position INTEGER, status TEXT, attempts INTEGER,
+                next_at REAL, last_error TEXT)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS queue_due ON queue(status, next_at)")
+        # Anything a previous run claimed but never finished goes back in line
+        self._db.execute("UPDATE queue SET status=? WHERE status=?", (PENDING, RUNNING))
+        self._db.commit()
+
+    def add(self, urls: Iterable[str]) -> int:
+        """Enqueues new URLs (known ones keep their state); returns how many were new."""
+        with self._lock:
+            start = self._db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM queue").fetchone()[0]
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO queue VALUES (?,?,?,0,0,NULL)",
+                                 ((url, start + i, PENDING) for i, url in enumerate(urls)))
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def claim(self, limit: int) -> List[tuple]:
+        """Up to `limit` due (position, url) pairs in input order, marked running."""
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT position, url FROM queue WHERE status=? AND next_at<=?
+                ORDER BY next_at, position LIMIT ?""", (PENDING, time.time(), limit)).fetchall()
+            self._db.executemany("UPDATE queue SET status=? WHERE url=?", ((RUNNING, url) for _, url in rows))
+            self._db.commit()
+        return rows
+
+    def done(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE queue SET status=?, last_error=NULL WHERE url=?", (DONE, url))
+            self._db.commit()
+
+    def retry(self, url: str, error: str, delay: Optional[float] = None) -> bool:
+        """
+        Counts a failed attempt and reschedules the URL with backoff (or after
+        `delay`, e.g. a server's Retry-After). False once it is parked as failed.
+        """
+        with self._lock:
+            attempts = self._db.execute("SELECT attempts FROM queue WHERE url=?", (url,)).fetchone()[0] + 1
+            if delay is None:
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.75, 1.25)
+            status = FAILED if attempts >= self.max_attempts else PENDING
+            self._db.execute("UPDATE queue SET status=?, attempts=?, next_at=?, last_error=? WHERE url=?",
+                             (status, attempts, time.time() + delay, str(error)[:500], url))
+            self._db.commit()
+        return status == PENDING
+
+    def reset_failed(self) -> int:
+        """Gives parked URLs a fresh set of attempts."""
+        with self._lock:
+            n = self._db.execute("UPDATE queue SET status=?, attempts=0, next_at=0 WHERE status=?",
+                                 (PENDING, FAILED)).rowcount
+            self._db.commit()
+        return n
+
+    def next_due(self) -> Optional[float]:
+        """Earliest retry time among pending URLs, or None when nothing is left to do."""
+        with self._lock:
+            return self._db.execute("SELECT MIN(next_at) FROM queue WHERE status=?", (PENDING,)).fetchone()[0]
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM queue GROUP BY status").fetchall())
+
+
+class CsvSink:
+    """Appends rows to a CSV as they arrive; the header is written once per file."""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.path = path
+        self.columns = list(columns)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new:
+            self._writer.writerow([""] + self.columns)
+            self._file.flush()
+
+    def write(self, position: int, row: Sequence) -> None:
+        self._writer.writerow([position] + list(row))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def compact_csv(path: str) -> pd.DataFrame:
+    """
+    Rewrites a streamed CSV in input order, keeping the last row per position
+    (a crash between writing a row and marking it done repeats that row).
+    """
+    df = pd.read_csv(path, index_col=0)
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=True)
+    os.replace(tmp, path)
+    return df
+
+
+def run_queue(queue: ScrapeQueue, fetch: Callable, parse: Callable, emit: Callable,
+              fetch_workers: int = 4, parse_workers: int = 2, on_error: Optional[Callable] = None,
+              log: Callable = print) -> dict:
+    """
+    Drains the queue. fetch(url) -> bytes runs on a thread; parse(bytes) -> row
+    runs in a worker process (so it must be a picklable module-level function);
+    emit(position, url, row) runs on the calling thread for every parsed page.
+    Any exception from fetch or parse is a failed attempt. An exception with a
+    `retry_after` attribute reschedules after that many seconds instead of the
+    backoff. on_error(url, exc) runs on the calling thread for every failure,
+    e.g. to drop a bad page from the HTTP cache. Returns the final counts.
+    """
+    inflight = {}  # future -> (stage, position, url)
+    completed = 0
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+        while True:
+            fetching = sum(1 for stage, _, _ in inflight.values() if stage == "fetch")
+            if fetching < fetch_workers:
+                for position, url in queue.claim(fetch_workers - fetching):
+                    inflight[fetchers.submit(fetch, url)] = ("fetch", position, url)
+
+            if not inflight:
+                due = queue.next_due()
+                if due is None: break
+                time.sleep(min(5.0, max(0.1, due - time.time())))
+                continue
+
+            finished, _ = wait(inflight, timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage, position, url = inflight.pop(fut)
+                try:
+                    result = fut.result()
+                    if stage == "fetch":
+                        inflight[parsers.submit(parse, result)] = ("parse", position, url)
+                        continue
+                    emit(position, url, result)
+                    queue.done(url)
+                    completed += 1
+                    log(f"Scraped article {position + 1} ({completed} this run)")
+                except Exception as e:
+                    if on_error is not None: on_error(url, e)
+                    again = queue.retry(url, f"{stage}: {e}", getattr(e, "retry_after", None))
+                    log(f"({stage}) {url}: {e}" + ("" if again else " -- giving up"))
+    return queue.counts()
@@ -0,0 +1,147 @@
+# seen_index.py
+#
+# Persistent "already processed" index for the RSS monitor.
+#
+# Articles are keyed two ways: by canonical URL (scheme/host lowercased,
+# fragment and tracking parameters dropped, query sorted) and by a hash of the
+# normalized body, so the same story re-posted under a new URL or syndicated
+# across feeds is only scored once. Keys live in SQLite; an in-memory Bloom
+# filter in front answers the common "never seen" case without touching disk.
+# Entries older than the retention window are pruned (and the filter rebuilt),
+# so disk and memory stay bounded no matter how long the monitor runs.
+#
+# Nothing is written until an article is finished (add()): a body claimed
+# while the article is still being scored is held in memory only, so an
+# article that fails or is cut off by a restart is not remembered as seen.
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from doc_store import doc_id
+
+SEEN_DB = os.path.join("data", "seen_articles.sqlite")
+
+# Query parameters that only track the click, never select the content
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "sh", "ss", "cmpid", "taid", "ito"}
+
+DAY = 24 * 3600
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit((url or "").strip())
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((parts.scheme == "http" and parts.port == 80) or
+                           (parts.scheme == "https" and parts.port == 443)):
+        host += f":{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(query), ""))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self._array[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class SeenIndex:
+    def __init__(self, path: str = SEEN_DB, retention_days: float = 180, capacity: int = 1_000_000,
+                 error_rate: float = 0.001, prune_every: int = 1000):
+        self.retention = retention_days * DAY
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.prune_every = prune_every
+        self._adds = 0
+        self._claims = {}  # canonical url -> content hash of articles in flight
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                url TEXT PRIMARY KEY, content_hash TEXT, first_seen REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_content ON seen(content_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_age ON seen(first_seen)")
+        self._db.commit()
+        self.prune()
+
+    def _rebuild_bloom(self) -> None:
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        for (url,) in self._db.execute("SELECT url FROM seen"):
+            self._bloom.add(url)
+
+    def prune(self) -> int:
+        """Drops entries older than the retention window; returns how many."""
+        with self._lock:
+            n = self._db.execute("DELETE FROM seen WHERE first_seen < ?", (time.time() - self.retention,)).rowcount
+            self._db.commit()
+            self._rebuild_bloom()
+        return n
+
+    def __contains__(self, url: str) -> bool:
+        key = canonical_url(url)
+        with self._lock:
+            if key not in self._bloom: return False
+            return self._db.execute("SELECT 1 FROM seen WHERE url=?", (key,)).fetchone() is not None
+
+    def _insert(self, key: str, content_hash: Optional[str]) -> bool:
+        # Caller holds the lock; returns True when a prune is due
+        self._db.execute("INSERT OR IGNORE INTO seen VALUES (?,?,?)", (key, content_hash, time.time()))
+        if content_hash:
+            self._db.execute("UPDATE seen SET content_hash=? WHERE url=?", (content_hash, key))
+        self._db.commit()
+        self._bloom.add(key)
+        self._adds += 1
+        return self._adds % self.prune_every == 0
+
+    def add(self, url: str, content_hash: Optional[str] = None) -> None:
+        """Marks url as processed, with the body claimed for it if any."""
+        key = canonical_url(url)
+        with self._lock:
+            due = self._insert(key, content_hash or self._claims.pop(key, None))
+        if due: self.prune()
+
+    def discard(self, url: str) -> None:
+        """Drops the body claimed for url without marking it processed (the article failed)."""
+        with self._lock:
+            self._claims.pop(canonical_url(url), None)
+
+    def claim_content(self, url: str, text: str) -> bool:
+        """
+        Claims the body fetched for url until add() or discard(). False if the same
+        (normalized) body is already recorded or claimed under a different URL, i.e.
+        the article is a duplicate.
+        """
+        if not text: return True
+        h = doc_id(text)
+        key = canonical_url(url)
+        with self._lock:
+            dup = any(v == h and k != key for k, v in self._claims.items()) or \
+                self._db.execute("SELECT 1 FROM seen WHERE content_hash=? AND url<>? LIMIT 1",
+                                 (h, key)).fetchone() is not None
+            if not dup: self._claims[key] = h
+        return not dup
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
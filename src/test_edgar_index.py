@@ -0,0 +1,84 @@
+# test_edgar_index.py
+#
+# Tests the local EDGAR index against saved copies of a master.idx file and a
+# filing index page (data/fixtures/), without touching the network.
+#
+#   python test_edgar_index.py      (or: python -m pytest test_edgar_index.py)
+
+import datetime as dt
+import os
+import tempfile
+
+import pandas as pd
+
+from edgar_index import EdgarIndex, index_page_url, parse_filing_index, parse_master_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "fixtures")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="latin-1") as f:
+        return f.read()
+
+
+def test_parse_master_index():
+    df = parse_master_index(_fixture("master_sample.idx"))
+    # The header block and the row with a non-numeric CIK are dropped
+    assert len(df) == 7
+    assert df["cik"].dtype == "int64"
+    assert df["filingDate"].min() == pd.Timestamp("2024-01-18")
+    # Daily files write dates as YYYYMMDD
+    assert pd.Timestamp("2024-03-25") in set(df["filingDate"])
+    assert parse_master_index("no rule, no rows").empty
+
+
+def test_index_page_url():
+    assert index_page_url("edgar/data/1045810/0001045810-24-000029.txt") == \
+        "https://www.sec.gov/Archives/edgar/data/1045810/000104581024000029/0001045810-24-000029-index.htm"
+
+
+def test_filings():
+    with tempfile.TemporaryDirectory() as root:
+        index = EdgarIndex(fetch=lambda url, ttl: None, root=root)
+        index.ingest_file(os.path.join(FIXTURES, "master_sample.idx"), 2024, 1)
+        df = index.filings([1045810, 2488], ["10-K", "8-K"], "2024-01-01", "2024-03-31")
+        assert list(df["cik"]) == [2488, 1045810, 1045810, 1045810, 1045810]
+        assert list(df[df["cik"] == 1045810]["form_base"]) == ["10-K", "8-K", "10-K", "8-K"]
+        # Never the full-submission SGML
+        assert not df["doc_url"].str.endswith(".txt").any()
+        assert (df["doc_url"] == df["index_url"]).all()
+        assert df.iloc[0]["accessionNumber"] == "0000002488-24-000006"
+
+
+def test_parse_filing_index():
+    url, description, form = parse_filing_index(_fixture("filing_index_sample.htm"))
+    assert url == "https://www.sec.gov/Archives/edgar/data/1045810/000104581024000029/nvda-20240128.htm"
+    assert (description, form) == ("10-K", "10-K")
+    assert parse_filing_index("<html><body>Not Found</body></html>") is None
+
+
+def test_recent_missing_daily_index_is_asked_again():
+    text = _fixture("master_sample.idx")
+    published = {dt.date(2024, 3, 25)}
+    def fetch(url, ttl):
+        day = dt.datetime.strptime(url.rsplit(".", 2)[-2], "%Y%m%d").date()
+        return text if day in published else ""
+
+    with tempfile.TemporaryDirectory() as root:
+        index = EdgarIndex(fetch=fetch, root=root)
+        index.refresh("2024-03-20", "2024-03-27", today=dt.date(2024, 3, 28))
+        # The running quarter is filled from its first day; check the last week only
+        stored = sorted(p for p in os.listdir(os.path.join(root, "daily")) if p >= "20240320")
+        # 03-20..03-22 are old enough to be holidays; 03-26 and 03-27 may still be published
+        assert stored == ["20240320.parquet", "20240321.parquet", "20240322.parquet", "20240325.parquet"]
+
+        published.add(dt.date(2024, 3, 27))
+        index.refresh("2024-03-20", "2024-03-28", today=dt.date(2024, 3, 29))
+        assert "20240327.parquet" in os.listdir(os.path.join(root, "daily"))
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
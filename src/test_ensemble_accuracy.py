@@ -1,13 +1,20 @@
 # test_ensemble_accuracy.py
 #
 # Tests sentiment analysis ensemble using Kaggle dataset takala/financial_phrasebank
+#
+# --tune-cascade: also tunes the cascade thresholds on a random half of the data
+# (saved to cascade_thresholds.json) and evaluates the cascade on the other half.
+# --tune-gate: likewise tunes the LLM confidence gate (saved to confidence_gate.json)
+# and reports its pass-through rate on the other half.
 
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-from tqdm import tqdm
+from sklearn.model_selection import train_test_split
 
-from ensemble_sentiment_analysis import analyze_sentiment, labels
+from ensemble_sentiment_analysis import analyze_sentiment_cascade, analyze_sentiment_many, labels, \
+    load_confidence_gate, tune_cascade_thresholds, tune_confidence_gate, label_confidences
 
 df = pd.read_csv("../data/sentiment_analysis_for_financial_news.csv")
 
@@ -26,19 +33,11 @@ df["mapped_label"] = df["sentiment"].map(mapping)
 # Remove rows where label couldn’t be mapped
 df = df.dropna(subset=["mapped_label"])
 
-y_true = []
-y_pred = []
-
 print(f"\nEvaluating {len(df)} samples...\n")
 
-for _, row in tqdm(df.iterrows(), total=len(df)):
-    text = row["phrase"]
-    true_label = row["mapped_label"]
-
-    pred_label = analyze_sentiment(text)
-
-    y_true.append(true_label)
-    y_pred.append(pred_label)
+# One batched pass per voter instead of a per-row loop
+y_true = df["mapped_label"].tolist()
+y_pred, probabilities = analyze_sentiment_many(df["phrase"].tolist())
 
 accuracy = accuracy_score(y_true, y_pred)
 report = classification_report(y_true, y_pred, labels=labels)
@@ -50,3 +49,36 @@ print("\nClassification Report:\n")
 print(report)
 print("\nConfusion Matrix (rows=true, cols=pred):\n")
 print(pd.DataFrame(cm, index=labels, columns=labels))
+
+"""
+Cascade
+"""
+if "--tune-cascade" in sys.argv:
+    val, test = train_test_split(df, test_size=0.5, random_state=42, stratify=df["mapped_label"])
+    tuned = tune_cascade_thresholds(val["phrase"].tolist(), val["mapped_label"].tolist())
+    print("\nTuned cascade thresholds:", tuned)
+else:
+    test = df
+
+c_pred, tiers = analyze_sentiment_cascade(test["phrase"].tolist())
+finbert_share = np.mean([t == "finbert" for t in tiers])
+print(f"\nCascade accuracy on {len(test)} samples:", accuracy_score(test["mapped_label"].tolist(), c_pred))
+print(f"Escalated to FinBERT: {finbert_share:.1%}")
+
+"""
+LLM confidence gate
+"""
+if "--tune-gate" in sys.argv:
+    val, test = train_test_split(df, test_size=0.5, random_state=42, stratify=df["mapped_label"])
+    tuned = tune_confidence_gate(val["phrase"].tolist(), val["mapped_label"].tolist())
+    print("\nTuned confidence gate:", tuned)
+    g_pred, g_probs = analyze_sentiment_many(test["phrase"].tolist())
+else:
+    test, g_pred, g_probs = df, y_pred, probabilities
+
+gate = load_confidence_gate()
+passed = label_confidences(g_pred, g_probs) >= gate
+g_correct = np.array(g_pred, dtype=object) == test["mapped_label"].to_numpy(dtype=object)
+print(f"\nConfidence gate {gate:.2f} on {len(test)} samples: pass-through {passed.mean():.1%}, "
+      f"accuracy of passed {g_correct[passed].mean() if passed.any() else float('nan'):.3f}, "
+      f"sent to the LLM {1 - passed.mean():.1%}")
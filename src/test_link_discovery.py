@@ -0,0 +1,111 @@
+# test_link_discovery.py
+#
+# Tests link discovery against saved Google News pages (data/fixtures/) and a
+# scripted fetch, without touching the network.
+#
+#   python test_link_discovery.py      (or: python -m pytest test_link_discovery.py)
+
+import os
+import tempfile
+import threading
+
+from link_discovery import CaptchaBlocked, CircuitBreaker, DiscoveryService, LinkStore, parse_search_page
+from rate_limit import TokenBucket
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "fixtures")
+QUERY = "allintitle:nvidia site:forbes.com"
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _results_page(year, ids):
+    anchors = "".join(f'<a href="/url?q=https://www.forbes.com/sites/x/{year}/01/01/story-{i}/&amp;sa=U">{i}</a>'
+                      for i in ids)
+    return f"<!doctype html><html><body>{anchors}</body></html>"
+
+
+class ScriptedSearch:
+    """fetch() over a fixed list of result pages per year; block_at turns pages into CAPTCHAs."""
+
+    def __init__(self, year, pages):
+        self.year, self.pages = year, pages
+        self.block_at = set()
+        self.fetched = []
+
+    def __call__(self, url):
+        page = int(url.rsplit("start=", 1)[1]) // 10
+        self.fetched.append(page)
+        if page in self.block_at:
+            return _fixture("google_news_captcha.htm")
+        if page >= len(self.pages):
+            return _fixture("google_news_empty.htm")
+        return _results_page(self.year, self.pages[page])
+
+
+def _service(store, fetch, max_trips=1):
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    breaker = CircuitBreaker(limiter, base_cooldown=0.01, max_trips=max_trips)
+    return DiscoveryService(QUERY, store, fetch=fetch, limiter=limiter, breaker=breaker, workers=1)
+
+
+def test_parse_search_page():
+    links, anchors = parse_search_page(_fixture("google_news_results.htm"), 2023)
+    # Google's /url?q= wrapper is removed, duplicates and other years are dropped
+    assert links == ["https://www.forbes.com/sites/greatspeculations/2023/11/22/nvidia-stock-after-q3-earnings/",
+                     "https://www.forbes.com/sites/johnkoetsier/2023/10/17/nvidia-export-rules/"]
+    assert anchors == 4
+    assert parse_search_page(_fixture("google_news_empty.htm"), 2023) == ([], 0)
+    assert parse_search_page(_fixture("google_news_captcha.htm"), 2023) == (None, 0)
+
+
+def test_interrupted_year_is_resumed():
+    with tempfile.TemporaryDirectory() as root:
+        store = LinkStore(os.path.join(root, "links.sqlite"))
+        fetch = ScriptedSearch(2020, [range(i * 10, i * 10 + 10) for i in range(5)])
+        fetch.block_at = {3}
+        _service(store, fetch).search_year(2020)
+        assert store.cursor(QUERY, 2020) == 3 and not store.completed(QUERY, 2020)
+
+        # The block is gone and two new articles pushed everything down the list;
+        # the re-run reads the newest pages up to known links, then jumps to the
+        # cursor (page 4) and finishes the year
+        fetch.block_at = set()
+        fetch.pages = [[100, 101] + list(range(0, 8))] + [range(i * 10 - 2, i * 10 + 8) for i in range(1, 5)] + [[48, 49]]
+        fetch.fetched = []
+        seen, new = _service(store, fetch).search_year(2020)
+        assert fetch.fetched == [0, 1, 3, 4, 5, 6]
+        assert new == 2 + 8 + 10 + 2
+        assert store.completed(QUERY, 2020) and store.cursor(QUERY, 2020) is None
+        assert len(store.links(QUERY)) == 52
+
+        # Completed: an incremental run stops at the first known page
+        fetch.fetched = []
+        _service(store, fetch).search_year(2020)
+        assert fetch.fetched == [0]
+
+
+def test_trips_during_a_pause_are_not_counted():
+    limiter = TokenBucket(rate=1000, capacity=1000)
+    breaker = CircuitBreaker(limiter, base_cooldown=0.5, max_trips=1)
+    # Several in-flight workers come back blocked at once: one trip, one cooldown
+    threads = [threading.Thread(target=breaker.trip) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert breaker.trips == 1
+
+    breaker._paused_until = 0.0
+    try:
+        breaker.trip()
+        raise AssertionError("second trip past max_trips should stop the run")
+    except CaptchaBlocked:
+        pass
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"{name}: ok")
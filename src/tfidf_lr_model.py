@@ -16,6 +16,9 @@ from sklearn.multiclass import OneVsRestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 
+from doc_store import default_store
+from price_store import PriceStore
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ARTICLES_CSV = os.path.join(BASE_DIR, "../data/forbes_articles_738.csv")
 STOCK_DATA_CSV = os.path.join(BASE_DIR, "../data/NVDA_yahoo_finance_data_2011_2025.csv")
@@ -24,98 +27,144 @@ MODEL_SAVE_PATH = os.path.join(BASE_DIR, "tfidf_lr_model.pkl")
 """
 Prepare Data
 """
-articles = pd.read_csv(ARTICLES_CSV)
-stock_data = pd.read_csv(STOCK_DATA_CSV)
-
-# Parse article dates
-articles["Time_clean"] = articles["Time"].str.rsplit(" ", n=1).str[0]
-articles["Time_clean"] = pd.to_datetime(
-    articles["Time_clean"], format="%b %d, %Y, %I:%M%p"
-)
-articles["Date"] = pd.to_datetime(articles["Time_clean"].dt.date)
-articles = articles.sort_values("Date")
-
-# Parse stock dates
-stock_data["StockDate"] = pd.to_datetime(stock_data["Date"], format="%d-%b-%y")
-stock_data = stock_data.sort_values("StockDate")
-
-# Compute UP/DOWN/NEUTRAL labels using 3-day return
-stock_data["Close_t"] = stock_data["Close"]
-stock_data["Close_t3"] = stock_data["Close"].shift(-3)
-
-# 3-day return: (price in 3 days - today's price) / today's price
-stock_data["Return_3d"] = (stock_data["Close_t3"] - stock_data["Close_t"]) / stock_data["Close_t"]
-
-# Drop rows where 3-day future data doesn't exist
-stock_data = stock_data.dropna(subset=["Return_3d"])
-
-# Calculated NVDA Volatility
-# NEUTRAL if |return| < k × volatility
-vol = stock_data["Return_3d"].std()
-
-k = 0.35
-UP_THRESHOLD = k * vol
-DOWN_THRESHOLD = -k * vol
-
-def classify_vol(r):
-    if r > UP_THRESHOLD:
-        return "UP"
-    elif r < DOWN_THRESHOLD:
-        return "DOWN"
-    else:
-        return "NEUTRAL"
-
-stock_data["Label"] = stock_data["Return_3d"].apply(classify_vol)
-
-stock_data = stock_data.drop(columns=["Close_t", "Close_t3"])
+def article_bodies(articles):
+    """
+    Article bodies: read from the document store by doc_id (what article_scraper.py
+    writes), falling back to an inline Body column (older or --inline-body CSVs).
+    """
+    inline = articles["Body"] if "Body" in articles.columns else pd.Series(None, index=articles.index, dtype=object)
+    if "doc_id" not in articles.columns:
+        return inline
+    stored = pd.Series(default_store().get_many(articles["doc_id"].where(articles["doc_id"].notna(), None)),
+                       index=articles.index, dtype=object)
+    return stored.fillna(inline)
+
+def load_labeled_articles(articles_csv=ARTICLES_CSV, stock_data_csv=STOCK_DATA_CSV):
+    """Forbes articles with a "text" column (title + body) and their 3-day "Label"."""
+    articles = pd.read_csv(articles_csv)
+    articles["Body"] = article_bodies(articles)
+
+    # NVDA history comes from the local price store; the Yahoo export fills whatever
+    # part of the articles' range the store (possibly seeded by the pipelines) lacks
+    prices = PriceStore()
+    article_dates = pd.to_datetime(articles["Time"].str.rsplit(" ", n=1).str[0], format="%b %d, %Y, %I:%M%p")
+    if not prices.covers("NVDA", article_dates.min().normalize(), article_dates.max().normalize()):
+        prices.import_csv("NVDA", stock_data_csv, date_format="%d-%b-%y")
+    stock_data = prices.load("NVDA", refresh=False)
+
+    # Parse article dates
+    articles["Time_clean"] = articles["Time"].str.rsplit(" ", n=1).str[0]
+    articles["Time_clean"] = pd.to_datetime(
+        articles["Time_clean"], format="%b %d, %Y, %I:%M%p"
+    )
+    articles["Date"] = pd.to_datetime(articles["Time_clean"].dt.date).astype("datetime64[ns]")
+    articles = articles.sort_values("Date")
+
+    # Stock dates
+    stock_data["StockDate"] = stock_data["date"].astype("datetime64[ns]")  # merge_asof needs matching units
+    stock_data = stock_data.sort_values("StockDate")
+
+    # Compute UP/DOWN/NEUTRAL labels using 3-day return
+    stock_data["Close_t"] = stock_data["Close"]
+    stock_data["Close_t3"] = stock_data["Close"].shift(-3)
+
+    # 3-day return: (price in 3 days - today's price) / today's price
+    stock_data["Return_3d"] = (stock_data["Close_t3"] - stock_data["Close_t"]) / stock_data["Close_t"]
+
+    # Drop rows where 3-day future data doesn't exist
+    stock_data = stock_data.dropna(subset=["Return_3d"])
+
+    # Calculated NVDA Volatility
+    # NEUTRAL if |return| < k × volatility
+    vol = stock_data["Return_3d"].std()
+
+    k = 0.35
+    UP_THRESHOLD = k * vol
+    DOWN_THRESHOLD = -k * vol
+
+    def classify_vol(r):
+        if r > UP_THRESHOLD:
+            return "UP"
+        elif r < DOWN_THRESHOLD:
+            return "DOWN"
+        else:
+            return "NEUTRAL"
+
+    stock_data["Label"] = stock_data["Return_3d"].apply(classify_vol)
+
+    stock_data = stock_data.drop(columns=["Close_t", "Close_t3"])
+
+    # Merge articles with stock data
+    merged = pd.merge_asof(
+        articles,
+        stock_data[["StockDate", "Label"]],
+        left_on="Date",
+        right_on="StockDate",
+        direction="forward"
+    )
+    merged = merged.dropna(subset=["Label"])
+
+    # Combine title + body into one text column
+    merged["text"] = merged["Title"].fillna("") + " " + merged["Body"].fillna("")
+    return merged
 
 """
-Merge articles with stock data
+Train
 """
-merged = pd.merge_asof(
-    articles,
-    stock_data[["StockDate", "Label"]],
-    left_on="Date",
-    right_on="StockDate",
-    direction="forward"
-)
-merged = merged.dropna(subset=["Label"])
-
-# Combine title + body into one text column
-merged["text"] = merged["Title"].fillna("") + " " + merged["Body"].fillna("")
-
-X = merged["text"].astype(str)
-y = merged["Label"].astype(str)
-
-# TF-IDF Vectorization
-vectorizer = TfidfVectorizer(
-    stop_words="english", 
-    max_features=2000,
-)
-X_tfidf = vectorizer.fit_transform(X)
-
-# Train/test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X_tfidf, y, test_size=0.2, random_state=42, stratify=y
-)
-
-# Train Model
-model = OneVsRestClassifier(LogisticRegression(
-    max_iter=3000,
-    class_weight="balanced",
-))
-model.fit(X_train, y_train)
-
-y_pred =  model.predict(X_test)
-
-print("\nAccuracy:", accuracy_score(y_test, y_pred))
-print("\nClassification Report:\n", classification_report(y_test, y_pred))
-
-# Save model
-with open(MODEL_SAVE_PATH, "wb") as f:
-    pickle.dump({
-        "vectorizer": vectorizer,
-        "model": model
-    }, f)
-
-print("\nTF-IDF + Logistic Regression model saved to:", MODEL_SAVE_PATH)
+def make_vectorizer():
+    return TfidfVectorizer(
+        stop_words="english", 
+        max_features=2000,
+    )
+
+def make_model():
+    return OneVsRestClassifier(LogisticRegression(
+        max_iter=3000,
+        class_weight="balanced",
+    ))
+
+def fit(X, y):
+    """Fits a fresh vectorizer + model on all of (X, y), without evaluation (e.g. one walk-forward window)."""
+    vectorizer = make_vectorizer()
+    model = make_model()
+    model.fit(vectorizer.fit_transform(X), y)
+    return vectorizer, model
+
+def train(X, y):
+    """Fits the TF-IDF vectorizer and the one-vs-rest LR from scratch; prints held-out metrics."""
+    # TF-IDF Vectorization
+    vectorizer = make_vectorizer()
+    X_tfidf = vectorizer.fit_transform(X)
+
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_tfidf, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    # Train Model
+    model = make_model()
+    model.fit(X_train, y_train)
+
+    y_pred =  model.predict(X_test)
+
+    print("\nAccuracy:", accuracy_score(y_test, y_pred))
+    print("\nClassification Report:\n", classification_report(y_test, y_pred))
+    return vectorizer, model
+
+def main():
+    merged = load_labeled_articles()
+    X = merged["text"].astype(str)
+    y = merged["Label"].astype(str)
+    vectorizer, model = train(X, y)
+
+    # Save model
+    with open(MODEL_SAVE_PATH, "wb") as f:
+        pickle.dump({
+            "vectorizer": vectorizer,
+            "model": model
+        }, f)
+
+    print("\nTF-IDF + Logistic Regression model saved to:", MODEL_SAVE_PATH)
+
+if __name__ == "__main__":
+    main()